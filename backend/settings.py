@@ -104,6 +104,10 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # how long a writer waits for the others (e.g. votes on the same game) before "database is locked"
+            'timeout': 20,
+        },
     }
 }
 
@@ -116,8 +120,30 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAdminUser',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # orjson based, several times faster than the stdlib json on big game lists (see benchmarks/bench_renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'fiordispino.renderers.ORJSONRenderer',
+        # Accept: application/msgpack, box arts are sent as binary instead of base64
+        'fiordispino.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'fiordispino.parsers.ORJSONParser',
+        'fiordispino.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# paginated lists (see fiordispino/pagination.py): default number of results per page, and the most a client can ask
+# for with ?page_size=
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
+# True makes ORJSONRenderer write exactly the bytes of the DRF JSONRenderer (e.g. datetimes truncated to milliseconds),
+# for clients that compare or hash responses. A bit slower
+JSON_RENDERER_COMPAT = False
+
 # Custom User
 AUTH_USER_MODEL = 'fiordispino.User'
 ACCOUNT_EMAIL_REQUIRED = True
@@ -148,6 +174,67 @@ SPECTACULAR_SETTINGS = {
     'SERVE_INCLUDE_SCHEMA': False,
 }
 
+# Box art
+# how box art is returned inside game payloads when the client doesn't pass ?box_art=...
+# 'base64' inlines the image, 'url' links the (immutably cacheable) box-art endpoint
+BOX_ART_DEFAULT_MODE = 'base64'
+
+# downscaled renditions (longest side in px) generated when a box art is uploaded, selectable with ?size=...
+BOX_ART_RENDITION_SIZES = {
+    'thumb': 200,
+    'medium': 600,
+}
+
+# in-process LRU cache of base64 encoded box art (per worker process)
+BOX_ART_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# bigger images are encoded on every request rather than flushing the whole cache
+BOX_ART_CACHE_MAX_ENTRY_BYTES = 4 * 1024 * 1024
+
+# bytes read (and base64 encoded) at a time, it bounds the memory used to stream a box art (rounded to a multiple of 3)
+BOX_ART_BASE64_CHUNK_SIZE = 3 * 64 * 1024
+
+# None: django streams the file (zero copy with servers supporting wsgi.file_wrapper, e.g. gunicorn).
+# 'x-sendfile' (apache/lighttpd) or 'x-accel-redirect' (nginx): the web server sends the file, ranges included.
+# For nginx, BOX_ART_ACCEL_REDIRECT_PREFIX must be an `internal` location aliasing MEDIA_ROOT
+BOX_ART_OFFLOAD = os.environ.get('BOX_ART_OFFLOAD') or None
+BOX_ART_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# Uploads bigger than FILE_UPLOAD_MAX_MEMORY_SIZE (2.5 MB by default) are streamed to a temporary file, never held in memory.
+# Box arts above these limits are rejected by looking at the image header only, before anything is decoded
+BOX_ART_MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+BOX_ART_MAX_DIMENSION = 6000
+BOX_ART_MAX_PIXELS = 24_000_000
+
+# uploaded box arts are re-encoded as progressive jpegs without metadata
+BOX_ART_JPEG_QUALITY = 85
+
+# re-encoding, renditions and placeholder run in a pool of worker threads after the upload is committed,
+# so that the admin create/update requests return right away. With False they run during the request
+BOX_ART_BACKGROUND_PROCESSING = True
+
+# featured games (/api/v1/game/featured/): FEATURED_GAMES_COUNT games picked once per period (in seconds),
+# deterministically from the seed and the period, and cached. The next selection is built in the background
+FEATURED_GAMES_PERIOD = 24 * 60 * 60
+FEATURED_GAMES_COUNT = 10
+FEATURED_GAMES_SEED = os.environ.get('FEATURED_GAMES_SEED', 'fiordispino')
+FEATURED_GAMES_BACKGROUND_REBUILD = True
+
+# worker threads of the background jobs (box art processing, featured games rebuilds), see fiordispino/core/background.py
+BACKGROUND_WORKERS = 2
+
+# game rating stats: with False every vote updates its game's stats right away. With True a vote only marks the game,
+# the stats of the marked games are recomputed every GAME_STATS_FLUSH_INTERVAL seconds, GAME_STATS_BATCH_SIZE per query
+# (see fiordispino/core/stats_queue.py). Popular games take many votes without them waiting on each other
+GAME_STATS_DEFERRED = os.environ.get('GAME_STATS_DEFERRED') == 'True'
+GAME_STATS_FLUSH_INTERVAL = 5
+GAME_STATS_BATCH_SIZE = 500
+
+# weighted rating of the games (the top games ranking): the average of their ratings plus
+# GAME_WEIGHTED_RATING_PRIOR_VOTES (> 0) imaginary ratings of GAME_WEIGHTED_RATING_PRIOR_MEAN, so a game with one 10/10
+# doesn't outrank one thousands of players rated 9.8. Run `manage.py recompute_game_stats` after changing them
+GAME_WEIGHTED_RATING_PRIOR_MEAN = 5.5
+GAME_WEIGHTED_RATING_PRIOR_VOTES = 25
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
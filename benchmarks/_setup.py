@@ -0,0 +1,67 @@
+"""
+Shared setup for the benchmarks: a throwaway in-memory database with the project's models, like the tests use.
+Run the benchmarks from the repository root, e.g. `python benchmarks/bench_serializers.py`.
+"""
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ.setdefault('ADMIN_MAPPING', 'admin/')
+
+    import django
+    from django.conf import settings
+
+    django.setup()
+    settings.MEDIA_ROOT = tempfile.mkdtemp()
+    settings.ALLOWED_HOSTS = ['*']
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def create_games(n, start=0):
+    # bulk created (no signals, no image processing): two genres per game, box art files are not created
+    from fiordispino.models import Game, Genre
+
+    genres = [Genre.objects.get_or_create(name=name)[0] for name in ("Action", "Platformer")]
+    games = Game.objects.bulk_create(
+        Game(title=f"Game {i}", description="A game", pegi=12, release_date="2020-01-01", global_rating=7.5,
+             rating_count=3, box_art=f"games/covers/{i}.jpg", box_art_hash=f"{i:064x}")
+        for i in range(start, start + n)
+    )
+    Game.genres.through.objects.bulk_create(
+        Game.genres.through(game=game, genre=genre) for game in games for genre in genres
+    )
+    return games
+
+
+def create_entries(model, owner, games, **fields):
+    # GamesToPlay or GamePlayed entries, bulk created like the games (the global ratings are not updated)
+    return model.objects.bulk_create(model(owner=owner, game=game, **fields) for game in games)
+
+
+def create_user(username="benchmark"):
+    from django.contrib.auth import get_user_model
+
+    return get_user_model().objects.create_user(username=username, email=f"{username}@example.com", password="password")
+
+
+def best_of(function, repeat=3):
+    # the best run is the least disturbed by the rest of the machine
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
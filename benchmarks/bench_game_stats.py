@@ -0,0 +1,105 @@
+"""
+Cost of a vote on a popular game, by the number of ratings it already has: the full re-aggregation the stats used to
+run on every vote, the incremental F() update and the deferred mode (GAME_STATS_DEFERRED), whose flush runs every
+FLUSH_INTERVAL seconds. For the deferred mode the staleness window is the longest a vote waited to be counted.
+
+    python benchmarks/bench_game_stats.py
+"""
+import random
+import time
+
+from _setup import setup_django, create_games
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db.models import Avg, Count  # noqa: E402
+
+from fiordispino.core.stats import recompute_stats  # noqa: E402
+from fiordispino.core.stats_queue import dirty_games, flush_stats  # noqa: E402
+from fiordispino.models import GamePlayed  # noqa: E402
+
+SIZES = (100, 10_000, 100_000)
+VOTES = 500
+FLUSH_INTERVAL = 0.05
+BATCH_SIZE = 50_000
+
+
+def add_ratings(game, n, start):
+    User = get_user_model()
+    for offset in range(start, start + n, BATCH_SIZE):
+        users = User.objects.bulk_create(
+            User(username=f"player{i}", email=f"player{i}@example.com")
+            for i in range(offset, min(offset + BATCH_SIZE, start + n))
+        )
+        # bulk created: no signals, the stats of the game are recomputed before the incremental updates
+        GamePlayed.objects.bulk_create(GamePlayed(owner=user, game=game, rating=random.randint(1, 10)) for user in users)
+
+
+def vote(entries):
+    played = random.choice(entries)
+    played.rating = random.randint(1, 10)
+    played.save()
+
+
+def full_aggregate(game, entries):
+    # what every vote used to do
+    played = random.choice(entries)
+    played.rating = random.randint(1, 10)
+    GamePlayed.objects.filter(pk=played.pk).update(rating=played.rating)
+    stats = game.played_by_user.aggregate(average=Avg('rating'), count=Count('id'))
+    game.global_rating = stats['average'] or 0.0
+    game.rating_count = stats['count']
+    game.save(update_fields=['global_rating', 'rating_count'])
+
+
+def per_vote(function, *args):
+    start = time.perf_counter()
+    for _ in range(VOTES):
+        function(*args)
+    return (time.perf_counter() - start) / VOTES
+
+
+def deferred(entries):
+    # votes keep coming, the flush runs every FLUSH_INTERVAL seconds in between
+    settings.GAME_STATS_DEFERRED = True
+    settings.GAME_STATS_FLUSH_INTERVAL = None
+    staleness = 0.0
+
+    start = last_flush = time.perf_counter()
+    for _ in range(VOTES):
+        vote(entries)
+        if time.perf_counter() - last_flush >= FLUSH_INTERVAL:
+            flush_stats()
+            staleness = max(staleness, dirty_games.last_flush['staleness'])
+            last_flush = time.perf_counter()
+    flush_stats()
+    elapsed = (time.perf_counter() - start) / VOTES
+
+    settings.GAME_STATS_DEFERRED = False
+    return elapsed, max(staleness, dirty_games.last_flush['staleness'])
+
+
+def main():
+    game, = create_games(1)
+    print(f"{'':<18} {'full aggregate':>15} {'incremental':>13} {'deferred':>13} {'staleness':>11}")
+
+    created = 0
+    for size in SIZES:
+        add_ratings(game, size - created, start=created)
+        created = size
+        entries = list(GamePlayed.objects.filter(game=game).only('id', 'game_id', 'rating'))
+
+        full = per_vote(full_aggregate, game, entries)
+        # the ratings changed without updating rating_sum
+        recompute_stats([game.pk])
+        incremental = per_vote(vote, entries)
+        deferred_vote, staleness = deferred(entries)
+
+        print(f"{size:>9} ratings {full * 1000:>12.3f} ms {incremental * 1000:>10.3f} ms "
+              f"{deferred_vote * 1000:>10.3f} ms {staleness * 1000:>8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+ORDER BY RANDOM() vs the id sampling of fiordispino.core.sampling, for catalogues from 1k to 1M games.
+A third of the games is deleted, so that the sampling has gaps to skip. The filtered columns ask for the games with
+PEGI 7 at most (2 games out of 5) with the rating weight.
+
+    python benchmarks/bench_random_games.py
+"""
+from _setup import setup_django, best_of
+
+setup_django()
+
+from django.db import connection  # noqa: E402
+
+from fiordispino.core.sampling import sample_ids, weighted_sample_ids  # noqa: E402
+from fiordispino.models import Game  # noqa: E402
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+N_GAMES = 20
+BATCH_SIZE = 50_000
+PEGI = (3, 7, 12, 16, 18)
+
+
+def create_games(n, start):
+    # just the game rows, genres don't matter here
+    for offset in range(start, start + n, BATCH_SIZE):
+        Game.objects.bulk_create(
+            Game(title=f"Game {i}", description="A game", pegi=PEGI[i % len(PEGI)], release_date="2020-01-01",
+                 global_rating=i % 11, box_art=f"games/covers/{i}.jpg")
+            for i in range(offset, min(offset + BATCH_SIZE, start + n))
+        )
+
+
+def main():
+    print(f"{'':<20} {'order_by(?)':>14} {'sampling':>14} {'speedup':>9} {'filtered (?)':>14} {'weighted':>14}")
+
+    created = 0
+    for size in SIZES:
+        create_games(size - created, start=created)
+        created = size
+        # gaps: every third game is gone
+        with connection.cursor() as cursor:
+            # raw: delete() would load every game to send the signals
+            cursor.execute(f"DELETE FROM {Game._meta.db_table} WHERE id % 3 = 0")
+
+        shuffle = best_of(lambda: list(Game.objects.order_by('?').values_list('pk', flat=True)[:N_GAMES]))
+        sampling = best_of(lambda: sample_ids(Game.objects.all(), N_GAMES), repeat=10)
+
+        filtered = Game.objects.filter(pegi__lte=7)
+        filtered_shuffle = best_of(lambda: list(filtered.order_by('?').values_list('pk', flat=True)[:N_GAMES]))
+        weighted = best_of(lambda: weighted_sample_ids(filtered, N_GAMES, 'rating'), repeat=10)
+
+        print(f"{size:>10} games {shuffle * 1000:>11.2f} ms {sampling * 1000:>11.2f} ms {shuffle / sampling:>8.1f}x "
+              f"{filtered_shuffle * 1000:>11.2f} ms {weighted * 1000:>11.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
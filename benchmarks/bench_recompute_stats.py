@@ -0,0 +1,62 @@
+"""
+Time taken by `manage.py recompute_game_stats` to recompute every game, by number of ratings (default: 1M, spread over
+10k games), with every game's stats drifted: all of them wrong, or just the count. Pass the number of ratings to try
+another size, e.g. 10M:
+
+    python benchmarks/bench_recompute_stats.py 10000000
+"""
+import io
+import random
+import sys
+import time
+
+from _setup import setup_django, create_games
+
+setup_django()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+
+from fiordispino.core.stats import HISTOGRAM_FIELDS  # noqa: E402
+from fiordispino.models import Game, GamePlayed  # noqa: E402
+
+GAMES = 10_000
+BATCH_SIZE = 50_000
+
+
+def add_ratings(games, n):
+    # players rating every game once, as many as needed
+    User = get_user_model()
+    per_batch = max(1, BATCH_SIZE // len(games))
+    created = 0
+    for offset in range(0, -(-n // len(games)), per_batch):
+        users = User.objects.bulk_create(
+            User(username=f"player{i}", email=f"player{i}@example.com") for i in range(offset, offset + per_batch)
+        )
+        entries = [GamePlayed(owner=user, game=game, rating=random.randint(1, 10)) for user in users for game in games]
+        created += len(GamePlayed.objects.bulk_create(entries[:n - created]))
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    games = create_games(GAMES)
+
+    start = time.perf_counter()
+    add_ratings(games, n)
+    print(f"{n} ratings created in {time.perf_counter() - start:.0f}s")
+
+    drifts = {
+        'every stat wrong': {'global_rating': 0, 'weighted_rating': 0, 'rating_sum': 0, 'rating_count': 0,
+                             **{field: 0 for field in HISTOGRAM_FIELDS}},
+        'count wrong': {'rating_count': 0},
+    }
+    for name, drift in drifts.items():
+        for chunk_size in (1000, 5000):
+            Game.objects.update(**drift)
+            start = time.perf_counter()
+            call_command('recompute_game_stats', chunk_size=chunk_size, stdout=io.StringIO())
+            print(f"{name:<17} chunks of {chunk_size:>5} games: {time.perf_counter() - start:8.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+DRF JSONRenderer (stdlib json) vs ORJSONRenderer, in fast and compatibility mode, on catalogue payloads:
+game lists with box art urls, and with inline base64 box arts (~40 KB each, like a 30 KB jpeg cover).
+
+    python benchmarks/bench_renderers.py
+"""
+import base64
+import os
+
+from _setup import setup_django, create_games, best_of
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from fiordispino.models import Game  # noqa: E402
+from fiordispino.renderers import ORJSONRenderer  # noqa: E402
+from fiordispino.serializers.game_serializer import GameSerializer  # noqa: E402
+
+BOX_ART_BYTES = 30 * 1024
+
+
+def games_payload(n):
+    context = {'request': Request(APIRequestFactory().get('/', {'box_art': 'url'}))}
+    return GameSerializer(context=context).fast_representation(Game.objects.all()[:n])
+
+
+def with_base64_box_arts(payload):
+    box_art = base64.b64encode(os.urandom(BOX_ART_BYTES)).decode()
+    return [{**game, 'box_art': box_art} for game in payload]
+
+
+def compare(name, data):
+    drf = best_of(lambda: JSONRenderer().render(data))
+
+    settings.JSON_RENDERER_COMPAT = False
+    fast = best_of(lambda: ORJSONRenderer().render(data))
+    settings.JSON_RENDERER_COMPAT = True
+    compat = best_of(lambda: ORJSONRenderer().render(data))
+
+    print(f"{name:<36} {drf * 1000:>9.1f} ms {fast * 1000:>9.1f} ms {drf / fast:>6.1f}x "
+          f"{compat * 1000:>9.1f} ms {drf / compat:>6.1f}x")
+
+
+def main():
+    create_games(10_000)
+    print(f"{'':<36} {'drf':>12} {'orjson':>12} {'':>7} {'compat':>12}")
+
+    for n in (1_000, 10_000):
+        compare(f"{n} games, box art urls", games_payload(n))
+    for n in (100, 1_000):
+        compare(f"{n} games, base64 box arts", with_base64_box_arts(games_payload(n)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+DRF serializers vs the values() based fast path (DynamicFieldsMixin.fast_representation) on the list endpoints.
+Box arts are returned as urls: in base64 mode both paths spend the same time reading the images.
+
+    python benchmarks/bench_serializers.py
+"""
+from _setup import setup_django, create_games, create_entries, create_user, best_of
+
+setup_django()
+
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from fiordispino.models import Game, GamePlayed  # noqa: E402
+from fiordispino.serializers.game_serializer import GameSerializer  # noqa: E402
+from fiordispino.serializers.games_played_serializer import GamesPlayedSerializer  # noqa: E402
+
+SIZES = (1_000, 10_000)
+
+
+def compare(name, serializer_class, queryset, params):
+    context = {'request': Request(APIRequestFactory().get('/', params))}
+    serializer = serializer_class(context=context)
+    # the same queryset the viewsets use
+    queryset = serializer.restrict_queryset(queryset)
+
+    drf = best_of(lambda: serializer_class(queryset.all(), many=True, context=context).data)
+    fast = best_of(lambda: serializer.fast_representation(queryset.all()))
+    print(f"{name:<40} {drf * 1000:>10.1f} ms {fast * 1000:>10.1f} ms {drf / fast:>8.1f}x")
+
+
+def main():
+    user = create_user()
+    print(f"{'':<40} {'drf':>13} {'fast':>13} {'speedup':>9}")
+
+    created = 0
+    for size in SIZES:
+        create_entries(GamePlayed, user, create_games(size - created, start=created), rating=8)
+        created = size
+
+        compare(f"games, {size} rows", GameSerializer, Game.objects.all(), {'box_art': 'url'})
+        compare(f"games ?fields=id,title, {size} rows", GameSerializer, Game.objects.all(), {'fields': 'id,title'})
+        compare(f"games played, {size} rows", GamesPlayedSerializer, GamePlayed.objects.filter(owner=user),
+                {'box_art': 'url'})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+First page of the top games (20 games) for catalogues from 10k to 1M games: ranked by global_rating, which has no
+index and sorts every game, vs the weighted_rating indexes the ranking uses. Overall, by PEGI and by genre (one game in
+three has the genre).
+
+    python benchmarks/bench_top_games.py
+"""
+import random
+
+from _setup import setup_django, best_of
+
+setup_django()
+
+from django.db.models import Exists, OuterRef  # noqa: E402
+
+from fiordispino.models import Game, Genre  # noqa: E402
+
+SIZES = (10_000, 100_000, 1_000_000)
+PAGE = 20
+BATCH_SIZE = 50_000
+PEGI = (3, 7, 12, 16, 18)
+
+
+def create_games(n, start, genre):
+    # random stats: the ranking has to find the best games anywhere in the table
+    for offset in range(start, start + n, BATCH_SIZE):
+        games = Game.objects.bulk_create(
+            Game(title=f"Game {i}", description="A game", pegi=PEGI[i % len(PEGI)], release_date="2020-01-01",
+                 global_rating=round(random.uniform(1, 10), 1), rating_count=1,
+                 weighted_rating=random.uniform(1, 10), box_art=f"games/covers/{i}.jpg")
+            for i in range(offset, min(offset + BATCH_SIZE, start + n))
+        )
+        Game.genres.through.objects.bulk_create(
+            Game.genres.through(game=game, genre=genre) for game in games if game.pk % 3 == 0
+        )
+
+
+def first_page(order, **filters):
+    def run():
+        games = Game.objects.filter(rating_count__gt=0, **filters)
+        return list(games.order_by(f'-{order}', '-id').values_list('pk', flat=True)[:PAGE + 1])
+    return run
+
+
+def first_page_of_genre(order, genre):
+    def run():
+        games = Game.objects.filter(Exists(Game.genres.through.objects.filter(game=OuterRef('pk'), genre=genre)),
+                                    rating_count__gt=0)
+        return list(games.order_by(f'-{order}', '-id').values_list('pk', flat=True)[:PAGE + 1])
+    return run
+
+
+def main():
+    genre = Genre.objects.create(name="Action")
+    print(f"{'':<16} {'':>8} {'global_rating':>16} {'weighted_rating':>16}")
+
+    created = 0
+    for size in SIZES:
+        create_games(size - created, created, genre)
+        created = size
+
+        cases = {
+            'overall': (first_page('global_rating'), first_page('weighted_rating')),
+            'by PEGI': (first_page('global_rating', pegi=7), first_page('weighted_rating', pegi=7)),
+            'by genre': (first_page_of_genre('global_rating', genre), first_page_of_genre('weighted_rating', genre)),
+        }
+        for name, (sorted_page, indexed_page) in cases.items():
+            print(f"{size:>10} games {name:>8} {best_of(sorted_page) * 1000:>13.2f} ms "
+                  f"{best_of(indexed_page, repeat=10) * 1000:>13.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
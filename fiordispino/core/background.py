@@ -0,0 +1,50 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    # one pool for the whole process, shared by every kind of job (box art processing, featured games...)
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'BACKGROUND_WORKERS', DEFAULT_WORKERS),
+                                           thread_name_prefix='fiordispino')
+        return _executor
+
+
+def _run_job(job, *args):
+    close_old_connections()
+    try:
+        job(*args)
+    except Exception:
+        # nobody is waiting for the result, the error would be lost otherwise
+        logger.exception("Background job %s failed", getattr(job, '__name__', job))
+    finally:
+        # every worker thread has its own connection
+        connection.close()
+
+
+def schedule(delay, job, *args) -> threading.Timer:
+    # runs the job in the pool after `delay` seconds, without keeping one of its workers busy while waiting
+    timer = threading.Timer(delay, lambda: get_executor().submit(_run_job, job, *args))
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+def submit(job, *args) -> None:
+    # the job starts once the transaction is committed: before that the worker wouldn't see the new rows,
+    # and a rolled back change has nothing to process. Outside of a transaction it starts right away
+    transaction.on_commit(lambda: get_executor().submit(_run_job, job, *args))
@@ -0,0 +1,265 @@
+import hashlib
+import mimetypes
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models.fields.files import FieldFile
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from typeguard import typechecked
+
+from fiordispino.core.utils import iter_json_with_base64
+from fiordispino.core.renditions import ORIGINAL_SIZE, RENDITION_MEDIA_TYPES, get_box_art_file, negotiate_extension
+
+# box art urls carry (a prefix of) the content hash, so a new image always means a new url
+BOX_ART_VERSION_LENGTH = 16
+
+# one year, the longest max-age that caches reliably honour
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+BOX_ART_MODES = ('base64', 'url')
+
+# the box art endpoint returns the raw image, or a json object with the base64 image when asked for ?encoding=base64
+BOX_ART_ENCODINGS = ('raw', 'base64')
+
+# just single ranges: a multipart/byteranges response is never worth it for an image
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class FileRange:
+    """
+    File-like view over the [first, last] bytes of an open file.
+    FileResponse reads it block by block, so the image is never fully loaded in memory, and it stops at the end of the range.
+    """
+
+    def __init__(self, file, first, last):
+        file.seek(first)
+        self._file = file
+        self._remaining = last - first + 1
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b''
+
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+@typechecked
+def compute_box_art_hash(img: FieldFile) -> str:
+    # returns the sha256 of the image content, or an empty string if there is no readable file
+    if not img:
+        return ''
+
+    digest = hashlib.sha256()
+
+    # a freshly uploaded file still lives in memory/temp storage and must stay open for the actual save
+    committed = img._committed
+    try:
+        for chunk in img.chunks():
+            digest.update(chunk)
+    except (OSError, ValueError):
+        return ''
+    finally:
+        if committed:
+            img.close()
+
+    return digest.hexdigest()
+
+
+def box_art_version(game) -> str:
+    return game.box_art_hash[:BOX_ART_VERSION_LENGTH]
+
+
+def build_box_art_url(game, request=None, size=ORIGINAL_SIZE) -> str:
+    return box_art_url(game.pk, game.box_art_hash, request, size)
+
+
+def box_art_url(pk, box_art_hash, request=None, size=ORIGINAL_SIZE) -> str:
+    # same as build_box_art_url, for callers that only have the columns (e.g. values() rows)
+    return box_art_url_builder(request, size)(pk, box_art_hash)
+
+
+# stands for the pk in the reversed url, then replaced by the actual one
+PK_PLACEHOLDER = '__pk__'
+
+
+def box_art_url_builder(request=None, size=ORIGINAL_SIZE):
+    # reverse() costs far more than the url itself: for lists it runs once, the returned function just fills in the pk
+    template = reverse('game-box-art', kwargs={'pk': PK_PLACEHOLDER})
+    if request is not None:
+        template = request.build_absolute_uri(template)
+
+    size_param = f"size={size}" if size != ORIGINAL_SIZE else None
+
+    def build(pk, box_art_hash):
+        url = template.replace(PK_PLACEHOLDER, str(pk))
+
+        params = []
+        # without a hash (e.g. the file went missing) the url can't be versioned, clients will revalidate it with the etag
+        if box_art_hash:
+            params.append(f"v={box_art_hash[:BOX_ART_VERSION_LENGTH]}")
+        if size_param:
+            params.append(size_param)
+
+        return f"{url}?{'&'.join(params)}" if params else url
+
+    return build
+
+
+def parse_byte_range(header, size):
+    # returns the (first, last) positions (inclusive) asked by a Range header, or None if the header must be ignored
+    match = RANGE_PATTERN.match(header.strip()) if header else None
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - length), size - 1
+
+    first = int(first)
+    last = int(last) if last else None
+    if last is not None and last < first:
+        return None
+    if first >= size:
+        raise RangeNotSatisfiable()
+    if last is None:
+        last = size - 1
+
+    return first, min(last, size - 1)
+
+
+def _offload_response(img, content_type):
+    # lets the web server send the file (zero copy, ranges included): django only sets a header
+    mode = getattr(settings, 'BOX_ART_OFFLOAD', None)
+    if mode is None:
+        return None
+
+    try:
+        path = img.storage.path(img.name)
+    except NotImplementedError:
+        # remote storages have no local file the web server could send
+        return None
+
+    response = HttpResponse(content_type=content_type)
+    if mode == 'x-sendfile':
+        response['X-Sendfile'] = path
+    elif mode == 'x-accel-redirect':
+        prefix = getattr(settings, 'BOX_ART_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = quote(f"{prefix.rstrip('/')}/{img.name}")
+    else:
+        raise ImproperlyConfigured("BOX_ART_OFFLOAD must be None, 'x-sendfile' or 'x-accel-redirect'")
+
+    return response
+
+
+def _file_response(request, img, content_type, etag):
+    offloaded = _offload_response(img, content_type)
+    if offloaded is not None:
+        return offloaded
+
+    size = img.size
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+        response['Content-Length'] = size
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    # If-Range: resume only if the client still has the same version, otherwise the whole file is sent again
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if if_range is None or (etag is not None and if_range == etag):
+        try:
+            byte_range = parse_byte_range(request.headers.get('Range'), size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        # the real file: servers providing wsgi.file_wrapper send it with os.sendfile, without copying it in python
+        response = FileResponse(img.open('rb'), content_type=content_type)
+    else:
+        first, last = byte_range
+        response = FileResponse(FileRange(img.open('rb'), first, last), content_type=content_type, status=206)
+        response['Content-Range'] = f'bytes {first}-{last}/{size}'
+        response['Content-Length'] = last - first + 1
+
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def box_art_response(request, game, size=ORIGINAL_SIZE, encoding='raw'):
+    if not game.box_art or not game.box_art.storage.exists(game.box_art.name):
+        raise Http404("No box art found for game")
+
+    # renditions come in several formats, the best one the client accepts is served
+    ext = negotiate_extension(request.headers.get('Accept', ''))
+    img = get_box_art_file(game, size, ext)
+
+    is_rendition = img.name != game.box_art.name
+
+    etag = None
+    if game.box_art_hash:
+        # every size/format is a different representation of the same version
+        etag = f'"{game.box_art_hash}-{size}.{ext}"' if is_rendition else f'"{game.box_art_hash}"'
+        if encoding == 'base64':
+            etag = f'{etag[:-1]}-base64"'
+
+    # the client already has this exact image -> 304 without touching the file
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    if encoding == 'base64' and request.method == 'HEAD':
+        response = HttpResponse(content_type='application/json')
+    elif encoding == 'base64':
+        # streamed: memory stays bounded by the chunk size whatever the size of the image
+        payload = {'id': game.pk, 'box_art_hash': game.box_art_hash}
+        response = StreamingHttpResponse(iter_json_with_base64(payload, 'box_art', img.open('rb')),
+                                         content_type='application/json')
+    else:
+        if is_rendition:
+            content_type = RENDITION_MEDIA_TYPES[ext]
+        else:
+            content_type, _ = mimetypes.guess_type(img.name)
+        response = _file_response(request, img, content_type or 'application/octet-stream', etag)
+
+    if etag:
+        response['ETag'] = etag
+    if size != ORIGINAL_SIZE:
+        patch_vary_headers(response, ['Accept'])
+
+    # only a versioned url is guaranteed to always point to the same bytes
+    if game.box_art_hash and request.GET.get('v') == box_art_version(game):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+
+    return response
+
+
+def get_default_box_art_mode() -> str:
+    return getattr(settings, 'BOX_ART_DEFAULT_MODE', 'base64')
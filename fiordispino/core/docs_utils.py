@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from fiordispino.serializers.game_serializer import GameSerializer
+from fiordispino.serializers.game_serializer import GameDetailSerializer, GameSerializer, TopGameSerializer
 from fiordispino.serializers.games_played_serializer import GamesPlayedSerializer
 from fiordispino.serializers.games_to_play_serializer import GamesToPlaySerializer
 
@@ -15,6 +15,30 @@ class GameDocsSerializer(GameSerializer):
         ref_name = 'GameResponseFixed'
 
 
+class RatingPercentilesDocsSerializer(serializers.Serializer):
+    p25 = serializers.FloatField(min_value=1.0, max_value=10.0, allow_null=True)
+    median = serializers.FloatField(min_value=1.0, max_value=10.0, allow_null=True)
+    p75 = serializers.FloatField(min_value=1.0, max_value=10.0, allow_null=True)
+    p90 = serializers.FloatField(min_value=1.0, max_value=10.0, allow_null=True)
+
+
+class GameDetailDocsSerializer(GameDocsSerializer):
+    rating_histogram = serializers.ListField(child=serializers.IntegerField(min_value=0), min_length=10, max_length=10,
+                                             read_only=True, help_text="Number of ratings of each value, from 1 to 10")
+    rating_percentiles = RatingPercentilesDocsSerializer(read_only=True)
+
+    class Meta(GameDetailSerializer.Meta):
+        ref_name = 'GameDetailResponseFixed'
+
+
+class TopGameDocsSerializer(GameDocsSerializer):
+    weighted_rating = serializers.FloatField(min_value=1.0, max_value=10.0, read_only=True,
+                                             help_text="Average of the ratings weighted towards the prior mean")
+
+    class Meta(TopGameSerializer.Meta):
+        ref_name = 'TopGameResponseFixed'
+
+
 class GamesToPlayResponseSerializer(GamesToPlaySerializer):
     game = GameDocsSerializer(read_only=True)
     id = serializers.IntegerField(min_value=1, max_value=99999, read_only=True)
@@ -94,6 +94,46 @@ class InvalidNumberOfGamesException(APIException):
      default_detail = "Number of games must be between 1 and 20"
      default_code = 'invalid_n_games'
 
+### BOX ART MODE PARAMETER ###
+class InvalidBoxArtModeException(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = "Box art mode must be one of: base64, url"
+    default_code = 'invalid_box_art_mode'
+
+### BOX ART SIZE PARAMETER ###
+class InvalidBoxArtSizeException(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = "Invalid box art size"
+    default_code = 'invalid_box_art_size'
+
+### BOX ART ENCODING PARAMETER ###
+class InvalidBoxArtEncodingException(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = "Box art encoding must be one of: raw, base64"
+    default_code = 'invalid_box_art_encoding'
+
+### FIELDS / EXPAND PARAMETERS ###
+class InvalidFieldsException(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = "Invalid field name"
+    default_code = 'invalid_fields'
+
+### SORT / FILTER PARAMETERS ###
+class InvalidSortException(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = "Invalid sort"
+    default_code = 'invalid_sort'
+
+class InvalidFilterException(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = "Invalid filter"
+    default_code = 'invalid_filter'
+
 ### IMAGES FORMAT ###
 class InvalidImageFormatException(ValidationError):
-    help_message = "Error in creating box art image, note that the image format must be jpg"
\ No newline at end of file
+    help_message = "Error in creating box art image, note that the image format must be jpg"
+class InvalidImageContentException(InvalidImageFormatException):
+    help_message = "Error in creating box art image, the file is not a valid jpg image"
+
+class ImageTooLargeException(ValidationError):
+    help_message = "Error in creating box art image, the image is too large"
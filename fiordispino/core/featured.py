@@ -0,0 +1,115 @@
+import hashlib
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from fiordispino.core.background import submit
+from fiordispino.core.sampling import sample_ids
+
+DEFAULT_PERIOD = 24 * 60 * 60
+DEFAULT_COUNT = 10
+DEFAULT_SEED = 'fiordispino'
+
+# a rebuild that takes longer than this is considered failed, and another one can start
+REBUILD_LOCK_TIMEOUT = 5 * 60
+
+GENERATION_KEY = 'featured:generation'
+
+
+def get_featured_settings() -> tuple:
+    return (getattr(settings, 'FEATURED_GAMES_PERIOD', DEFAULT_PERIOD),
+            getattr(settings, 'FEATURED_GAMES_COUNT', DEFAULT_COUNT),
+            getattr(settings, 'FEATURED_GAMES_SEED', DEFAULT_SEED))
+
+
+def rebuild_in_background() -> bool:
+    return getattr(settings, 'FEATURED_GAMES_BACKGROUND_REBUILD', True)
+
+
+def current_period(now=None) -> int:
+    # number of whole periods since the epoch: with the default period, the day (UTC)
+    period, _, _ = get_featured_settings()
+    return int(now if now is not None else time.time()) // period
+
+
+def seconds_left(period_index, now=None) -> int:
+    period, _, _ = get_featured_settings()
+    return max(0, (period_index + 1) * period - int(now if now is not None else time.time()))
+
+
+def featured_ids(queryset, period_index) -> list:
+    # the same seed and period always give the same games (as long as the catalogue is the same), on every process
+    _, count, seed = get_featured_settings()
+    return sample_ids(queryset, count, random.Random(f"{seed}:{period_index}"))
+
+
+def get_featured_ids(queryset, period_index) -> list:
+    # chosen once per period: games added later don't change the selection, only rebuilding the payload does
+    # (e.g. a deleted game disappears)
+    key = f'featured:ids:{period_index}'
+    ids = cache.get(key)
+    if ids is None:
+        period, _, _ = get_featured_settings()
+        # the first process to store them wins, all of them then serve the same games
+        cache.add(key, featured_ids(queryset, period_index), timeout=2 * period)
+        ids = cache.get(key, [])
+    return ids
+
+
+def get_generation() -> int:
+    # bumped when the catalogue changes, so that a game deleted or edited during the period doesn't stay featured as is
+    cache.add(GENERATION_KEY, 0, timeout=None)
+    return cache.get(GENERATION_KEY, 0)
+
+
+def invalidate_featured() -> None:
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # evicted: any other value makes every entry stale
+        cache.set(GENERATION_KEY, 1, timeout=None)
+
+
+def variant_key(*parts) -> str:
+    # every representation of the featured games (box art mode, fields, renderer...) is cached on its own
+    return 'featured:' + hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+
+
+def _build(key, version, build):
+    payload = build()
+    # kept after the period too: it is what is served while the next one is being built
+    cache.set(key, (version, payload), timeout=None)
+    return payload
+
+
+def _rebuild(key, version, build):
+    try:
+        _build(key, version, build)
+    finally:
+        cache.delete(f'{key}:rebuilding')
+
+
+def get_featured_payload(key, build, now=None):
+    """
+    The featured games of the current period, as built by `build(period_index)` (e.g. the serialized games), from the
+    cache. A payload of an older period (or of a catalogue that changed since) is still returned as is while a single
+    background job builds the new one, so a request never waits for it: just the very first one, with an empty cache.
+    Returns the payload and the period it belongs to.
+    """
+    period_index = current_period(now)
+    version = (period_index, get_generation())
+
+    entry = cache.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1], period_index
+
+    if entry is None or not rebuild_in_background():
+        return _build(key, version, lambda: build(period_index)), period_index
+
+    # stale: the first request to notice starts the rebuild, the others (and this one) keep serving the old payload
+    if cache.add(f'{key}:rebuilding', True, timeout=REBUILD_LOCK_TIMEOUT):
+        submit(_rebuild, key, version, lambda: build(period_index))
+
+    return entry[1], entry[0][0]
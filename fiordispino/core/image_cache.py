@@ -0,0 +1,119 @@
+import os
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models.fields.files import FieldFile
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_ENTRY_BYTES = 4 * 1024 * 1024
+
+
+def storage_location(storage, name: str) -> str:
+    # the absolute path when the storage is local, so that files with the same name in different storages don't clash
+    try:
+        return storage.path(name)
+    except NotImplementedError:
+        return name
+
+
+def file_location(img: FieldFile) -> str:
+    return storage_location(img.storage, img.name)
+
+
+def file_identity(img: FieldFile) -> tuple:
+    # (location, size, mtime) changes whenever the stored file does, so a stale entry can never be returned.
+    # Raises OSError if the file doesn't exist
+    location = file_location(img)
+    if location == img.name:
+        # remote storages have no local path, ask them (it may cost a round trip, still cheaper than a download)
+        storage = img.storage
+        return location, storage.size(img.name), storage.get_modified_time(img.name).timestamp()
+
+    stat = os.stat(location)
+    return location, stat.st_size, stat.st_mtime_ns
+
+
+class EncodedImageCache:
+    """
+    In-process LRU cache of base64 encoded images (and raw ones, for binary formats), bounded by the total size
+    of the cached values.
+    Limits are read from the settings (BOX_ART_CACHE_MAX_BYTES, BOX_ART_CACHE_MAX_ENTRY_BYTES) every time,
+    so that they can be changed without restarting.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_bytes(self):
+        return getattr(settings, 'BOX_ART_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+
+    @property
+    def max_entry_bytes(self):
+        return getattr(settings, 'BOX_ART_CACHE_MAX_ENTRY_BYTES', DEFAULT_MAX_ENTRY_BYTES)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value) -> None:
+        size = len(value)  # bytes, or base64 that is ascii: one byte per character
+
+        # a single huge image would flush the whole cache
+        if size > self.max_entry_bytes or size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+
+            self._entries[key] = value
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def invalidate(self, location: str) -> None:
+        # drops every version of a file, location is what file_identity returns as first element
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == location]:
+                self._bytes -= len(self._entries.pop(key))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+# shared by every request served by this process
+box_art_cache = EncodedImageCache()
@@ -0,0 +1,43 @@
+import base64
+from io import BytesIO
+
+from PIL import Image, features
+
+# longest side of the preview: a few hundred bytes, meant to be blurred/stretched by the client while the cover loads
+PREVIEW_SIZE = 16
+PREVIEW_QUALITY = 50
+
+# colors the image is reduced to before picking the dominant one
+DOMINANT_COLORS = 4
+
+
+def dominant_color(source: Image.Image) -> str:
+    # the most frequent color of a reduced palette: unlike the average it doesn't turn every cover into brownish grey
+    small = source.copy()
+    small.thumbnail((64, 64))
+
+    quantized = small.quantize(colors=DOMINANT_COLORS)
+    _, index = max(quantized.getcolors())
+    r, g, b = quantized.getpalette()[index * 3:index * 3 + 3]
+
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def tiny_preview(source: Image.Image) -> str:
+    # returns a data uri, so the frontend can use it as it is in an <img> tag
+    preview = source.copy()
+    preview.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE), Image.Resampling.LANCZOS)
+
+    fmt, media_type = ('WEBP', 'image/webp') if features.check('webp') else ('JPEG', 'image/jpeg')
+    buffer = BytesIO()
+    preview.save(buffer, format=fmt, quality=PREVIEW_QUALITY)
+
+    return f"data:{media_type};base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}"
+
+
+def compute_placeholder(source: Image.Image) -> dict:
+    # the fields stored on Game, `source` is the decoded box art
+    return {
+        'box_art_color': dominant_color(source),
+        'box_art_preview': tiny_preview(source),
+    }
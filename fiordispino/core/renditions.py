@@ -0,0 +1,140 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models.fields.files import FieldFile
+from django.http.request import MediaType
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+from typeguard import typechecked
+
+ORIGINAL_SIZE = 'original'
+
+# longest side (in px) of every rendition, list views only need ~200px covers
+DEFAULT_RENDITION_SIZES = {
+    'thumb': 200,
+    'medium': 600,
+}
+
+# pillow format -> file extension, ordered from the most to the least preferred one
+RENDITION_FORMATS = {
+    'AVIF': 'avif',
+    'WEBP': 'webp',
+    'JPEG': 'jpg',
+}
+
+RENDITION_MEDIA_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+    'jpg': 'image/jpeg',
+}
+
+RENDITION_QUALITY = 80
+
+
+def get_rendition_sizes() -> dict:
+    return getattr(settings, 'BOX_ART_RENDITION_SIZES', DEFAULT_RENDITION_SIZES)
+
+
+def get_box_art_sizes() -> tuple:
+    return (ORIGINAL_SIZE, *get_rendition_sizes())
+
+
+def get_available_extensions() -> list:
+    # avif/webp support depends on how pillow was built, jpeg is always there
+    return [ext for fmt, ext in RENDITION_FORMATS.items() if fmt == 'JPEG' or features.check(fmt.lower())]
+
+
+@typechecked
+def rendition_name(name: str, size: str, ext: str) -> str:
+    # renditions are stored next to the original: games/covers/zelda_cover.jpg -> games/covers/zelda_cover.thumb.webp
+    stem, _ = os.path.splitext(name)
+    return f"{stem}.{size}.{ext}"
+
+
+def load_box_art(img: FieldFile):
+    # decodes the stored image (upright, RGB), None if it isn't a decodable image
+    try:
+        with img.open('rb') as image_file:
+            with Image.open(image_file) as source:
+                return ImageOps.exif_transpose(source).convert('RGB')
+    except (OSError, ValueError, UnidentifiedImageError):
+        return None
+
+
+def generate_renditions(img: FieldFile, source=None) -> list:
+    # (re)creates every size/format of the image and returns the stored names, `source` is the already decoded image.
+    # Files that are not decodable images get no renditions, the original is then served for every size
+    if source is None:
+        source = load_box_art(img)
+    if source is None:
+        return []
+
+    names = []
+    for size, max_side in get_rendition_sizes().items():
+        rendition = source.copy()
+        rendition.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+        for fmt, ext in RENDITION_FORMATS.items():
+            if ext not in get_available_extensions():
+                continue
+
+            buffer = BytesIO()
+            rendition.save(buffer, format=fmt, quality=RENDITION_QUALITY)
+
+            name = rendition_name(img.name, size, ext)
+            # storages never overwrite, they would pick a new name instead
+            img.storage.delete(name)
+            names.append(img.storage.save(name, ContentFile(buffer.getvalue())))
+
+    return names
+
+
+def rendition_names(name: str) -> list:
+    return [rendition_name(name, size, ext) for size in get_rendition_sizes() for ext in RENDITION_FORMATS.values()]
+
+
+def renditions_exist(img: FieldFile) -> bool:
+    return all(
+        img.storage.exists(rendition_name(img.name, size, ext))
+        for size in get_rendition_sizes() for ext in get_available_extensions()
+    )
+
+
+def delete_renditions(img: FieldFile) -> None:
+    for name in rendition_names(img.name):
+        img.storage.delete(name)
+
+
+def get_box_art_file(game, size: str = ORIGINAL_SIZE, ext: str = 'jpg') -> FieldFile:
+    # returns the requested rendition as a field file, falling back to the original if it was never generated
+    return get_rendition_file(game.box_art, size, ext)
+
+
+def get_rendition_file(img: FieldFile, size: str = ORIGINAL_SIZE, ext: str = 'jpg') -> FieldFile:
+    if size == ORIGINAL_SIZE or not img:
+        return img
+
+    name = rendition_name(img.name, size, ext)
+    if not img.storage.exists(name):
+        return img
+
+    return FieldFile(img.instance, img.field, name)
+
+
+def negotiate_extension(accept: str) -> str:
+    # picks the format the client prefers (highest q, then our order) among the ones it supports, q=0 rules one out.
+    # avif and webp must be named: browsers send */* for images too. jpeg is understood by everyone
+    qualities = {}
+    for media_type in (MediaType(token.strip().lower()) for token in accept.split(',')):
+        qualities.setdefault(f'{media_type.main_type}/{media_type.sub_type}', media_type.quality)
+
+    candidates = []
+    for preference, ext in enumerate(get_available_extensions()):
+        quality = qualities.get(RENDITION_MEDIA_TYPES[ext])
+        if quality is None and ext == 'jpg':
+            quality = qualities.get('image/*', qualities.get('*/*'))
+        if quality:
+            candidates.append((quality, -preference, ext))
+
+    return max(candidates)[2] if candidates else 'jpg'
@@ -0,0 +1,100 @@
+import random
+
+# most ids probed in a single query, keeps the IN (...) under the database limits on the number of parameters
+MAX_CANDIDATES = 500
+
+# rounds of random probes before the remaining games are picked by seeking the index
+SAMPLING_ROUNDS = 3
+
+# how many more ids than needed are probed: the catalogue has gaps (deleted games), not every id exists
+OVERSAMPLING = 2
+
+
+def id_bounds(queryset) -> tuple:
+    # the two ends of the primary key index, whatever the size of the table. Two queries: SQLite reads a lone MIN() or
+    # MAX() from the index, but scans the whole table for both at once
+    ids = queryset.values_list('pk', flat=True)
+    return ids.order_by('pk').first(), ids.order_by('-pk').first()
+
+
+def _probe(queryset, candidates) -> set:
+    return set(queryset.filter(pk__in=candidates).values_list('pk', flat=True))
+
+
+def _seek(queryset, start, exclude) -> int:
+    # the first id from `start` on (wrapping around at the end): always finds a game if there is one left,
+    # at the cost of favouring the ids that follow a gap, so it is just the fallback of the probes
+    remaining = queryset.exclude(pk__in=exclude).values_list('pk', flat=True)
+    return (remaining.filter(pk__gte=start).order_by('pk').first()
+            or remaining.filter(pk__lt=start).order_by('-pk').first())
+
+
+def sample_ids(queryset, n, rng=None) -> list:
+    """
+    Up to `n` random ids of `queryset`, in random order, without ORDER BY RANDOM(): that one numbers and sorts the whole
+    table on every call, here the cost depends on `n` only.
+    Random ids are drawn between the smallest and the largest one and looked up in the primary key index, the ones that
+    don't exist (deleted games, or filtered out) are drawn again, growing the draw with the share that was missing.
+    """
+    rng = rng or random
+    low, high = id_bounds(queryset)
+    if low is None or n <= 0:
+        return []
+
+    span = high - low + 1
+    found = set()
+    density = 1.0
+    exhausted = False
+
+    for _ in range(SAMPLING_ROUNDS):
+        missing = n - len(found)
+        size = min(span, MAX_CANDIDATES, int(missing * OVERSAMPLING / density) + 1)
+
+        candidates = rng.sample(range(low, high + 1), size)
+        hits = _probe(queryset, candidates)
+        found |= hits
+
+        # every id was probed: there is nothing else to find
+        exhausted = size == span
+        if exhausted or len(found) >= n:
+            break
+
+        density = max(len(hits) / size, 1 / MAX_CANDIDATES)
+
+    # very sparse ranges: the rest is found one index seek at a time
+    while not exhausted and len(found) < n:
+        pk = _seek(queryset, rng.randint(low, high), found)
+        if pk is None:
+            break
+        found.add(pk)
+
+    # sorted first, so that the same rng picks the same games whatever the order of the set
+    return rng.sample(sorted(found), min(n, len(found)))
+
+
+# how many uniformly sampled candidates each weighted pick is made from
+WEIGHTED_POOL = 5
+
+# ?weight= name -> (columns, function of their values returning a positive weight)
+RANDOM_WEIGHTS = {
+    # the best rated games, an unrated one still has a chance
+    'rating': (('global_rating',), lambda global_rating: 1 + float(global_rating)),
+    # the games few players rated
+    'exposure': (('rating_count',), lambda rating_count: 1 / (1 + rating_count)),
+}
+
+
+def weighted_sample_ids(queryset, n, weight, rng=None) -> list:
+    """
+    Like sample_ids, but games with a higher weight (see RANDOM_WEIGHTS) come up more often.
+    The weights are compared within a uniform sample WEIGHTED_POOL times larger than `n` (Efraimidis-Spirakis: each
+    candidate gets the key random() ** (1 / weight), the highest keys win), so no query ever reads the whole catalogue.
+    """
+    rng = rng or random
+    columns, function = RANDOM_WEIGHTS[weight]
+
+    pool = sample_ids(queryset, n * WEIGHTED_POOL, rng)
+    rows = sorted(queryset.filter(pk__in=pool).values_list('pk', *columns))
+
+    keys = [(rng.random() ** (1 / function(*values)), pk) for pk, *values in rows]
+    return [pk for _, pk in sorted(keys, reverse=True)[:n]]
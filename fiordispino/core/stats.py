@@ -0,0 +1,170 @@
+import math
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+
+from fiordispino.models import Game, GamePlayed
+from fiordispino.models.game import weighted_rating_prior
+
+RATINGS = range(1, 11)
+
+# the columns counting the ratings of each value (ratings_1 ... ratings_10), the histogram of the game page
+HISTOGRAM_FIELDS = tuple(f'ratings_{rating}' for rating in RATINGS)
+
+# every column derived from the ratings of a game
+STATS_FIELDS = ('global_rating', 'weighted_rating', 'rating_sum', 'rating_count', *HISTOGRAM_FIELDS)
+
+# the percentiles returned with the histogram, by name
+RATING_PERCENTILES = {'p25': 25, 'median': 50, 'p75': 75, 'p90': 90}
+
+
+def rating_average(total, count):
+    # the global rating as stored by the database: sum / count to one decimal, 0 for a game nobody rated.
+    # Computed in SQL, so that the stats of a game are updated in a single statement
+    return Coalesce(
+        Round(Cast(total, FloatField()) / NullIf(count, Value(0)), 1),
+        Value(0.0),
+        output_field=DecimalField(max_digits=3, decimal_places=1),
+    )
+
+
+def weighted_average(total, count):
+    # the weighted rating: (votes * mean + sum) / (votes + count), where `votes` imaginary ratings of `mean` pull the
+    # games few players rated towards the mean. The same expression for updates and recomputes, so they agree exactly
+    mean, votes = weighted_rating_prior()
+    return ExpressionWrapper(
+        (Cast(total, FloatField()) + Value(float(votes * mean))) / (count + Value(votes)),
+        output_field=FloatField(),
+    )
+
+
+def rating_changes(added=None, removed=None) -> dict:
+    # the update() arguments counting the rating `added` and no longer counting the rating `removed` (both for an edit).
+    # the ratings come first and are computed from the old values: MySQL assigns the columns left to right,
+    # the other backends read every right hand side before assigning anything
+    total = (added or 0) - (removed or 0)
+    count = (added is not None) - (removed is not None)
+    new_sum, new_count = F('rating_sum') + total, F('rating_count') + count
+
+    changes = {
+        'global_rating': rating_average(new_sum, new_count),
+        'weighted_rating': weighted_average(new_sum, new_count),
+        'rating_sum': new_sum,
+        'rating_count': new_count,
+    }
+    # the model validates the ratings, rows written around it (e.g. fixtures) only miss the histogram
+    if added in RATINGS:
+        changes[f'ratings_{added}'] = F(f'ratings_{added}') + 1
+    if removed in RATINGS:
+        changes[f'ratings_{removed}'] = F(f'ratings_{removed}') - 1
+    return changes
+
+
+def apply_rating_change(game_id, added=None, removed=None) -> None:
+    """
+    Updates the stats of a game for a new rating (`added`), a deleted one (`removed`) or an edit (both). A single UPDATE
+    that doesn't read the ratings: a vote costs the same whatever the number of players that rated the game, and
+    concurrent votes can't overwrite each other.
+    """
+    if added != removed:
+        Game.objects.filter(pk=game_id).update(**rating_changes(added, removed))
+
+
+def _ratings(aggregate):
+    # `aggregate` of the ratings of the game being updated
+    ratings = GamePlayed.objects.filter(game=OuterRef('pk')).order_by().values('game')
+    return Coalesce(Subquery(ratings.annotate(value=aggregate).values('value')), 0)
+
+
+def recompute_stats(game_ids) -> int:
+    """
+    Recomputes the stats of the given games from all their ratings, in a single UPDATE with correlated subqueries: the
+    ratings are read by the statement that writes the stats, there is no window in which a new vote could get lost.
+    """
+    total, count = _ratings(Sum('rating')), _ratings(Count('id'))
+    return Game.objects.filter(pk__in=game_ids).update(
+        global_rating=rating_average(total, count),
+        weighted_rating=weighted_average(total, count),
+        rating_sum=total,
+        rating_count=count,
+        **{f'ratings_{rating}': _ratings(Count('id', filter=Q(rating=rating))) for rating in RATINGS},
+    )
+
+
+def recomputed_stats(queryset):
+    # the games of `queryset` with their stats computed from scratch out of all their ratings (grouped aggregate),
+    # as computed_<field> for each of STATS_FIELDS
+    return (queryset
+            .annotate(computed_rating_sum=Coalesce(Sum('played_by_user__rating'), 0),
+                      computed_rating_count=Count('played_by_user'),
+                      **{f'computed_ratings_{rating}': Count('played_by_user', filter=Q(played_by_user__rating=rating))
+                         for rating in RATINGS})
+            .annotate(computed_global_rating=rating_average(F('computed_rating_sum'), F('computed_rating_count')),
+                      computed_weighted_rating=weighted_average(F('computed_rating_sum'),
+                                                                F('computed_rating_count'))))
+
+
+def stats_mismatches(queryset) -> list:
+    """
+    (game, fields) for every game of `queryset` whose stored stats differ from a full recompute, where fields maps each
+    wrong field to its (stored, expected) values.
+    """
+    mismatches = []
+    for game in recomputed_stats(queryset).only('id', 'title', *STATS_FIELDS):
+        fields = {
+            field: (getattr(game, field), getattr(game, f'computed_{field}'))
+            for field in STATS_FIELDS
+            if getattr(game, field) != getattr(game, f'computed_{field}')
+        }
+        if fields:
+            mismatches.append((game, fields))
+    return mismatches
+
+
+def describe_mismatch(game, fields) -> str:
+    details = ', '.join(f'{field} {stored} -> {expected}' for field, (stored, expected) in fields.items())
+    return f'Game {game.pk} "{game.title}": {details}'
+
+
+def store_stats(mismatches) -> None:
+    # writes the recomputed values of stats_mismatches(). A bulk_update per set of wrong fields: building the CASE of
+    # every field for every game is what takes the longest, usually just a few of them are wrong
+    games = {}
+    for game, fields in mismatches:
+        for field, (_, expected) in fields.items():
+            setattr(game, field, expected)
+        games.setdefault(tuple(fields), []).append(game)
+
+    for fields, group in games.items():
+        Game.objects.bulk_update(group, fields)
+
+
+def rating_histogram(game) -> list:
+    # how many players gave the game each rating, from 1 to 10
+    return [getattr(game, field) for field in HISTOGRAM_FIELDS]
+
+
+def _rating_at(histogram, index):
+    # the rating at `index` (from 0) of all the ratings sorted
+    for rating, count in zip(RATINGS, histogram):
+        if index < count:
+            return rating
+        index -= count
+
+
+def rating_percentile(histogram, percentile):
+    """
+    The percentile of the ratings counted by `histogram`, interpolated between the two closest ranks (like numpy does
+    by default). Exact, since every rating is an integer: the buckets hold the ratings themselves. None without ratings.
+    """
+    count = sum(histogram)
+    if not count:
+        return None
+
+    position = percentile / 100 * (count - 1)
+    lower, upper = _rating_at(histogram, math.floor(position)), _rating_at(histogram, math.ceil(position))
+    return round(lower + (upper - lower) * (position - math.floor(position)), 2)
+
+
+def rating_percentiles(histogram) -> dict:
+    return {name: rating_percentile(histogram, percentile) for name, percentile in RATING_PERCENTILES.items()}
@@ -0,0 +1,137 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from fiordispino.core.background import schedule
+from fiordispino.core.stats import recompute_stats
+from fiordispino.models import DirtyGame
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 5
+DEFAULT_BATCH_SIZE = 500
+
+
+def deferred_stats() -> bool:
+    return getattr(settings, 'GAME_STATS_DEFERRED', False)
+
+
+class DirtyGames:
+    """
+    The games whose ratings changed since their stats were last computed (deferred stats mode, GAME_STATS_DEFERRED).
+    The changes are DirtyGame rows, written with the votes: a process killed before its flush loses nothing, the next
+    flush of any process counts them. However many votes a game gets in the meantime, a flush recomputes its stats once, for
+    GAME_STATS_BATCH_SIZE games per query. The first change after a flush schedules the next one
+    GAME_STATS_FLUSH_INTERVAL seconds later (None: only when flush() is called, e.g. by the tests).
+    The staleness window (how long a vote waits to be counted) is measured by every flush and exposed in last_flush.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timer = None
+        self.last_flush = None
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'GAME_STATS_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'GAME_STATS_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+    @property
+    def scheduled(self) -> bool:
+        # whether this process has a flush to run
+        return self._timer is not None
+
+    def __len__(self):
+        return DirtyGame.objects.values('game').distinct().count()
+
+    def _schedule(self):
+        with self._lock:
+            if self._timer is None and self.flush_interval:
+                self._timer = schedule(self.flush_interval, self.flush)
+
+    def mark(self, game_id) -> None:
+        # in the transaction of the change: the mark is committed with it, or rolled back with it. The flush must see
+        # the committed rating, it is scheduled once it is there
+        DirtyGame.objects.create(game_id=game_id)
+        transaction.on_commit(self._schedule)
+
+    def cancel(self) -> None:
+        # stops the scheduled flush, the dirty games stay marked
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def staleness(self) -> float:
+        # seconds since the oldest change that the stats don't show yet (0 if they are up to date)
+        oldest = DirtyGame.objects.aggregate(oldest=Min('marked_at'))['oldest']
+        return 0.0 if oldest is None else (timezone.now() - oldest).total_seconds()
+
+    def flush(self) -> int:
+        """
+        Recomputes the stats of every dirty game, returns how many there were.
+        """
+        with self._lock:
+            self._timer = None
+
+        # the changes marked from now on are left to the next flush
+        last = DirtyGame.objects.aggregate(last=Max('id'))['last']
+        if last is None:
+            return 0
+
+        start = time.monotonic()
+        pending = DirtyGame.objects.filter(id__lte=last)
+        oldest = pending.aggregate(oldest=Min('marked_at'))['oldest']
+        # always in the same order: concurrent flushes (e.g. of two processes) lock the game rows in the same order
+        ids = list(pending.order_by('game').values_list('game', flat=True).distinct())
+        try:
+            for i in range(0, len(ids), self.batch_size):
+                recompute_stats(ids[i:i + self.batch_size])
+        except Exception:
+            # recomputing is idempotent, the next flush just does them all again
+            self._schedule()
+            raise
+        pending.delete()
+
+        end = time.monotonic()
+        self.last_flush = {
+            'games': len(ids),
+            'duration': end - start,
+            # the longest a change waited to be counted
+            'staleness': (timezone.now() - oldest).total_seconds(),
+        }
+        logger.info("Recomputed the stats of %d games in %.3fs, staleness %.3fs",
+                    len(ids), self.last_flush['duration'], self.last_flush['staleness'])
+        return len(ids)
+
+
+dirty_games = DirtyGames()
+
+
+def mark_dirty(game_id) -> None:
+    dirty_games.mark(game_id)
+
+
+def flush_stats() -> int:
+    # synchronous flush, e.g. for the tests or before shutting down
+    return dirty_games.flush()
+
+
+@atexit.register
+def _flush_at_exit():
+    # the changes are kept in the database anyway, this only counts them before the next flush of another process
+    if not dirty_games.scheduled:
+        return
+    try:
+        flush_stats()
+    except Exception:
+        logger.exception("Could not flush the game stats at exit")
@@ -0,0 +1,59 @@
+import os
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Storage for files named after the digest of their content (see build_path in models/game.py).
+    Two files with the same name have the same content by construction, so an existing file is reused
+    instead of being stored again under an alternative name, and overwriting one (two requests storing the
+    same image at the same time) is harmless.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(*args, **kwargs)
+
+    def get_available_name(self, name, max_length=None):
+        if self.exists(name):
+            return name
+
+        return super().get_available_name(name, max_length=max_length)
+
+    def _save(self, name, content):
+        # identical upload: nothing to write
+        if self.exists(name):
+            return name
+
+        return super()._save(name, content)
+
+    def delete_unreferenced(self, names, is_referenced) -> bool:
+        """
+        Deletes the files (e.g. an image and its renditions) unless is_referenced() says they are used.
+        A game reusing them (see _save) may be committed in the meantime: the files are moved out of reach before
+        checking again, so that game is either seen by the second check or finds the image gone once committed and
+        stores it again (see signals.py). Returns whether the files have been deleted.
+        """
+        if is_referenced():
+            return False
+
+        suffix = f'.{uuid.uuid4().hex}.released'
+        released = []
+        for name in names:
+            try:
+                os.replace(self.path(name), self.path(name + suffix))
+            except FileNotFoundError:
+                # never generated, or being released by another request
+                continue
+            released.append(name)
+
+        if is_referenced():
+            for name in released:
+                os.replace(self.path(name + suffix), self.path(name))
+            return False
+
+        for name in released:
+            os.remove(self.path(name + suffix))
+        return True
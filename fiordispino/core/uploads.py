@@ -0,0 +1,69 @@
+import warnings
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files import File
+from PIL import Image, UnidentifiedImageError
+from typeguard import typechecked
+
+from fiordispino.core.exceptions import ImageTooLargeException, InvalidImageContentException
+
+DEFAULT_MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+DEFAULT_MAX_DIMENSION = 6000
+DEFAULT_MAX_PIXELS = 24_000_000
+DEFAULT_JPEG_QUALITY = 85
+
+
+def get_upload_limits() -> tuple:
+    return (
+        getattr(settings, 'BOX_ART_MAX_UPLOAD_BYTES', DEFAULT_MAX_UPLOAD_BYTES),
+        getattr(settings, 'BOX_ART_MAX_DIMENSION', DEFAULT_MAX_DIMENSION),
+        getattr(settings, 'BOX_ART_MAX_PIXELS', DEFAULT_MAX_PIXELS),
+    )
+
+
+@typechecked
+def check_box_art_upload(value: File) -> None:
+    # only the header is parsed to know the dimensions, so a decompression bomb (a few kb that would decode
+    # to gigabytes) is rejected without ever being decoded. verify() then walks the file looking for corruption
+    max_bytes, max_dimension, max_pixels = get_upload_limits()
+
+    if value.size is not None and value.size > max_bytes:
+        raise ImageTooLargeException(f"Please keep the box art under {max_bytes // (1024 * 1024)} MB")
+
+    try:
+        value.seek(0)
+        with warnings.catch_warnings():
+            # pillow only warns for images between MAX_IMAGE_PIXELS and twice as much
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            with Image.open(value) as image:
+                width, height = image.size
+                if width > max_dimension or height > max_dimension or width * height > max_pixels:
+                    raise ImageTooLargeException(
+                        f"Please keep the box art under {max_dimension}x{max_dimension} pixels")
+
+                if image.format != 'JPEG':
+                    raise InvalidImageContentException("Invalid image format, please use .jpg")
+
+                image.verify()
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise ImageTooLargeException(f"Please keep the box art under {max_dimension}x{max_dimension} pixels")
+    except (OSError, SyntaxError, ValueError, UnidentifiedImageError):
+        raise InvalidImageContentException("The box art is not a valid jpg image")
+    finally:
+        value.seek(0)
+
+
+def normalize_box_art(source) -> bytes:
+    # `source` is the decoded, already upright image: re-encoding it drops every metadata (exif, gps, comments,
+    # thumbnails) and a progressive jpeg can be painted while it's still being downloaded
+    source.info = {}
+
+    buffer = BytesIO()
+    source.save(buffer, format='JPEG', quality=getattr(settings, 'BOX_ART_JPEG_QUALITY', DEFAULT_JPEG_QUALITY),
+                optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def process_in_background() -> bool:
+    return getattr(settings, 'BOX_ART_BACKGROUND_PROCESSING', True)
@@ -1,11 +1,15 @@
 import re
-from typing import Callable
+import json
+from typing import Callable, BinaryIO, Iterator
 import base64
 
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models import ImageField
 from django.db.models.fields.files import FieldFile
 from typeguard import typechecked
 from fiordispino.core.exceptions import ImageEncoderException
+from fiordispino.core.image_cache import box_art_cache, file_identity
 
 @typechecked
 def pattern(regex: str) -> Callable[[str], bool]:
@@ -15,15 +19,75 @@ def pattern(regex: str) -> Callable[[str], bool]:
     res.__name__ = f'pattern({regex})'
     return res
 
+# 3 bytes become 4 base64 characters: chunks that are multiple of 3 can be encoded independently and concatenated
+DEFAULT_BASE64_CHUNK_SIZE = 3 * 64 * 1024
+
+
+def get_base64_chunk_size() -> int:
+    chunk_size = getattr(settings, 'BOX_ART_BASE64_CHUNK_SIZE', DEFAULT_BASE64_CHUNK_SIZE)
+    return max(3, chunk_size - chunk_size % 3)
+
+
+def iter_base64(image_file: BinaryIO, chunk_size: int = None) -> Iterator[str]:
+    # encodes the file a chunk at a time, only one chunk (and its encoding) is in memory at any moment
+    chunk_size = chunk_size or get_base64_chunk_size()
+
+    while chunk := image_file.read(chunk_size):
+        yield base64.b64encode(chunk).decode('ascii')
+
+
+def iter_json_with_base64(data: dict, key: str, image_file: BinaryIO) -> Iterator[str]:
+    # streams `data` as a json object with the (base64 encoded) image as last member, without ever holding it in memory.
+    # The file is closed once the stream is over
+    try:
+        head = json.dumps(data, cls=DjangoJSONEncoder)[:-1]
+        separator = ', ' if data else ''
+        yield f'{head}{separator}{json.dumps(key)}: "'
+
+        yield from iter_base64(image_file)
+
+        yield '"}'
+    finally:
+        image_file.close()
+
+
 @typechecked
 def encode_image_to_base64(img: FieldFile) -> str: # the image is saved as an image file, however at runtime image fields are handled with a field file proxy
     if not img:
         raise ImageEncoderException(detail="No box art found for game")
 
     try:
-        with img.open('rb') as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
+        # a stat is way cheaper than reading and encoding the whole image again
+        key = file_identity(img)
+        encoded_string = box_art_cache.get(key)
+
+        if encoded_string is None:
+            # chunked, so that the raw image is never fully in memory next to its encoding
+            with img.open('rb') as image_file:
+                encoded_string = ''.join(iter_base64(image_file))
+            box_art_cache.put(key, encoded_string)
 
         return encoded_string
     except:
         raise ImageEncoderException()
+
+
+@typechecked
+def read_image_bytes(img: FieldFile) -> bytes:
+    # the raw image, for the formats that carry binary data (e.g. MessagePack): no base64 overhead
+    if not img:
+        raise ImageEncoderException(detail="No box art found for game")
+
+    try:
+        # same cache of the base64 images, told apart by the last element of the key
+        key = (*file_identity(img), 'raw')
+        content = box_art_cache.get(key)
+
+        if content is None:
+            with img.open('rb') as image_file:
+                content = image_file.read()
+            box_art_cache.put(key, content)
+
+        return content
+    except:
+        raise ImageEncoderException()
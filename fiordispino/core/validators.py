@@ -1,8 +1,12 @@
 from fiordispino.core.exceptions import *
 from valid8 import validate, ValidationError as Valid8Err
 from .utils import *
+from .box_art import BOX_ART_MODES, BOX_ART_ENCODINGS
+from .sampling import RANDOM_WEIGHTS
+from .renditions import get_box_art_sizes
+from .uploads import check_box_art_upload
 from decimal import Decimal
-from typing import Union
+from typing import Sequence, Union
 from django.contrib.auth.validators import ASCIIUsernameValidator
 from django.core.exceptions import ValidationError
 from django.core.files import File
@@ -105,7 +109,71 @@ def validate_random_games_limit(value: str) -> None:
     except (Valid8Err, ValueError, TypeError):
         raise InvalidNumberOfGamesException("Please keep n_games between 1 and 20")
 
+@typechecked
+def validate_box_art_mode(value: str) -> None:
+    if value not in BOX_ART_MODES:
+        raise InvalidBoxArtModeException(f"Please use one of the following box art modes: {', '.join(BOX_ART_MODES)}")
+
+@typechecked
+def validate_box_art_size(value: str) -> None:
+    sizes = get_box_art_sizes()
+
+    if value not in sizes:
+        raise InvalidBoxArtSizeException(f"Please use one of the following box art sizes: {', '.join(sizes)}")
+
+@typechecked
+def validate_box_art_encoding(value: str) -> None:
+    if value not in BOX_ART_ENCODINGS:
+        raise InvalidBoxArtEncodingException(f"Please use one of the following box art encodings: {', '.join(BOX_ART_ENCODINGS)}")
+
+@typechecked
+def validate_sort(value: str, sorts: Sequence[str]) -> None:
+    if value not in sorts:
+        raise InvalidSortException(f"Please use one of the following sorts: {', '.join(sorts)}")
+
+@typechecked
+def validate_rating_filter(value: str) -> None:
+    try:
+        validate("rating", int(value), min_value=1, max_value=10)
+    except (Valid8Err, ValueError):
+        raise InvalidFilterException("Please note that the rating filters must be integers between 1 and 10")
+
+@typechecked
+def validate_pegi_filter(value: str) -> None:
+    try:
+        validate_pegi(int(value))
+    except (PegiException, ValueError):
+        raise InvalidFilterException("Please note that pegi must be a value in: 3, 7, 12, 16, 18")
+
+@typechecked
+def validate_genre_filter(value: str) -> None:
+    try:
+        # ids are 64 bit integers, a bigger number would overflow the query parameter
+        validate("genre", int(value), min_value=1, max_value=2**63 - 1)
+    except (Valid8Err, ValueError):
+        raise InvalidFilterException("Please note that genre must be the id of a genre")
+
+@typechecked
+def validate_global_rating_filter(value: str) -> None:
+    try:
+        validate_global_rating(float(value))
+    except (GlobalRatingException, ValueError):
+        raise InvalidFilterException("Please note that the global rating filter must be a number between 0 and 10")
+
+@typechecked
+def validate_boolean_filter(value: str) -> None:
+    if value not in ('true', 'false'):
+        raise InvalidFilterException("Please use true or false")
+
+@typechecked
+def validate_random_weight(value: str) -> None:
+    if value not in RANDOM_WEIGHTS:
+        raise InvalidFilterException(f"Please use one of the following weights: {', '.join(RANDOM_WEIGHTS)}")
+
 @typechecked
 def validate_box_art(value: File) -> None:
     if not value.name.lower().endswith('.jpg'):
         raise InvalidImageFormatException("Invalid image format, please use .jpg")
+
+    # the content, not just the name: a corrupt file or a decompression bomb is rejected before it's ever stored
+    check_box_art_upload(value)
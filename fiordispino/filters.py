@@ -0,0 +1,196 @@
+from decimal import Decimal
+
+from django.db.models import Exists, OuterRef
+from rest_framework.filters import BaseFilterBackend
+
+from fiordispino.core.exceptions import InvalidFilterException
+from fiordispino.core.validators import (
+    validate_boolean_filter,
+    validate_genre_filter,
+    validate_global_rating_filter,
+    validate_pegi_filter,
+    validate_rating_filter
+)
+from fiordispino.models import Game, GamePlayed, GamesToPlay
+
+
+def has_rating(model) -> bool:
+    return any(field.name == 'rating' for field in model._meta.fields)
+
+
+class LibraryFilterBackend(BaseFilterBackend):
+    """
+    Filters the entries of a library (games to play, games played) on their game (?genre=, ?pegi=) and, for the
+    libraries that have one, on their rating (?rating_min=, ?rating_max=, inclusive).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        genre = params.get('genre')
+        if genre is not None:
+            validate_genre_filter(genre)
+            # a single genre: the join can't return an entry twice
+            queryset = queryset.filter(game__genres=int(genre))
+
+        pegi = params.get('pegi')
+        if pegi is not None:
+            validate_pegi_filter(pegi)
+            queryset = queryset.filter(game__pegi=int(pegi))
+
+        for param, lookup in (('rating_min', 'rating__gte'), ('rating_max', 'rating__lte')):
+            value = params.get(param)
+            if value is None:
+                continue
+
+            if not has_rating(queryset.model):
+                raise InvalidFilterException(f"{param} is only available for rated games")
+
+            validate_rating_filter(value)
+            queryset = queryset.filter(**{lookup: int(value)})
+
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        parameters = [
+            {
+                'name': 'genre',
+                'required': False,
+                'in': 'query',
+                'description': 'Only the games of this genre (id).',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': 'pegi',
+                'required': False,
+                'in': 'query',
+                'description': 'Only the games with this PEGI rating.',
+                'schema': {'type': 'integer', 'enum': [3, 7, 12, 16, 18]},
+            },
+        ]
+
+        if has_rating(view.queryset.model):
+            parameters += [
+                {
+                    'name': name,
+                    'required': False,
+                    'in': 'query',
+                    'description': f'{description} rating (1-10, inclusive).',
+                    'schema': {'type': 'integer', 'minimum': 1, 'maximum': 10},
+                }
+                for name, description in (('rating_min', 'Minimum'), ('rating_max', 'Maximum'))
+            ]
+
+        return parameters
+
+
+class DiscoveryFilterBackend(BaseFilterBackend):
+    """
+    Narrows down the games random-games picks from: ?genre=, ?pegi_max= (the games suitable for that age),
+    ?global_rating_min= and, for an authenticated user, ?exclude_library=true (not the games already in their lists).
+    Every filter is a lookup on an indexed column or a subquery on the owner's entries, the sampling stays index based.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        genre = params.get('genre')
+        if genre is not None:
+            validate_genre_filter(genre)
+            queryset = queryset.filter(genres=int(genre))
+
+        pegi = params.get('pegi_max')
+        if pegi is not None:
+            validate_pegi_filter(pegi)
+            queryset = queryset.filter(pegi__lte=int(pegi))
+
+        global_rating = params.get('global_rating_min')
+        if global_rating is not None:
+            validate_global_rating_filter(global_rating)
+            queryset = queryset.filter(global_rating__gte=Decimal(global_rating))
+
+        exclude_library = params.get('exclude_library')
+        if exclude_library is not None:
+            validate_boolean_filter(exclude_library)
+            # anonymous visitors have no library, there is nothing to exclude
+            if exclude_library == 'true' and request.user.is_authenticated:
+                queryset = (queryset
+                            .exclude(pk__in=GamesToPlay.objects.filter(owner=request.user).values('game_id'))
+                            .exclude(pk__in=GamePlayed.objects.filter(owner=request.user).values('game_id')))
+
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': 'genre',
+                'required': False,
+                'in': 'query',
+                'description': 'Only the games of this genre (id).',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': 'pegi_max',
+                'required': False,
+                'in': 'query',
+                'description': 'Only the games with this PEGI rating or a lower one.',
+                'schema': {'type': 'integer', 'enum': [3, 7, 12, 16, 18]},
+            },
+            {
+                'name': 'global_rating_min',
+                'required': False,
+                'in': 'query',
+                'description': 'Only the games rated at least this much (0-10).',
+                'schema': {'type': 'number', 'minimum': 0, 'maximum': 10},
+            },
+            {
+                'name': 'exclude_library',
+                'required': False,
+                'in': 'query',
+                'description': "true leaves out the games already in the user's games to play or played.",
+                'schema': {'type': 'boolean'},
+            },
+        ]
+
+
+class TopGamesFilterBackend(BaseFilterBackend):
+    """
+    The top games of a genre (?genre=) and/or a PEGI rating (?pegi=). By PEGI the page is a range of the
+    (pegi, -weighted_rating, -id) index. The genre is an EXISTS on the (game, genre) unique index rather than a join:
+    the games are still read in weighted rating order until the page is full, instead of all the games of the genre
+    being sorted. The price is a probe per game read: a genre with few games walks most of the ranking to fill a page,
+    O(catalogue) in the worst case.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        genre = params.get('genre')
+        if genre is not None:
+            validate_genre_filter(genre)
+            queryset = queryset.filter(Exists(Game.genres.through.objects.filter(game=OuterRef('pk'), genre=int(genre))))
+
+        pegi = params.get('pegi')
+        if pegi is not None:
+            validate_pegi_filter(pegi)
+            queryset = queryset.filter(pegi=int(pegi))
+
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': 'genre',
+                'required': False,
+                'in': 'query',
+                'description': 'Only the games of this genre (id).',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': 'pegi',
+                'required': False,
+                'in': 'query',
+                'description': 'Only the games with this PEGI rating.',
+                'schema': {'type': 'integer', 'enum': [3, 7, 12, 16, 18]},
+            },
+        ]
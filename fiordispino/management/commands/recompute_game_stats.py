@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from fiordispino.core.sampling import id_bounds
+from fiordispino.core.stats import describe_mismatch, stats_mismatches, store_stats
+from fiordispino.models import Game
+
+
+def split_ids(low, high, parts) -> list:
+    # [low, high] in `parts` contiguous slices, as {'start', 'end', 'done'} where done is the last id recomputed
+    size = (high - low) // parts + 1
+    return [{'start': start, 'end': min(start + size - 1, high), 'done': start - 1}
+            for start in range(low, high + 1, size)]
+
+
+class Command(BaseCommand):
+    help = ("Recomputes the rating stats (sum, count, global and weighted rating, histogram) of every game out of their "
+            "ratings, e.g. after restoring a backup, deleting ratings in bulk or changing the weighted rating prior "
+            "(GAME_WEIGHTED_RATING_PRIOR_*). Each chunk of games is a single grouped aggregate query, and only the "
+            "games whose stats differ are written (bulk_update).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Games (ids) recomputed per query (default: 1000).')
+        parser.add_argument('--parallel', type=int, default=1,
+                            help='Slices of the catalogue recomputed at the same time, each by its own thread and '
+                                 'database connection (default: 1). With SQLite, which has a single writer, the slices '
+                                 'are recomputed one after the other.')
+        parser.add_argument('--checkpoint', metavar='FILE',
+                            help='Where the progress is saved after every chunk. If the file exists the command '
+                                 'resumes from it, it is deleted when the command completes.')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore the progress saved in --checkpoint and start over.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='List the games whose stats would change, without writing anything.')
+
+    def handle(self, *args, chunk_size, parallel, checkpoint, restart, dry_run, **options):
+        if chunk_size < 1 or parallel < 1:
+            raise CommandError("--chunk-size and --parallel must be positive")
+
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.verbosity = options.get('verbosity', 1)
+        self.checkpoint = None if dry_run else checkpoint
+        self.lock = threading.Lock()
+
+        slices = self.load_checkpoint() if self.checkpoint and not restart else None
+        if slices is None:
+            low, high = id_bounds(Game.objects.all())
+            if low is None:
+                self.stdout.write("No games")
+                return
+            slices = split_ids(low, high, parallel)
+        else:
+            # the slices of the interrupted run, whatever --parallel is now
+            self.stdout.write(f"Resuming from {self.checkpoint}")
+
+        self.slices = slices
+        self.span = sum(piece['end'] - piece['start'] + 1 for piece in slices)
+        self.checked = self.changed = 0
+        self.started = time.monotonic()
+
+        if len(slices) > 1 and connection.vendor != 'sqlite':
+            with ThreadPoolExecutor(max_workers=len(slices), thread_name_prefix='recompute') as executor:
+                # list(): re-raises the error of a failed slice, the others finish their chunk first
+                list(executor.map(self.run_slice, slices))
+        else:
+            for piece in slices:
+                self.recompute_slice(piece)
+
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+
+        verb = 'would change' if dry_run else 'changed'
+        self.stdout.write(self.style.SUCCESS(
+            f"{self.checked} games checked, {self.changed} {verb} in {time.monotonic() - self.started:.1f}s"))
+
+    def run_slice(self, piece):
+        # a worker thread: its own connection, closed when the slice is done
+        try:
+            self.recompute_slice(piece)
+        finally:
+            connection.close()
+
+    def recompute_slice(self, piece):
+        while piece['done'] < piece['end']:
+            start, end = piece['done'] + 1, min(piece['done'] + self.chunk_size, piece['end'])
+            checked, mismatches = self.recompute_chunk(start, end)
+
+            with self.lock:
+                piece['done'] = end
+                self.checked += checked
+                self.changed += len(mismatches)
+                if self.checkpoint:
+                    self.save_checkpoint()
+                self.report(mismatches)
+
+    def recompute_chunk(self, start, end):
+        games = Game.objects.filter(pk__gte=start, pk__lte=end)
+        if self.dry_run:
+            return games.count(), stats_mismatches(games)
+
+        with transaction.atomic():
+            # the rows stay locked until the new stats are written, votes on these games wait for them (where the
+            # database supports it, SQLite locks the whole database on the first write anyway)
+            checked = len(games.select_for_update().values_list('pk', flat=True))
+            mismatches = stats_mismatches(games)
+            if mismatches:
+                store_stats(mismatches)
+        return checked, mismatches
+
+    def report(self, mismatches):
+        # with the lock held
+        if self.dry_run or self.verbosity >= 2:
+            for game, fields in mismatches:
+                self.stdout.write(describe_mismatch(game, fields))
+
+        if self.verbosity >= 1:
+            covered = sum(piece['done'] - piece['start'] + 1 for piece in self.slices)
+            elapsed = time.monotonic() - self.started
+            eta = elapsed * (self.span - covered) / covered if covered else 0
+            self.stdout.write(f"{covered / self.span:6.1%} {self.checked} games checked, {self.changed} "
+                              f"{'to change' if self.dry_run else 'changed'}, ETA {eta:.0f}s")
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint) as file:
+                return json.load(file)['slices']
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError):
+            raise CommandError(f"{self.checkpoint} is not a checkpoint of this command, use --restart to overwrite it")
+
+    def save_checkpoint(self):
+        # written aside and then renamed: an interrupted write can't leave a truncated checkpoint
+        temporary = f'{self.checkpoint}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({'slices': self.slices}, file)
+        os.replace(temporary, self.checkpoint)
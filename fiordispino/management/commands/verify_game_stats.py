@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from fiordispino.core.stats import describe_mismatch, stats_mismatches, store_stats
+from fiordispino.models import Game
+
+
+class Command(BaseCommand):
+    help = ("Compares the rating stats stored on every game (sum, count, global rating, histogram) with a full "
+            "recompute out of their ratings, and reports the games that differ. See recompute_game_stats to fix a "
+            "whole catalogue.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Games recomputed per query (default: 1000).')
+        parser.add_argument('--fix', action='store_true',
+                            help='Store the recomputed stats of the games that differ.')
+
+    def handle(self, *args, chunk_size, fix, **options):
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be positive")
+
+        checked = wrong = 0
+        last_id = 0
+        while True:
+            # chunks of ids in order: every query groups the ratings of a bounded number of games
+            ids = list(Game.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                break
+            last_id = ids[-1]
+            checked += len(ids)
+
+            mismatches = stats_mismatches(Game.objects.filter(pk__in=ids))
+            for game, fields in mismatches:
+                self.stdout.write(describe_mismatch(game, fields))
+
+            if fix and mismatches:
+                store_stats(mismatches)
+            wrong += len(mismatches)
+
+        if wrong and not fix:
+            raise CommandError(f"{wrong} of {checked} games have wrong rating stats")
+
+        message = f"{checked} games checked, {wrong} fixed" if fix else f"{checked} games checked, all consistent"
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:02
+
+import fiordispino.core.validators
+import fiordispino.models.game
+from django.db import migrations, models
+
+
+def fill_box_art_hashes(apps, schema_editor):
+    # games created before this migration need their hash to get a versioned box art url
+    from fiordispino.core.box_art import compute_box_art_hash
+
+    Game = apps.get_model('fiordispino', 'Game')
+    for game in Game.objects.filter(box_art_hash='').iterator():
+        game.box_art_hash = compute_box_art_hash(game.box_art)
+        game.save(update_fields=['box_art_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiordispino', '0002_alter_user_username'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='box_art_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.RunPython(fill_box_art_hashes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='game',
+            name='box_art',
+            field=models.ImageField(upload_to=fiordispino.models.game.build_path, validators=[fiordispino.core.validators.validate_box_art]),
+        ),
+    ]
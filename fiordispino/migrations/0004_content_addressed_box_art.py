@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:10
+
+import fiordispino.core.storage
+import fiordispino.core.validators
+import fiordispino.models.game
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiordispino', '0003_game_box_art_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='game',
+            name='box_art',
+            field=models.ImageField(storage=fiordispino.core.storage.ContentAddressedStorage(), upload_to=fiordispino.models.game.build_path, validators=[fiordispino.core.validators.validate_box_art]),
+        ),
+        migrations.AlterField(
+            model_name='game',
+            name='box_art_hash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:13
+
+from django.db import migrations, models
+
+
+def fill_box_art_placeholders(apps, schema_editor):
+    # covers uploaded before this migration get their placeholder too
+    from fiordispino.core.placeholders import compute_placeholder
+    from fiordispino.core.renditions import load_box_art
+
+    Game = apps.get_model('fiordispino', 'Game')
+    for game in Game.objects.filter(box_art_color='').iterator():
+        source = load_box_art(game.box_art) if game.box_art else None
+        if source is not None:
+            Game.objects.filter(pk=game.pk).update(**compute_placeholder(source))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiordispino', '0004_content_addressed_box_art'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='box_art_color',
+            field=models.CharField(blank=True, default='', editable=False, max_length=7),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='box_art_preview',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_box_art_placeholders, migrations.RunPython.noop),
+    ]
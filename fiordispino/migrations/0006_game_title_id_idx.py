@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiordispino', '0005_game_box_art_placeholder'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['title', 'id'], name='game_title_id_idx'),
+        ),
+    ]
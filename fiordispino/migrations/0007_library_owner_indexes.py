@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiordispino', '0006_game_title_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gameplayed',
+            index=models.Index(fields=['owner', 'created_at', 'id'], name='played_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gameplayed',
+            index=models.Index(fields=['owner', 'rating', 'id'], name='played_owner_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gamestoplay',
+            index=models.Index(fields=['owner', 'created_at', 'id'], name='to_play_owner_created_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:08
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_rating_sum(apps, schema_editor):
+    # a single UPDATE with a correlated subquery, whatever the number of games
+    Game = apps.get_model('fiordispino', 'Game')
+    GamePlayed = apps.get_model('fiordispino', 'GamePlayed')
+
+    ratings = (GamePlayed.objects.filter(game=OuterRef('pk')).order_by()
+               .values('game').annotate(total=Sum('rating')).values('total'))
+    Game.objects.update(rating_sum=Coalesce(Subquery(ratings), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiordispino', '0007_library_owner_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='rating_sum',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_rating_sum, migrations.RunPython.noop),
+    ]
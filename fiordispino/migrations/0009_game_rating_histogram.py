@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:14
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_histogram(apps, schema_editor):
+    # a single UPDATE with a correlated subquery per rating, whatever the number of games
+    Game = apps.get_model('fiordispino', 'Game')
+    GamePlayed = apps.get_model('fiordispino', 'GamePlayed')
+
+    ratings = GamePlayed.objects.filter(game=OuterRef('pk')).order_by().values('game')
+    Game.objects.update(**{
+        f'ratings_{rating}': Coalesce(Subquery(ratings.annotate(n=Count('id', filter=Q(rating=rating))).values('n')), 0)
+        for rating in range(1, 11)
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiordispino', '0008_game_rating_sum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='ratings_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='ratings_10',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='ratings_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='ratings_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='ratings_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='ratings_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='ratings_6',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='ratings_7',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='ratings_8',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='ratings_9',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_histogram, migrations.RunPython.noop),
+    ]
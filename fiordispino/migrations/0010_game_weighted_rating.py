@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:49
+
+import fiordispino.models.game
+from django.db import migrations, models
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast
+
+
+def fill_weighted_rating(apps, schema_editor):
+    # out of the stored sum and count, a single UPDATE
+    Game = apps.get_model('fiordispino', 'Game')
+
+    mean, votes = fiordispino.models.game.weighted_rating_prior()
+    total = Cast(F('rating_sum'), FloatField()) + Value(float(votes * mean))
+    Game.objects.update(weighted_rating=total / (F('rating_count') + Value(votes)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiordispino', '0009_game_rating_histogram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='weighted_rating',
+            field=models.FloatField(default=fiordispino.models.game.unrated_weighted_rating, editable=False),
+        ),
+        migrations.RunPython(fill_weighted_rating, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['-weighted_rating', '-id'], name='game_weighted_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['pegi', '-weighted_rating', '-id'], name='game_pegi_weighted_idx'),
+        ),
+    ]
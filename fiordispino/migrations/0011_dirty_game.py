@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiordispino', '0010_game_weighted_rating'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtyGame',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('marked_at', models.DateTimeField(auto_now_add=True)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='fiordispino.game')),
+            ],
+        ),
+    ]
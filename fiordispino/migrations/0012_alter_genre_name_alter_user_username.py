@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:35
+
+import fiordispino.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiordispino', '0011_dirty_game'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='genre',
+            name='name',
+            field=models.CharField(unique=True, validators=[fiordispino.core.validators.validate_genre]),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='username',
+            field=models.CharField(error_messages={'unique': 'A user with that username already exists.'}, max_length=150, unique=True, validators=[fiordispino.core.validators.validate_username]),
+        ),
+    ]
@@ -4,4 +4,5 @@ from .genre import Genre
 from .game import Game
 from .games_to_play import GamesToPlay
 from .game_played import GamePlayed
-from .user import User
\ No newline at end of file
+from .user import User
+from .dirty_game import DirtyGame
\ No newline at end of file
@@ -0,0 +1,14 @@
+from django.db import models
+
+
+class DirtyGame(models.Model):
+    """
+    A change of the ratings of a game not counted in its stats yet (deferred stats mode, see core/stats_queue.py).
+    Every change adds a row, so that votes never wait on each other here: the flush recomputes each game once and
+    deletes the rows it has read. Stored in the database, the changes survive the process that marked them.
+    """
+    game = models.ForeignKey('fiordispino.game', on_delete=models.CASCADE, related_name='+')
+    marked_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Stats of game {self.game_id} changed at {self.marked_at}"
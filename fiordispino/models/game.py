@@ -1,7 +1,10 @@
+from django.conf import settings
 from django.db import models
 
 from fiordispino.models import Genre
 from fiordispino.core.validators import *
+from fiordispino.core.box_art import compute_box_art_hash
+from fiordispino.core.storage import ContentAddressedStorage
 
 
 import os
@@ -11,16 +14,41 @@ def build_path(instance, filename):
     # filename: name of the image
 
     # extract extension
-    ext = filename.split('.')[-1]
+    ext = filename.split('.')[-1].lower()
 
-    # create the file name
-    # Eg: "The Legend of Zelda" becomes "the_legend_of_zelda_cover.jpg"
-    new_filename = f"{instance.title.replace(' ', '_').lower()}_cover.{ext}"
+    # content addressed: the file is named after the sha256 of the image, so identical uploads are stored once
+    # and a new image always gets a new name (and url). The pre_save signal has usually hashed it already
+    digest = instance.box_art_hash or compute_box_art_hash(instance.box_art)
 
-    return os.path.join('games', 'covers', new_filename)
+    return box_art_path(digest, ext)
+
+def box_art_path(digest, ext):
+    # sharded in 2 levels of directories so that no directory ends up with the whole catalogue
+    # Eg: "games/covers/9f/86/9f86d081884c7d65...0f00a08.jpg"
+    return os.path.join('games', 'covers', digest[:2], digest[2:4], f"{digest}.{ext}")
+
+DEFAULT_WEIGHTED_RATING_PRIOR_MEAN = 5.5
+DEFAULT_WEIGHTED_RATING_PRIOR_VOTES = 25
+
+def weighted_rating_prior() -> tuple:
+    # (mean, votes): the weighted rating counts `votes` imaginary ratings of `mean` next to the real ones
+    return (getattr(settings, 'GAME_WEIGHTED_RATING_PRIOR_MEAN', DEFAULT_WEIGHTED_RATING_PRIOR_MEAN),
+            getattr(settings, 'GAME_WEIGHTED_RATING_PRIOR_VOTES', DEFAULT_WEIGHTED_RATING_PRIOR_VOTES))
+
+def unrated_weighted_rating() -> float:
+    # a game nobody rated is worth the prior mean
+    return float(weighted_rating_prior()[0])
 
 class Game(models.Model):
-    box_art = models.ImageField(upload_to=build_path, validators=[validate_box_art])
+    box_art = models.ImageField(upload_to=build_path, storage=ContentAddressedStorage(), validators=[validate_box_art])
+
+    # sha256 of the box art content, kept in sync by the signals. It versions the box art url so that it can be cached forever.
+    # Indexed because it is also how many games share the same stored image is counted
+    box_art_hash = models.CharField(max_length=64, blank=True, default='', editable=False, db_index=True)
+
+    # placeholders computed once at upload time, so that list views can render something before the cover is loaded
+    box_art_color = models.CharField(max_length=7, blank=True, default='', editable=False)  # e.g. "#1a2b3c"
+    box_art_preview = models.TextField(blank=True, default='', editable=False)  # ~16px image as data uri
     description = models.TextField(validators=[validate_game_description])
     title = models.TextField(validators=[validate_title])
     global_rating = models.DecimalField(default=0.0, max_digits=3, decimal_places=1, validators=[validate_global_rating])
@@ -28,6 +56,26 @@ class Game(models.Model):
     # to count how many players reviewed it. No need for custom validation, it's implicit thanks to PositiveInteger
     rating_count = models.PositiveIntegerField(default=0)
 
+    # sum of all the ratings: with rating_count, a vote updates global_rating without reading the other ratings
+    rating_sum = models.PositiveBigIntegerField(default=0, editable=False)
+
+    # how many players gave each rating, kept up to date by the signals like the fields above: the distribution of the
+    # ratings (and its median) is read from the game row, never from the ratings
+    ratings_1 = models.PositiveIntegerField(default=0, editable=False)
+    ratings_2 = models.PositiveIntegerField(default=0, editable=False)
+    ratings_3 = models.PositiveIntegerField(default=0, editable=False)
+    ratings_4 = models.PositiveIntegerField(default=0, editable=False)
+    ratings_5 = models.PositiveIntegerField(default=0, editable=False)
+    ratings_6 = models.PositiveIntegerField(default=0, editable=False)
+    ratings_7 = models.PositiveIntegerField(default=0, editable=False)
+    ratings_8 = models.PositiveIntegerField(default=0, editable=False)
+    ratings_9 = models.PositiveIntegerField(default=0, editable=False)
+    ratings_10 = models.PositiveIntegerField(default=0, editable=False)
+
+    # Bayesian average of the ratings (see weighted_rating_prior), kept up to date with the other stats: the top games
+    # are ranked by it, the index (-weighted_rating, -id) serves them in order
+    weighted_rating = models.FloatField(default=unrated_weighted_rating, editable=False)
+
     # many-to-many relation: a game has (can have) more than 1 genre; a genre is (can be) associated to more than 1 game
     genres = models.ManyToManyField(Genre, related_name='games')
 
@@ -37,5 +85,14 @@ class Game(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # the catalogue is paginated by (title, id), see GamePagination
+            models.Index(fields=['title', 'id'], name='game_title_id_idx'),
+            # the top games, overall and by PEGI (see TopGamesPagination)
+            models.Index(fields=['-weighted_rating', '-id'], name='game_weighted_rating_idx'),
+            models.Index(fields=['pegi', '-weighted_rating', '-id'], name='game_pegi_weighted_idx'),
+        ]
+
     def __str__(self):
         return self.title
\ No newline at end of file
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 
 from django.conf import settings
 from fiordispino.core.validators import validate_vote
@@ -27,8 +27,23 @@ class GamePlayed(models.Model):
     class Meta:
         # so that a user can add a game to play at most 1 time
         unique_together = ('owner', 'game')
+        indexes = [
+            # a user's library, newest first or by rating (see GamesPlayedPagination)
+            models.Index(fields=['owner', 'created_at', 'id'], name='played_owner_created_idx'),
+            models.Index(fields=['owner', 'rating', 'id'], name='played_owner_rating_idx'),
+        ]
         verbose_name = "Game played"
         verbose_name_plural = "Games played"
 
+    def save(self, *args, **kwargs):
+        # the stats of the game are updated by the signals (see signals.py): the previous rating, the row and the stats
+        # are read and written in the same transaction, or a concurrent edit could be counted twice
+        if not self._state.adding and not kwargs.get('force_insert'):
+            # an entry deleted by another request since it was loaded is not written back (inserted again), the save
+            # fails with a DatabaseError
+            kwargs['force_update'] = True
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.game.title} played by {self.owner.username} and rated {self.rating}/10"
\ No newline at end of file
@@ -26,6 +26,10 @@ class GamesToPlay(models.Model):
     class Meta:
         # so that a user can add a game to play at most 1 time
         unique_together = ('owner', 'game')
+        indexes = [
+            # a user's backlog, newest first (see LibraryPagination)
+            models.Index(fields=['owner', 'created_at', 'id'], name='to_play_owner_created_idx'),
+        ]
         verbose_name = "Game to play"
         verbose_name_plural = "Games to play"
 
@@ -0,0 +1,245 @@
+import json
+from base64 import b64decode, b64encode
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from fiordispino.core.validators import validate_sort
+
+DEFAULT_PAGE_SIZE = 20
+DEFAULT_MAX_PAGE_SIZE = 100
+
+
+def get_page_size_limits() -> tuple:
+    return (getattr(settings, 'API_PAGE_SIZE', DEFAULT_PAGE_SIZE),
+            getattr(settings, 'API_MAX_PAGE_SIZE', DEFAULT_MAX_PAGE_SIZE))
+
+
+def keyset_filter(ordering, values, reverse=False) -> Q:
+    # rows strictly after `values` in the given ordering (before, if reversed):
+    # a >= x AND ((a > x) OR (a = x AND b > y) OR (a = x AND b = y AND c > z)...). The OR chain alone gives the planner
+    # nothing to seek to, the index would be scanned from its start: the bound on a makes each page start at the cursor
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        descending = field.startswith('-')
+        name = field.lstrip('-')
+        lookup = 'lt' if descending != reverse else 'gt'
+
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+
+    first = ordering[0]
+    bound = 'lte' if first.startswith('-') != reverse else 'gte'
+    return Q(**{f'{first.lstrip("-")}__{bound}': values[0]}) & condition
+
+
+def reverse_ordering(ordering) -> tuple:
+    return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a composite ordering whose last field is unique (e.g. (title, id)).
+    Unlike the DRF CursorPagination, which seeks on the first field and skips the ties with an OFFSET, the cursor holds
+    the values of every field of the last row: each page is an index range scan, however deep, and duplicated values
+    (two games with the same title) never make it slower. There is no COUNT(*), the response just links the
+    next/previous pages.
+    """
+    ordering = ('id',)
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, request, queryset, view) -> tuple:
+        # extension point for views that let the client choose the sort
+        return self.ordering
+
+    def get_page_size(self, request) -> int:
+        page_size, max_page_size = get_page_size_limits()
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return page_size
+
+        # hard cap: a client can't ask for the whole catalogue at once
+        return min(max(requested, 1), max_page_size)
+
+    def encode_cursor(self, values, reverse=False) -> str:
+        # dates and decimals as their string, the model fields parse them back when filtering
+        payload = json.dumps({'v': list(values), 'r': reverse}, default=str, separators=(',', ':'))
+        return b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            payload = json.loads(b64decode(encoded.encode(), validate=True))
+            values, reverse = payload['v'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if (not isinstance(values, list) or len(values) != len(self.current_ordering)
+                or not all(isinstance(value, (str, int, float)) for value in values)):
+            raise NotFound(self.invalid_cursor_message)
+
+        return values, reverse
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # the model instances of the page, with the cursor values read from their attributes
+        def fetch(page_queryset, key_fields):
+            getters = [attrgetter(field.replace('__', '.')) for field in key_fields]
+            return [(tuple(get(obj) for get in getters), obj) for obj in page_queryset]
+
+        return self.paginate_rows(queryset, request, fetch, view)
+
+    def paginate_rows(self, queryset, request, fetch, view=None):
+        # `fetch(page_queryset, key_fields)` loads the page and returns (cursor values, item) pairs: views can build the
+        # items however they like (e.g. straight from values() rows), the page is still a single query
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.current_ordering = tuple(self.get_ordering(request, queryset, view))
+        key_fields = [field.lstrip('-') for field in self.current_ordering]
+
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor[1]
+
+        if cursor is not None:
+            try:
+                queryset = queryset.filter(keyset_filter(self.current_ordering, cursor[0], reverse))
+            except (ValueError, ValidationError):
+                # values the fields can't parse (e.g. a text where the id should be)
+                raise NotFound(self.invalid_cursor_message)
+
+        ordering = reverse_ordering(self.current_ordering) if reverse else self.current_ordering
+        # one more row than needed tells whether there is another page
+        page = fetch(queryset.order_by(*ordering)[:self.page_size + 1], key_fields)
+
+        has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+        if reverse:
+            page.reverse()
+
+        # the cursor itself is the boundary when the page is empty (e.g. everything after it was deleted)
+        first = page[0][0] if page else cursor and cursor[0]
+        last = page[-1][0] if page else cursor and cursor[0]
+
+        if reverse:
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.next_cursor = self.encode_cursor(last) if self.has_next else None
+        self.previous_cursor = self.encode_cursor(first, reverse=True) if self.has_previous else None
+
+        return [item for _, item in page]
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self.get_link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self.get_link(self.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        _, max_page_size = get_page_size_limits()
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value, as found in the next/previous links.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Number of results per page (max {max_page_size}).',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class GamePagination(KeysetPagination):
+    # alphabetical catalogue, the id breaks the ties between games with the same title (index game_title_id_idx)
+    ordering = ('title', 'id')
+
+
+class TopGamesPagination(KeysetPagination):
+    # best weighted rating first, the newest game first among equals (indexes game_weighted_rating_idx and
+    # game_pegi_weighted_idx): a page of the ranking reads just its rows, never the whole catalogue sorted
+    ordering = ('-weighted_rating', '-id')
+
+
+class LibraryPagination(KeysetPagination):
+    """
+    Keyset pagination of a user library, sorted with ?sort=<field> (ascending) or ?sort=-<field> (descending).
+    The entry id breaks the ties, the (owner, <field>, id) indexes of the libraries serve the owner's pages in order.
+    """
+    sort_query_param = 'sort'
+    default_sort = '-created_at'
+
+    # ?sort= name -> model field
+    sort_fields = {
+        'created_at': 'created_at',
+        'title': 'game__title',
+    }
+
+    def get_sorts(self) -> list:
+        return [sort for name in self.sort_fields for sort in (name, f'-{name}')]
+
+    def get_ordering(self, request, queryset, view) -> tuple:
+        sort = request.query_params.get(self.sort_query_param, self.default_sort)
+        validate_sort(sort, self.get_sorts())
+
+        field = self.sort_fields[sort.lstrip('-')]
+        return (f'-{field}', '-id') if sort.startswith('-') else (field, 'id')
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            {
+                'name': self.sort_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Sort field, prefixed by "-" for descending order (default: {self.default_sort}).',
+                'schema': {'type': 'string', 'enum': self.get_sorts()},
+            },
+        ]
+
+
+class GamesPlayedPagination(LibraryPagination):
+    sort_fields = {
+        **LibraryPagination.sort_fields,
+        'rating': 'rating',
+    }
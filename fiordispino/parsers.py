@@ -0,0 +1,69 @@
+import msgpack
+import orjson
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles
+
+
+class ORJSONParser(parsers.JSONParser):
+    """
+    JSONParser built on orjson. orjson only reads utf-8: any other declared charset goes through the DRF parser.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        if encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+# magic bytes of the image formats, the image itself is never decoded here: a decompression bomb would blow up in the
+# parser instead of being rejected by the validators
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+
+
+def _guess_extension(content):
+    # the name of an uploaded file is checked by the validators (e.g. box arts must be .jpg), msgpack only has the bytes
+    for signature, extension in IMAGE_SIGNATURES:
+        if content.startswith(signature):
+            return extension
+    if content[:4] == b'RIFF' and content[8:12] == b'WEBP':
+        return 'webp'
+    return 'bin'
+
+
+class MessagePackParser(parsers.BaseParser):
+    """
+    Parses `Content-Type: application/msgpack` bodies. Binary values are files (e.g. a box art uploaded as bytes):
+    they are handed over as uploaded files, like a multipart request would.
+    """
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            data = msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
+
+        if not isinstance(data, dict):
+            return data
+
+        files = {}
+        for key, value in list(data.items()):
+            if isinstance(value, bytes):
+                files[key] = SimpleUploadedFile(f'{key}.{_guess_extension(value)}', data.pop(key))
+
+        return DataAndFiles(data, files) if files else data
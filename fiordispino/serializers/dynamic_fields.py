@@ -0,0 +1,199 @@
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+
+from fiordispino.core.exceptions import InvalidFieldsException
+
+# a parameter that was not passed explicitly is read from the request
+FROM_REQUEST = object()
+
+
+def parse_field_paths(value):
+    # "id,game.title, game.pegi" -> ['id', 'game.title', 'game.pegi'], None when the parameter is missing
+    if value is None:
+        return None
+
+    return [path.strip() for path in value.split(',') if path.strip()]
+
+
+def split_field_paths(paths):
+    # ['id', 'game.title'] -> ({'id', 'game'}, {'game': ['title']})
+    names, nested = set(), {}
+    for path in paths:
+        name, _, rest = path.partition('.')
+        names.add(name)
+        if rest:
+            nested.setdefault(name, []).append(rest)
+
+    return names, nested
+
+
+class DynamicFieldsMixin:
+    """
+    Lets the client choose what a serializer returns:
+    - ?fields=id,title returns only the listed fields; fields of a nested serializer use the dotted notation (game.title)
+    - ?expand=game,game.genres lists the relations to nest, the others are returned as primary keys.
+      Without ?expand every relation in `expandable_fields` is nested, as it always was.
+    Serializers nested by hand get their part of both lists through `nested_options`.
+    Only the output is affected, the fields that are written are validated as usual.
+
+    `fast_representation` is a read-only shortcut for lists, with the same output (see compile_rows).
+    """
+
+    # relations that can be returned nested instead of as primary keys
+    expandable_fields = ()
+
+    # foreign keys among them and the serializer that nests them (it must use this mixin too)
+    related_serializers = {}
+
+    # many to many fields, prefetched for the whole queryset instead of queried once per object
+    prefetch_fields = ()
+
+    # model columns needed by each field, when they differ from the field name
+    field_columns = {}
+
+    def __init__(self, *args, fields=FROM_REQUEST, expand=FROM_REQUEST, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        request = self.context.get('request')
+        if fields is FROM_REQUEST:
+            fields = parse_field_paths(request.query_params.get('fields')) if request is not None else None
+        if expand is FROM_REQUEST:
+            expand = parse_field_paths(request.query_params.get('expand')) if request is not None else None
+
+        self._requested_fields, self._nested_fields = (None, {}) if fields is None else split_field_paths(fields)
+        self._expanded_fields, self._nested_expand = (None, {}) if expand is None else split_field_paths(expand)
+
+        self._check_names(self._requested_fields, self.fields, 'field')
+        self._check_names(self._expanded_fields, self.expandable_fields, 'expandable relation')
+
+    @staticmethod
+    def _check_names(names, allowed, kind):
+        unknown = sorted((names or set()) - set(allowed))
+        if unknown:
+            raise InvalidFieldsException(f"Unknown {kind}: {', '.join(unknown)}. "
+                                         f"Please use one of the following: {', '.join(allowed)}")
+
+    @property
+    def _readable_fields(self):
+        for field in super()._readable_fields:
+            if self.is_requested(field.field_name):
+                yield field
+
+    def is_requested(self, name):
+        return self._requested_fields is None or name in self._requested_fields
+
+    def is_expanded(self, name):
+        return self._expanded_fields is None or name in self._expanded_fields
+
+    def nested_options(self, name):
+        # the fields/expand lists for the serializer nested in `name`, None meaning no restriction
+        fields = self._nested_fields.get(name)
+        expand = None if self._expanded_fields is None else self._nested_expand.get(name, [])
+        return {'fields': fields, 'expand': expand}
+
+    def nested_serializer(self, name, instance=None):
+        return self.related_serializers[name](instance, context=self.context, **self.nested_options(name))
+
+    def get_only_columns(self, prefix=''):
+        # the model columns that are needed to build the requested representation, None when they all are
+        if self._requested_fields is None:
+            return None
+
+        columns = {f'{prefix}{self.Meta.model._meta.pk.name}'}
+        for name in self._requested_fields:
+            columns.update(f'{prefix}{column}' for column in self.field_columns.get(name, (name,)))
+
+            if name in self._nested_relations():
+                nested = self.nested_serializer(name).get_only_columns(f'{prefix}{name}__')
+                if nested is None:
+                    # every column of the related model, the foreign key alone is not enough
+                    return None
+                columns.update(nested)
+
+        return sorted(columns)
+
+    def get_prefetches(self, prefix=''):
+        prefetches = [f'{prefix}{name}' for name in self.prefetch_fields if self.is_requested(name)]
+        for name in self._nested_relations():
+            prefetches.extend(self.nested_serializer(name).get_prefetches(f'{prefix}{name}__'))
+
+        return prefetches
+
+    def _nested_relations(self):
+        return [name for name in self.related_serializers if self.is_requested(name) and self.is_expanded(name)]
+
+    def restrict_queryset(self, queryset):
+        # joins the nested relations, prefetches the many to many ones and loads only the columns that will be returned,
+        # so that the number of queries doesn't depend on the number of objects
+        related = self._nested_relations()
+        if related:
+            queryset = queryset.select_related(*related)
+
+        prefetches = self.get_prefetches()
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+
+        columns = self.get_only_columns()
+        return queryset.only(*columns) if columns is not None else queryset
+
+    def compile_rows(self, prefix=''):
+        # turns the requested representation into the values() columns it needs, a function building it from a row
+        # and the functions to call once on all the rows before that (to load what isn't in the row, e.g. many to many).
+        # Fields that need more than a column conversion are compiled by a `compile_<field name>(field, prefix)` method
+        columns, steps, prepares = set(), [], []
+
+        for field in self._readable_fields:
+            name = field.field_name
+            compiler = getattr(self, f'compile_{name}', None)
+
+            if compiler is not None:
+                field_columns, build, field_prepares = compiler(field, prefix)
+            elif name in self._nested_relations():
+                field_columns, build, field_prepares = self.nested_serializer(name).compile_rows(f'{prefix}{name}__')
+            elif isinstance(field, ManyRelatedField):
+                raise ImproperlyConfigured(f"{type(self).__name__}.{name} needs a compile_{name} method")
+            else:
+                column = f'{prefix}{field.source}'
+                field_columns, build, field_prepares = [column], self._column_builder(field, column), []
+
+            columns.update(field_columns)
+            steps.append((name, build))
+            prepares.extend(field_prepares)
+
+        def build_row(row):
+            return {name: build(row) for name, build in steps}
+
+        return sorted(columns), build_row, prepares
+
+    @staticmethod
+    def _column_builder(field, column):
+        # values() already returns the primary key of a foreign key, which is its representation
+        if isinstance(field, PrimaryKeyRelatedField):
+            return lambda row: row[column]
+
+        # the field is the same as the serializer's, so the conversion is too (dates, decimals...)
+        to_representation = field.to_representation
+
+        def build(row):
+            value = row[column]
+            return None if value is None else to_representation(value)
+
+        return build
+
+    def fast_representation(self, queryset):
+        # the same as the .data of this serializer with many=True, built from values() rows: no model instances,
+        # no get_attribute() per field, just a conversion per column
+        rows, build_row = self.fast_rows(queryset)
+        return [build_row(row) for row in rows]
+
+    def fast_rows(self, queryset, extra_columns=()):
+        # the prepared values() rows and the function turning each of them into its representation. `extra_columns` are
+        # loaded with the rest, for callers that need more than the representation (e.g. the cursor of a page)
+        columns, build_row, prepares = self.compile_rows()
+
+        rows = list(queryset.prefetch_related(None).values(*sorted({*columns, *extra_columns})))
+        for prepare in prepares:
+            prepare(rows)
+
+        return rows, build_row
+
@@ -1,23 +1,157 @@
+from django.db.models.fields.files import FieldFile
 from rest_framework import serializers
 
 from fiordispino.models import Game, Genre
-from fiordispino.core.utils import encode_image_to_base64
+from fiordispino.core.utils import encode_image_to_base64, read_image_bytes
+from fiordispino.core.box_art import build_box_art_url, box_art_url_builder, get_default_box_art_mode
+from fiordispino.core.renditions import ORIGINAL_SIZE, get_box_art_file, get_rendition_file
+from fiordispino.core.stats import HISTOGRAM_FIELDS, rating_histogram, rating_percentiles
+from fiordispino.core.validators import validate_box_art_mode, validate_box_art_size
 from fiordispino.serializers.genre_serializers import GenreSerializer
+from fiordispino.serializers.dynamic_fields import DynamicFieldsMixin
 
+# keeps the IN (...) of the genres query under the database limits on the number of parameters
+GENRES_BATCH_SIZE = 1000
 
-class GameSerializer(serializers.ModelSerializer):
+
+class GameSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     genres = serializers.PrimaryKeyRelatedField(
         many=True,
         queryset=Genre.objects.all()
     )
 
     class Meta:
-        fields = ("id", "box_art", "description", "title", "genres", "pegi", "release_date", "global_rating", "rating_count")
+        fields = ("id", "box_art", "box_art_color", "box_art_preview", "description", "title", "genres", "pegi",
+                  "release_date", "global_rating", "rating_count")
+        read_only_fields = ("box_art_color", "box_art_preview")
         model = Game
 
+    expandable_fields = ("genres",)
+    prefetch_fields = ("genres",)
+
+    # the url of the box art is versioned with its hash, genres come from their own table
+    field_columns = {"box_art": ("box_art", "box_art_hash"), "genres": ()}
+
+    def _get_query_param(self, name):
+        request = self.context.get('request')
+        return request.query_params.get(name) if request is not None else None
+
+    def get_box_art_mode(self):
+        # the client can choose with ?box_art=base64|url, otherwise the project default is used
+        mode = self._get_query_param('box_art')
+
+        if mode is None:
+            return get_default_box_art_mode()
+
+        validate_box_art_mode(mode)
+        return mode
+
+    def get_box_art_size(self):
+        # ?size=thumb|medium|... sends a downscaled rendition instead of the original image
+        size = self._get_query_param('size')
+
+        if size is None:
+            return ORIGINAL_SIZE
+
+        validate_box_art_size(size)
+        return size
+
+    def wants_binary(self):
+        # binary formats (e.g. MessagePack) get the image bytes as they are, json needs them in base64
+        request = self.context.get('request')
+        return getattr(getattr(request, 'accepted_renderer', None), 'binary', False)
+
+    def encode_box_art(self, img):
+        return read_image_bytes(img) if self.wants_binary() else encode_image_to_base64(img)
+
     def to_representation(self, instance):
         # Quando serializzi (GET), usa GenreSerializer per mostrare oggetti completi
         ret = super().to_representation(instance)
-        ret['box_art'] = encode_image_to_base64(instance.box_art)
-        ret['genres'] = GenreSerializer(instance.genres.all(), many=True).data
-        return ret
\ No newline at end of file
+
+        # fields left out with ?fields= are not computed at all, the box art is by far the most expensive one
+        if 'box_art' in ret:
+            size = self.get_box_art_size()
+            if self.get_box_art_mode() == 'url':
+                # just a link to the box art endpoint, the image itself is downloaded (and cached) separately
+                ret['box_art'] = build_box_art_url(instance, self.context.get('request'), size)
+            else:
+                ret['box_art'] = self.encode_box_art(get_box_art_file(instance, size))
+
+        if 'genres' in ret and self.is_expanded('genres'):
+            ret['genres'] = GenreSerializer(instance.genres.all(), many=True).data
+        return ret
+
+    # fast path (see DynamicFieldsMixin.compile_rows), they must return exactly what to_representation does
+
+    def compile_box_art(self, field, prefix):
+        size = self.get_box_art_size()
+
+        if self.get_box_art_mode() == 'url':
+            pk, digest = f'{prefix}id', f'{prefix}box_art_hash'
+            build_url = box_art_url_builder(self.context.get('request'), size)
+            return [pk, digest], lambda row: build_url(row[pk], row[digest]), []
+
+        name = f'{prefix}box_art'
+        model_field = Game._meta.get_field('box_art')
+        encode = read_image_bytes if self.wants_binary() else encode_image_to_base64
+
+        def build(row):
+            # a field file doesn't need the instance to be read
+            return encode(get_rendition_file(FieldFile(None, model_field, row[name] or ''), size))
+
+        return [name], build, []
+
+    def compile_genres(self, field, prefix):
+        pk = f'{prefix}id'
+        expanded = self.is_expanded('genres')
+        genres = {}
+
+        def prepare(rows):
+            # one query for all the rows, the same one prefetch_related('genres') runs (hence the same order)
+            ids = list({row[pk] for row in rows})
+            for start in range(0, len(ids), GENRES_BATCH_SIZE):
+                batch = ids[start:start + GENRES_BATCH_SIZE]
+                for game_id, genre_id, genre_name in (Genre.objects.filter(games__in=batch)
+                                                      .values_list('games__id', 'id', 'name')):
+                    genres.setdefault(game_id, []).append({'id': genre_id, 'name': genre_name} if expanded else genre_id)
+
+        return [pk], lambda row: genres.get(row[pk], []), [prepare]
+
+
+
+class GameDetailSerializer(GameSerializer):
+    """
+    A game with the distribution of its ratings (how many players gave each rating, from 1 to 10) and the percentiles
+    derived from it, for the game page. Both come from the counters stored on the game, the ratings are never read.
+    """
+    rating_histogram = serializers.SerializerMethodField()
+    rating_percentiles = serializers.SerializerMethodField()
+
+    class Meta(GameSerializer.Meta):
+        fields = GameSerializer.Meta.fields + ("rating_histogram", "rating_percentiles")
+
+    field_columns = {**GameSerializer.field_columns,
+                     "rating_histogram": HISTOGRAM_FIELDS, "rating_percentiles": HISTOGRAM_FIELDS}
+
+    def get_rating_histogram(self, instance):
+        return rating_histogram(instance)
+
+    def get_rating_percentiles(self, instance):
+        return rating_percentiles(rating_histogram(instance))
+
+    def compile_rating_histogram(self, field, prefix):
+        columns = [f'{prefix}{name}' for name in HISTOGRAM_FIELDS]
+        return columns, lambda row: [row[column] for column in columns], []
+
+    def compile_rating_percentiles(self, field, prefix):
+        columns = [f'{prefix}{name}' for name in HISTOGRAM_FIELDS]
+        return columns, lambda row: rating_percentiles([row[column] for column in columns]), []
+
+
+class TopGameSerializer(GameSerializer):
+    """
+    A game of the top games ranking, with the weighted rating it is ranked by.
+    """
+
+    class Meta(GameSerializer.Meta):
+        fields = GameSerializer.Meta.fields + ("weighted_rating",)
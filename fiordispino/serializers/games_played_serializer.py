@@ -1,20 +1,25 @@
 from rest_framework import serializers
 from fiordispino.models import GamePlayed
 from fiordispino.serializers import game_serializer
+from fiordispino.serializers.dynamic_fields import DynamicFieldsMixin
 
 
-class GamesPlayedSerializer(serializers.ModelSerializer):
+class GamesPlayedSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = GamePlayed
         fields = ('id', 'owner', 'game', 'created_at', 'rating')
         read_only_fields = ('owner', 'created_at')
 
+    expandable_fields = ('game',)
+    related_serializers = {'game': game_serializer.GameSerializer}
+
     # to get the whole game representation instead of just the id
     def to_representation(self, instance):
         representation = super().to_representation(instance)
 
-        # If you want the full game details:
-        representation['game'] = game_serializer.GameSerializer(instance.game).data
+        # If you want the full game details (unless ?expand= leaves the game out):
+        if 'game' in representation and self.is_expanded('game'):
+            representation['game'] = self.nested_serializer('game', instance.game).data
 
         # if you just want the title:
         # representation['game_title'] = instance.game.title
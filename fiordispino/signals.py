@@ -1,29 +1,254 @@
-from django.db.models.signals import post_save, post_delete
+import hashlib
+
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete, pre_save
 from django.dispatch import receiver
-from django.db.models import Avg, Count
 
 from .models import Game, GamePlayed
+from .models.game import box_art_path
+from .core.box_art import compute_box_art_hash
+from .core.renditions import generate_renditions, rendition_names, renditions_exist, load_box_art
+from .core.placeholders import compute_placeholder
+from .core.image_cache import box_art_cache, storage_location
+from .core.background import submit
+from .core.featured import invalidate_featured
+from .core.stats import STATS_FIELDS, apply_rating_change
+from .core.stats_queue import deferred_stats, mark_dirty
+from .core.uploads import normalize_box_art, process_in_background
+
+
+def _invalidate_box_art_cache(img):
+    if not img:
+        return
+
+    for name in [img.name, *rendition_names(img.name)]:
+        box_art_cache.invalidate(storage_location(img.storage, name))
+
+
+def _release_box_art(img, box_art_hash=None):
+    # the same stored image can be shared by several games (identical uploads are stored once):
+    # the file and its renditions are deleted when the last game referencing it goes away
+    if not img:
+        return
+
+    if box_art_hash is None:
+        box_art_hash = img.instance.box_art_hash
+
+    def referenced():
+        # the hash is indexed, the name filter is for images stored before the content addressed layout
+        return Game.objects.filter(box_art_hash=box_art_hash, box_art=img.name).exists()
+
+    def delete_if_unreferenced():
+        if img.storage.delete_unreferenced([img.name, *rendition_names(img.name)], referenced):
+            _invalidate_box_art_cache(img)
+
+    # a rolled back transaction must not lose the file
+    transaction.on_commit(delete_if_unreferenced)
+
 
+def _restore_if_released(game_id, img, content, source=None):
+    # the image this game reuses (identical upload) may have been released by another game in the meantime: its last
+    # game was gone and this one not committed yet (see ContentAddressedStorage.delete_unreferenced). Stored again
+    def restore():
+        if img.storage.exists(img.name) or not Game.objects.filter(pk=game_id, box_art=img.name).exists():
+            return
 
-def _update_game_stats(game_instance):
+        content.seek(0)
+        img.storage.save(img.name, content)
+        if source is not None:
+            generate_renditions(img, source)
+        _invalidate_box_art_cache(img)
 
-    stats = game_instance.played_by_user.aggregate(
-        average=Avg('rating'),
-        count=Count('id')
-    )
+    transaction.on_commit(restore)
 
-    game_instance.global_rating = stats['average'] or 0.0
-    game_instance.rating_count = stats['count'] or 0
 
-    game_instance.save(update_fields=['global_rating', 'rating_count'])
+def _change_stats(game_id, added=None, removed=None):
+    if added == removed:
+        # e.g. the same rating saved again
+        return
+
+    if deferred_stats():
+        # recomputed later by the flush worker, concurrent votes don't queue up on the game row
+        mark_dirty(game_id)
+    else:
+        apply_rating_change(game_id, added, removed)
+
+
+def _stored_rating(pk):
+    # (game_id, rating) of the stored row, locked until the end of the transaction. None if it doesn't exist (anymore)
+    if connection.vendor == 'sqlite':
+        # no row locks (select_for_update is a no-op): the write lock of the whole database is taken before reading,
+        # with a write that changes nothing. A transaction that read first fails instead of waiting when it writes
+        # while another one holds the lock
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {GamePlayed._meta.db_table} SET id = id WHERE 0')
+    return GamePlayed.objects.select_for_update().filter(pk=pk).values_list('game_id', 'rating').first()
+
+
+@receiver(pre_save, sender=GamePlayed)
+def remember_previous_rating(sender, instance, update_fields=None, **kwargs):
+    # an edit replaces the rating stored in the database (the instance may have been loaded before another request
+    # changed it), which no longer counts in the stats
+    instance._previous_rating = None
+    if instance.pk is not None and (update_fields is None or {'game', 'rating'} & set(update_fields)):
+        # locked until the save commits (GamePlayed.save is atomic): a concurrent edit waits and reads this one's rating
+        instance._previous_rating = _stored_rating(instance.pk)
 
 
 @receiver(post_save, sender=GamePlayed)
 def update_stats_on_save(sender, instance, created, **kwargs):
     # this method runs whenever a user set a game as played or edit the rating
-    _update_game_stats(instance.game)
+    previous = getattr(instance, '_previous_rating', None)
+    instance._previous_rating = None
+
+    if previous is None:
+        if created:
+            _change_stats(instance.game_id, added=instance.rating)
+        return
+
+    game_id, rating = previous
+    if game_id == instance.game_id:
+        _change_stats(game_id, added=instance.rating, removed=rating)
+    else:
+        # moved to another game: the rating leaves the first one
+        _change_stats(game_id, removed=rating)
+        _change_stats(instance.game_id, added=instance.rating)
+
+
+@receiver(pre_delete, sender=GamePlayed)
+def remember_deleted_rating(sender, instance, **kwargs):
+    # deletes run in a transaction: the row stays locked until the stats are updated. Two requests deleting the same
+    # entry only count it once, the second one finds nothing to delete
+    instance._deleted_rating = _stored_rating(instance.pk)
 
 
 @receiver(post_delete, sender=GamePlayed)
 def update_stats_on_delete(sender, instance, **kwargs):
-    _update_game_stats(instance.game)
\ No newline at end of file
+    # the stored rating, the instance may have been loaded before an edit
+    deleted = getattr(instance, '_deleted_rating', None)
+    instance._deleted_rating = None
+    if deleted is not None:
+        game_id, rating = deleted
+        _change_stats(game_id, removed=rating)
+
+
+@receiver(pre_save, sender=Game)
+def update_box_art_hash(sender, instance, update_fields=None, **kwargs):
+    # saves that don't touch the image (e.g. the rating stats) must not pay for hashing it
+    if update_fields is not None and 'box_art' not in update_fields:
+        return
+
+    # a new upload is not committed yet, while an already stored image only needs hashing once
+    if instance.box_art and (not instance.box_art._committed or not instance.box_art_hash):
+        instance.box_art_hash = compute_box_art_hash(instance.box_art)
+
+        # the image being replaced may not be used by any other game anymore, post_save will check it
+        if instance.pk is not None:
+            old = Game.objects.filter(pk=instance.pk).only('box_art', 'box_art_hash').first()
+            if old is not None:
+                instance._replaced_box_art = old.box_art
+
+        # remembered for post_save, when the new image has actually been stored
+        instance._box_art_changed = True
+        # an identical image already stored is reused, see _restore_if_released
+        instance._box_art_upload = None
+        if not instance.box_art._committed:
+            field = instance.box_art.field
+            if field.storage.exists(field.generate_filename(instance, instance.box_art.name)):
+                instance._box_art_upload = instance.box_art.file
+
+
+def _process_box_art(game_id):
+    # the heavy part of an upload: decode the image once, store it normalized (progressive jpeg, no metadata),
+    # then generate its renditions and placeholder. Returns the fields that have been updated
+    game = Game.objects.filter(pk=game_id).only('box_art', 'box_art_hash').first()
+    if game is None or not game.box_art:
+        return {}
+
+    uploaded = game.box_art
+    source = load_box_art(uploaded)
+    if source is None:
+        # not a decodable image (the api rejects them, but the admin or a script may not): served as it is, without
+        # the placeholder of the image it replaced
+        fields = {'box_art_color': '', 'box_art_preview': ''}
+        if not Game.objects.filter(pk=game_id, box_art=uploaded.name).update(**fields):
+            return {}
+        invalidate_featured()
+        return fields
+
+    fields = compute_placeholder(source)
+
+    data = normalize_box_art(source)
+    digest = hashlib.sha256(data).hexdigest()
+    img, reused = uploaded, False
+    if digest != game.box_art_hash:
+        # content addressed storage: if the same image was already normalized for another game it's just reused
+        path = box_art_path(digest, 'jpg')
+        reused = uploaded.storage.exists(path)
+        name = uploaded.storage.save(path, ContentFile(data))
+        fields.update(box_art=name, box_art_hash=digest)
+        img = uploaded.field.attr_class(game, uploaded.field, name)
+
+    # if another game already uses this image its renditions are there and identical
+    if not renditions_exist(img):
+        generate_renditions(img, source)
+
+    # only if the image has not been replaced by a newer upload in the meantime
+    if not Game.objects.filter(pk=game_id, box_art=uploaded.name).update(**fields):
+        if img.name != uploaded.name:
+            _release_box_art(img, digest)
+        return {}
+
+    if img.name != uploaded.name:
+        if reused:
+            _restore_if_released(game_id, img, ContentFile(data), source)
+        _release_box_art(uploaded)
+
+    _invalidate_box_art_cache(img)
+    # an update() sends no signal, and the featured payload may hold the image as it was uploaded
+    invalidate_featured()
+    return fields
+
+
+@receiver(post_save, sender=Game)
+def update_box_art_renditions(sender, instance, **kwargs):
+    if getattr(instance, '_box_art_changed', False):
+        instance._box_art_changed = False
+        _invalidate_box_art_cache(instance.box_art)
+        if instance._box_art_upload is not None:
+            _restore_if_released(instance.pk, instance.box_art, instance._box_art_upload)
+            instance._box_art_upload = None
+
+        if process_in_background():
+            # the request returns right away, the uploaded image is served until the worker has finished
+            submit(_process_box_art, instance.pk)
+        else:
+            for field, value in _process_box_art(instance.pk).items():
+                setattr(instance, field, value)
+
+    replaced = getattr(instance, '_replaced_box_art', None)
+    if replaced is not None:
+        instance._replaced_box_art = None
+        if replaced.name != instance.box_art.name:
+            _release_box_art(replaced)
+
+
+@receiver(post_delete, sender=Game)
+def release_box_art_on_delete(sender, instance, **kwargs):
+    _release_box_art(instance.box_art)
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def invalidate_featured_on_change(sender, instance, update_fields=None, **kwargs):
+    # the stats change with every vote, the featured games show them as they were when the payload was built
+    if update_fields is not None and frozenset(update_fields) <= frozenset(STATS_FIELDS):
+        return
+    invalidate_featured()
+
+
+@receiver(m2m_changed, sender=Game.genres.through)
+def invalidate_featured_on_genres_change(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_featured()
@@ -1,6 +1,10 @@
 import pytest
 from rest_framework.test import APIClient
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from fiordispino.core.image_cache import box_art_cache
+from fiordispino.core.stats_queue import dirty_games
 
 User = get_user_model()
 
@@ -12,6 +16,50 @@ def use_tmp_media_root(tmp_path, settings):
     """
     settings.MEDIA_ROOT = tmp_path / "media"
 
+
+@pytest.fixture(autouse=True)
+def clear_box_art_cache():
+    """
+    The encoded box art cache lives as long as the process, every test starts with an empty one.
+    """
+    box_art_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def process_box_art_synchronously(settings):
+    """
+    Uploaded box arts are processed in the same thread, so that tests can check the result right after saving.
+    """
+    settings.BOX_ART_BACKGROUND_PROCESSING = False
+
+@pytest.fixture(autouse=True)
+def clear_cache(settings):
+    """
+    The default cache (e.g. the featured games) is in memory and outlives the tests, every test starts with an empty one.
+    Featured games are rebuilt in the same thread.
+    """
+    cache.clear()
+    settings.FEATURED_GAMES_BACKGROUND_REBUILD = False
+
+@pytest.fixture(autouse=True)
+def flush_stats_manually(settings):
+    """
+    In deferred stats mode the tests flush the dirty games themselves (flush_stats()), no timer is started.
+    The dirty games are rows of the test database, rolled back with it.
+    """
+    settings.GAME_STATS_FLUSH_INTERVAL = None
+    yield
+    dirty_games.cancel()
+
+@pytest.fixture(scope='session')
+def django_db_modify_db_settings(django_db_modify_db_settings_parallel_suffix, tmp_path_factory):
+    """
+    The test database is a file: the threads of the concurrency tests have a connection each, SQLite's in-memory shared
+    cache would fail their writes with "database table is locked" instead of waiting for each other.
+    """
+    from django.db import connections
+    connections['default'].settings_dict['TEST']['NAME'] = str(tmp_path_factory.mktemp('database') / 'test.sqlite3')
+
 @pytest.fixture
 def api_client():
     """
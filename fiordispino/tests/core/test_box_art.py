@@ -0,0 +1,80 @@
+import hashlib
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from mixer.backend.django import mixer
+
+from fiordispino.core.box_art import (
+    compute_box_art_hash,
+    build_box_art_url,
+    parse_byte_range,
+    RangeNotSatisfiable,
+    BOX_ART_VERSION_LENGTH,
+)
+
+
+@pytest.mark.django_db
+class TestBoxArtHash:
+
+    def test_hash_is_computed_on_upload(self):
+        content = b"fake image content"
+        image_file = SimpleUploadedFile("cover.jpg", content, content_type="image/jpeg")
+
+        game = mixer.blend('fiordispino.Game', title="game", box_art=image_file, global_rating=5.0)
+
+        assert game.box_art_hash == hashlib.sha256(content).hexdigest()
+
+    def test_hash_changes_with_the_image(self):
+        game = mixer.blend('fiordispino.Game', title="game",
+                           box_art=SimpleUploadedFile("cover.jpg", b"first", content_type="image/jpeg"))
+        old_hash = game.box_art_hash
+
+        game.box_art = SimpleUploadedFile("cover.jpg", b"second", content_type="image/jpeg")
+        game.save()
+
+        assert game.box_art_hash != old_hash
+        assert game.box_art_hash == hashlib.sha256(b"second").hexdigest()
+
+    def test_hash_of_missing_file_is_empty(self):
+        game = mixer.blend('fiordispino.Game', title="game",
+                           box_art=SimpleUploadedFile("cover.jpg", b"content", content_type="image/jpeg"))
+        game.box_art.storage.delete(game.box_art.name)
+
+        assert compute_box_art_hash(game.box_art) == ''
+
+    def test_url_is_versioned_with_the_hash(self):
+        game = mixer.blend('fiordispino.Game', title="game")
+
+        url = build_box_art_url(game)
+
+        assert url == f"/api/v1/game/{game.pk}/box-art/?v={game.box_art_hash[:BOX_ART_VERSION_LENGTH]}"
+
+    def test_url_without_hash_is_not_versioned(self):
+        game = mixer.blend('fiordispino.Game', title="game")
+        game.box_art_hash = ''
+
+        assert build_box_art_url(game) == f"/api/v1/game/{game.pk}/box-art/"
+
+
+class TestParseByteRange:
+
+    @pytest.mark.parametrize("header, expected", [
+        ("bytes=0-3", (0, 3)),
+        ("bytes=4-", (4, 9)),
+        ("bytes=-4", (6, 9)),
+        ("bytes=-50", (0, 9)),  # longer than the file -> whole file
+        ("bytes=5-50", (5, 9)),  # clamped to the end of the file
+        (None, None),
+        ("", None),
+        ("items=0-3", None),
+        ("bytes=0-1,4-5", None),  # multiple ranges are not supported, the whole file is sent
+        ("bytes=5-2", None),
+        ("bytes=-", None),
+    ])
+    def test_valid_or_ignored_ranges(self, header, expected):
+        assert parse_byte_range(header, 10) == expected
+
+    @pytest.mark.parametrize("header", ["bytes=10-", "bytes=20-30", "bytes=-0"])
+    def test_unsatisfiable_ranges(self, header):
+        with pytest.raises(RangeNotSatisfiable):
+            parse_byte_range(header, 10)
@@ -0,0 +1,96 @@
+import pytest
+
+from fiordispino.core import featured
+from fiordispino.core.featured import (
+    current_period,
+    featured_ids,
+    get_featured_ids,
+    get_featured_payload,
+    invalidate_featured,
+    seconds_left
+)
+from fiordispino.models import Game
+from fiordispino.tests.utils_testing import create_games
+
+DAY = 24 * 60 * 60
+
+
+class TestPeriods:
+
+    def test_period_is_the_day_by_default(self):
+        assert current_period(10 * DAY + 5) == current_period(11 * DAY - 1) == 10
+        assert current_period(11 * DAY) == 11
+
+    def test_seconds_left(self):
+        assert seconds_left(10, 11 * DAY - 60) == 60
+
+    def test_configurable_period(self, settings):
+        settings.FEATURED_GAMES_PERIOD = 60 * 60
+
+        assert current_period(DAY) == 24
+
+
+@pytest.mark.django_db
+class TestFeaturedIds:
+
+    def test_same_seed_and_period_same_games(self, settings):
+        create_games(50)
+        settings.FEATURED_GAMES_COUNT = 5
+
+        assert featured_ids(Game.objects.all(), 10) == featured_ids(Game.objects.all(), 10)
+        assert featured_ids(Game.objects.all(), 10) != featured_ids(Game.objects.all(), 11)
+
+    def test_new_games_dont_change_the_selection_of_the_period(self):
+        create_games(50)
+        ids = get_featured_ids(Game.objects.all(), 10)
+        create_games(50)
+
+        assert get_featured_ids(Game.objects.all(), 10) == ids
+
+
+class TestFeaturedPayload:
+
+    @pytest.fixture
+    def builds(self):
+        calls = []
+
+        def build(period_index):
+            calls.append(period_index)
+            return f"payload {period_index}"
+
+        build.calls = calls
+        return build
+
+    def test_built_once_per_period(self, builds):
+        assert get_featured_payload('key', builds, now=10 * DAY) == ("payload 10", 10)
+        assert get_featured_payload('key', builds, now=10 * DAY + 60) == ("payload 10", 10)
+
+        assert builds.calls == [10]
+
+    def test_rebuilt_when_the_period_rolls_over(self, builds):
+        get_featured_payload('key', builds, now=10 * DAY)
+
+        assert get_featured_payload('key', builds, now=11 * DAY) == ("payload 11", 11)
+
+    def test_rebuilt_when_the_catalogue_changes(self, builds):
+        get_featured_payload('key', builds, now=10 * DAY)
+        invalidate_featured()
+        get_featured_payload('key', builds, now=10 * DAY)
+
+        assert builds.calls == [10, 10]
+
+    def test_stale_payload_is_served_while_rebuilding_in_background(self, settings, monkeypatch, builds):
+        settings.FEATURED_GAMES_BACKGROUND_REBUILD = True
+        jobs = []
+        monkeypatch.setattr(featured, 'submit', lambda job, *args: jobs.append((job, args)))
+
+        get_featured_payload('key', builds, now=10 * DAY)
+        # the first request of the new period and the ones after it get the old payload, a single rebuild is started
+        assert get_featured_payload('key', builds, now=11 * DAY) == ("payload 10", 10)
+        assert get_featured_payload('key', builds, now=11 * DAY) == ("payload 10", 10)
+        assert len(jobs) == 1
+
+        job, args = jobs[0]
+        job(*args)
+        assert get_featured_payload('key', builds, now=11 * DAY) == ("payload 11", 11)
+        assert builds.calls == [10, 11]
@@ -0,0 +1,103 @@
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from mixer.backend.django import mixer
+
+from fiordispino.core.image_cache import EncodedImageCache, box_art_cache, file_identity
+from fiordispino.core.utils import encode_image_to_base64
+
+
+class TestEncodedImageCache:
+
+    def test_miss_then_hit(self):
+        cache = EncodedImageCache()
+
+        assert cache.get('key') is None
+        cache.put('key', 'value')
+
+        assert cache.get('key') == 'value'
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 1
+
+    def test_least_recently_used_entry_is_evicted(self, settings):
+        settings.BOX_ART_CACHE_MAX_BYTES = 10
+        cache = EncodedImageCache()
+
+        cache.put(('a',), 'aaaa')
+        cache.put(('b',), 'bbbb')
+        cache.get(('a',))  # 'b' is now the least recently used
+        cache.put(('c',), 'cccc')
+
+        assert cache.get(('b',)) is None
+        assert cache.get(('a',)) == 'aaaa'
+        assert cache.stats()['evictions'] == 1
+        assert cache.stats()['bytes'] == 8
+
+    def test_entries_over_the_limit_are_not_cached(self, settings):
+        settings.BOX_ART_CACHE_MAX_ENTRY_BYTES = 3
+        cache = EncodedImageCache()
+
+        cache.put(('a',), 'aaaa')
+
+        assert cache.get(('a',)) is None
+        assert cache.stats()['entries'] == 0
+
+    def test_invalidate_drops_every_version_of_a_file(self):
+        cache = EncodedImageCache()
+        cache.put(('path', 1, 1), 'old')
+        cache.put(('path', 2, 2), 'new')
+        cache.put(('other', 1, 1), 'other')
+
+        cache.invalidate('path')
+
+        assert cache.stats()['entries'] == 1
+        assert cache.stats()['bytes'] == len('other')
+
+
+@pytest.mark.django_db
+class TestEncoderCache:
+
+    @pytest.fixture
+    def game(self):
+        image_file = SimpleUploadedFile("cover.jpg", b"image content", content_type="image/jpeg")
+        return mixer.blend('fiordispino.Game', title="game", box_art=image_file)
+
+    def test_second_encoding_is_served_from_the_cache(self, game):
+        first = encode_image_to_base64(game.box_art)
+        second = encode_image_to_base64(game.box_art)
+
+        assert first == second
+        assert box_art_cache.stats()['hits'] == 1
+        assert box_art_cache.stats()['misses'] == 1
+
+    def test_changed_file_is_encoded_again(self, game):
+        encode_image_to_base64(game.box_art)
+
+        # same name, different content -> different size/mtime
+        with open(game.box_art.path, 'wb') as f:
+            f.write(b"a different image content")
+
+        assert encode_image_to_base64(game.box_art) == "YSBkaWZmZXJlbnQgaW1hZ2UgY29udGVudA=="
+
+    def test_cache_is_invalidated_when_the_box_art_changes(self, game, django_capture_on_commit_callbacks):
+        encode_image_to_base64(game.box_art)
+        assert box_art_cache.stats()['entries'] == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            game.box_art = SimpleUploadedFile("cover.jpg", b"new content", content_type="image/jpeg")
+            game.save()
+
+        assert box_art_cache.stats()['entries'] == 0
+
+    def test_cache_is_invalidated_when_the_game_is_deleted(self, game, django_capture_on_commit_callbacks):
+        encode_image_to_base64(game.box_art)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            game.delete()
+
+        assert box_art_cache.stats()['entries'] == 0
+
+    def test_identity_of_missing_file_raises(self, game):
+        game.box_art.storage.delete(game.box_art.name)
+
+        with pytest.raises(OSError):
+            file_identity(game.box_art)
@@ -0,0 +1,68 @@
+import base64
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from mixer.backend.django import mixer
+
+from fiordispino.core.placeholders import dominant_color, tiny_preview, PREVIEW_SIZE
+
+
+class TestPlaceholders:
+
+    def test_dominant_color_is_the_most_frequent_one(self):
+        image = Image.new("RGB", (100, 100), (255, 0, 0))
+        # a blue stripe covering 20% of the image
+        image.paste((0, 0, 255), (0, 0, 100, 20))
+
+        assert dominant_color(image) == "#ff0000"
+
+    def test_preview_is_a_tiny_image_data_uri(self):
+        image = Image.new("RGB", (600, 900), (0, 128, 0))
+
+        preview = tiny_preview(image)
+
+        header, data = preview.split(',', 1)
+        assert header.startswith('data:image/') and header.endswith(';base64')
+        with Image.open(BytesIO(base64.b64decode(data))) as decoded:
+            assert max(decoded.size) == PREVIEW_SIZE
+        assert len(preview) < 1000
+
+
+@pytest.mark.django_db
+class TestGamePlaceholder:
+
+    def test_placeholder_is_computed_on_upload(self):
+        file_obj = BytesIO()
+        Image.new("RGB", (300, 400), (0, 0, 255)).save(file_obj, format='JPEG')
+        upload = SimpleUploadedFile("cover.jpg", file_obj.getvalue(), content_type="image/jpeg")
+
+        game = mixer.blend('fiordispino.Game', title="game", box_art=upload)
+        game.refresh_from_db()
+
+        assert game.box_art_color == "#0000fe"
+        assert game.box_art_preview.startswith("data:image/")
+
+    def test_undecodable_box_art_has_no_placeholder(self):
+        upload = SimpleUploadedFile("cover.jpg", b"not an image", content_type="image/jpeg")
+
+        game = mixer.blend('fiordispino.Game', title="game", box_art=upload)
+        game.refresh_from_db()
+
+        assert game.box_art_color == ""
+        assert game.box_art_preview == ""
+
+    def test_undecodable_replacement_clears_the_placeholder(self):
+        file_obj = BytesIO()
+        Image.new("RGB", (300, 400), (0, 0, 255)).save(file_obj, format='JPEG')
+        game = mixer.blend('fiordispino.Game', title="game",
+                           box_art=SimpleUploadedFile("cover.jpg", file_obj.getvalue(), content_type="image/jpeg"))
+
+        game.box_art = SimpleUploadedFile("cover.jpg", b"not an image", content_type="image/jpeg")
+        game.save()
+        game.refresh_from_db()
+
+        # the color and preview of the previous image no longer describe the box art
+        assert game.box_art_color == ""
+        assert game.box_art_preview == ""
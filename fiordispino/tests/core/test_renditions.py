@@ -0,0 +1,86 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from mixer.backend.django import mixer
+
+from fiordispino.core.renditions import (
+    rendition_name,
+    get_box_art_file,
+    negotiate_extension,
+    get_available_extensions,
+    delete_renditions,
+)
+
+
+def jpeg_upload(width=800, height=1200):
+    file_obj = BytesIO()
+    Image.new("RGB", (width, height), (255, 0, 0)).save(file_obj, format='JPEG')
+    return SimpleUploadedFile('cover.jpg', file_obj.getvalue(), content_type='image/jpeg')
+
+
+class TestRenditionHelpers:
+
+    def test_rendition_is_stored_next_to_the_original(self):
+        assert rendition_name('games/covers/zelda_cover.jpg', 'thumb', 'webp') == 'games/covers/zelda_cover.thumb.webp'
+
+    @pytest.mark.parametrize("accept, expected", [
+        ("image/avif,image/webp,*/*", "avif"),
+        ("image/webp,*/*", "webp"),
+        ("*/*", "jpg"),
+        ("", "jpg"),
+        ("image/avif;q=0, image/webp", "webp"),
+        ("image/avif;q=0.5,image/webp;q=0.8,*/*;q=0.1", "webp"),
+        ("image/webp;q=0.5, image/jpeg", "jpg"),
+        ("image/avif;q=0, image/webp;q=0", "jpg"),
+        ("IMAGE/AVIF", "avif"),
+    ])
+    def test_negotiate_extension(self, accept, expected):
+        if expected not in get_available_extensions():
+            pytest.skip(f"pillow was built without {expected} support")
+
+        assert negotiate_extension(accept) == expected
+
+
+@pytest.mark.django_db
+class TestRenditionGeneration:
+
+    def test_renditions_are_generated_on_upload(self):
+        game = mixer.blend('fiordispino.Game', title="game", box_art=jpeg_upload())
+
+        thumb = get_box_art_file(game, 'thumb', 'jpg')
+
+        assert thumb.name == rendition_name(game.box_art.name, 'thumb', 'jpg')
+        with thumb.open('rb') as f:
+            with Image.open(f) as image:
+                # the aspect ratio is kept, the longest side is scaled down
+                assert image.size == (133, 200)
+
+    def test_every_available_format_is_generated(self):
+        game = mixer.blend('fiordispino.Game', title="game", box_art=jpeg_upload())
+
+        for ext in get_available_extensions():
+            assert game.box_art.storage.exists(rendition_name(game.box_art.name, 'medium', ext))
+
+    def test_renditions_are_regenerated_when_the_image_changes(self):
+        game = mixer.blend('fiordispino.Game', title="game", box_art=jpeg_upload())
+
+        game.box_art = jpeg_upload(width=1200, height=600)
+        game.save()
+
+        with get_box_art_file(game, 'thumb', 'jpg').open('rb') as f:
+            with Image.open(f) as image:
+                assert image.size == (200, 100)
+
+    def test_original_is_used_when_renditions_are_missing(self):
+        game = mixer.blend('fiordispino.Game', title="game", box_art=jpeg_upload())
+        delete_renditions(game.box_art)
+
+        assert get_box_art_file(game, 'thumb', 'jpg').name == game.box_art.name
+
+    def test_non_image_files_get_no_renditions(self):
+        upload = SimpleUploadedFile("cover.jpg", b"not an image", content_type="image/jpeg")
+        game = mixer.blend('fiordispino.Game', title="game", box_art=upload)
+
+        assert get_box_art_file(game, 'thumb', 'jpg').name == game.box_art.name
@@ -0,0 +1,88 @@
+import random
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from fiordispino.core.sampling import sample_ids, weighted_sample_ids
+from fiordispino.models import Game
+from fiordispino.tests.utils_testing import create_games
+
+
+@pytest.fixture
+def catalogue(db):
+    return create_games(50)
+
+
+@pytest.mark.django_db
+class TestSampleIds:
+
+    def test_distinct_existing_ids(self, catalogue):
+        ids = sample_ids(Game.objects.all(), 10)
+
+        assert len(ids) == len(set(ids)) == 10
+        assert set(ids) <= {game.pk for game in catalogue}
+
+    def test_gaps_are_skipped(self, catalogue):
+        # only 3 games left out of a range of 50 ids
+        kept = [catalogue[0].pk, catalogue[20].pk, catalogue[-1].pk]
+        Game.objects.exclude(pk__in=kept).delete()
+
+        assert sorted(sample_ids(Game.objects.all(), 3)) == kept
+
+    def test_sparse_ranges_still_fill_the_sample(self, catalogue):
+        kept = [game.pk for game in catalogue[::10]]
+        Game.objects.exclude(pk__in=kept).delete()
+
+        assert sorted(sample_ids(Game.objects.all(), 5)) == kept
+
+    def test_fewer_games_than_asked(self, catalogue):
+        assert len(sample_ids(Game.objects.filter(pk__in=[catalogue[1].pk, catalogue[2].pk]), 5)) == 2
+
+    def test_empty_catalogue(self, db):
+        assert sample_ids(Game.objects.all(), 5) == []
+
+    def test_same_seed_same_sample(self, catalogue):
+        assert sample_ids(Game.objects.all(), 5, random.Random(42)) == sample_ids(Game.objects.all(), 5, random.Random(42))
+
+    def test_every_game_can_be_picked(self, catalogue):
+        picked = set()
+        for _ in range(100):
+            picked.update(sample_ids(Game.objects.all(), 5))
+
+        assert picked == {game.pk for game in catalogue}
+
+    def test_no_order_by_random(self, catalogue):
+        with CaptureQueriesContext(connection) as queries:
+            sample_ids(Game.objects.all(), 20)
+
+        assert not any('RANDOM()' in query['sql'] for query in queries)
+
+
+@pytest.mark.django_db
+class TestWeightedSampleIds:
+
+    def test_best_rated_games_come_up_more_often(self):
+        best, worst = create_games(1, global_rating=10)[0], create_games(1, global_rating=0)[0]
+        rng = random.Random(7)
+
+        picks = [weighted_sample_ids(Game.objects.all(), 1, 'rating', rng)[0] for _ in range(200)]
+
+        # 11 to 1
+        assert picks.count(best.pk) > 150
+        assert worst.pk in picks
+
+    def test_least_known_games_come_up_more_often(self):
+        unknown, popular = create_games(1, rating_count=0)[0], create_games(1, rating_count=50)[0]
+        rng = random.Random(7)
+
+        picks = [weighted_sample_ids(Game.objects.all(), 1, 'exposure', rng)[0] for _ in range(200)]
+
+        assert picks.count(unknown.pk) > 150
+
+    def test_distinct_ids(self):
+        create_games(30)
+
+        ids = weighted_sample_ids(Game.objects.all(), 10, 'rating')
+
+        assert len(set(ids)) == 10
@@ -0,0 +1,32 @@
+import pytest
+
+from fiordispino.core.stats import rating_percentile, rating_percentiles
+
+
+def histogram(*ratings):
+    return [ratings.count(rating) for rating in range(1, 11)]
+
+
+class TestRatingPercentiles:
+
+    @pytest.mark.parametrize("ratings, percentile, expected", [
+        ((5,), 50, 5),
+        ((1, 2, 3), 50, 2),
+        # the two middle ratings averaged
+        ((4, 7), 50, 5.5),
+        ((1, 2, 3, 4, 5, 6, 7, 8, 9, 10), 25, 3.25),
+        ((1, 2, 3, 4, 5, 6, 7, 8, 9, 10), 90, 9.1),
+        ((3, 10, 10, 10), 0, 3),
+        ((3, 10, 10, 10), 100, 10),
+    ])
+    def test_percentile(self, ratings, percentile, expected):
+        assert rating_percentile(histogram(*ratings), percentile) == expected
+
+    def test_same_as_sorting_the_ratings(self):
+        ratings = (9, 2, 7, 7, 10, 1, 8, 8, 8, 3, 6)
+        ordered = sorted(ratings)
+
+        assert rating_percentile(histogram(*ratings), 50) == ordered[len(ordered) // 2]
+
+    def test_no_ratings(self):
+        assert rating_percentiles([0] * 10) == {'p25': None, 'median': None, 'p75': None, 'p90': None}
@@ -0,0 +1,184 @@
+import datetime
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from mixer.backend.django import mixer
+
+from fiordispino.core import stats_queue
+from fiordispino.core.stats_queue import DirtyGames, dirty_games, flush_stats
+from fiordispino.models import GamePlayed
+from fiordispino.tests.utils_testing import create_games
+
+NOW = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+@pytest.fixture
+def deferred(settings):
+    settings.GAME_STATS_DEFERRED = True
+
+
+def stats(game):
+    game.refresh_from_db()
+    return game.rating_sum, game.rating_count, float(game.global_rating)
+
+
+def vote(game, rating):
+    return GamePlayed.objects.create(owner=mixer.blend(get_user_model()), game=game, rating=rating)
+
+
+@pytest.mark.django_db
+class TestDeferredStats:
+
+    def test_votes_are_counted_by_the_flush(self, deferred, django_capture_on_commit_callbacks):
+        game, = create_games(1)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            vote(game, 10)
+            vote(game, 7)
+
+        assert stats(game) == (0, 0, 0.0)
+        assert len(dirty_games) == 1
+
+        assert flush_stats() == 1
+        assert stats(game) == (17, 2, 8.5)
+        assert len(dirty_games) == 0
+
+    def test_edits_and_deletes(self, deferred, django_capture_on_commit_callbacks):
+        game, = create_games(1)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            played = vote(game, 10)
+            vote(game, 6)
+        flush_stats()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            played.rating = 2
+            played.save()
+        flush_stats()
+        assert stats(game) == (8, 2, 4.0)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            played.delete()
+        flush_stats()
+        assert stats(game) == (6, 1, 6.0)
+
+    def test_rolled_back_votes_mark_nothing(self, deferred):
+        game, = create_games(1)
+
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                vote(game, 10)
+                assert len(dirty_games) == 1
+                raise RuntimeError
+
+        assert len(dirty_games) == 0
+
+    def test_votes_are_marked_in_their_transaction(self, deferred, django_capture_on_commit_callbacks):
+        game, = create_games(1)
+
+        # the mark doesn't wait for an on_commit callback, that a killed process would never run
+        with django_capture_on_commit_callbacks(execute=False):
+            vote(game, 10)
+
+        assert len(dirty_games) == 1
+
+    def test_flushed_in_batches(self, deferred, settings, django_capture_on_commit_callbacks):
+        settings.GAME_STATS_BATCH_SIZE = 2
+        games = create_games(5)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            for game in games:
+                vote(game, 4)
+
+        with mock.patch.object(stats_queue, 'recompute_stats', wraps=stats_queue.recompute_stats) as recompute:
+            assert flush_stats() == 5
+
+        assert [len(call.args[0]) for call in recompute.call_args_list] == [2, 2, 1]
+        assert all(stats(game) == (4, 1, 4.0) for game in games)
+
+    def test_failed_flush_keeps_the_games(self, deferred, django_capture_on_commit_callbacks):
+        game, = create_games(1)
+        with django_capture_on_commit_callbacks(execute=True):
+            vote(game, 5)
+
+        with mock.patch.object(stats_queue, 'recompute_stats', side_effect=RuntimeError):
+            with pytest.raises(RuntimeError):
+                flush_stats()
+
+        assert len(dirty_games) == 1
+        flush_stats()
+        assert stats(game) == (5, 1, 5.0)
+
+    def test_marks_outlive_the_process(self, deferred, django_capture_on_commit_callbacks):
+        game, = create_games(1)
+        with django_capture_on_commit_callbacks(execute=True):
+            vote(game, 8)
+
+        # e.g. the process that took the vote was killed before its flush, another one counts it
+        assert DirtyGames().flush() == 1
+        assert stats(game) == (8, 1, 8.0)
+        assert len(dirty_games) == 0
+
+    def test_changes_during_the_flush_are_kept(self, deferred, django_capture_on_commit_callbacks):
+        first, second = create_games(2)
+        with django_capture_on_commit_callbacks(execute=True):
+            vote(first, 3)
+
+        recompute = stats_queue.recompute_stats
+
+        def recompute_while_voting(ids):
+            recompute(ids)
+            dirty_games.mark(second.pk)
+
+        with mock.patch.object(stats_queue, 'recompute_stats', side_effect=recompute_while_voting):
+            assert flush_stats() == 1
+
+        # left to the next flush
+        assert len(dirty_games) == 1
+
+    def test_immediate_mode_marks_nothing(self, django_capture_on_commit_callbacks):
+        game, = create_games(1)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            vote(game, 9)
+
+        assert len(dirty_games) == 0
+        assert stats(game) == (9, 1, 9.0)
+
+
+@pytest.mark.django_db
+class TestStaleness:
+
+    def test_staleness_of_the_pending_changes(self):
+        first, second = create_games(2)
+        assert dirty_games.staleness() == 0.0
+
+        with mock.patch('django.utils.timezone.now', return_value=NOW):
+            dirty_games.mark(first.pk)
+        with mock.patch('django.utils.timezone.now', return_value=NOW + datetime.timedelta(seconds=3)):
+            dirty_games.mark(second.pk)
+            # the oldest change counts
+            assert dirty_games.staleness() == 3.0
+
+    def test_flush_measures_the_window(self):
+        game, = create_games(1)
+        with mock.patch('django.utils.timezone.now', return_value=NOW):
+            dirty_games.mark(game.pk)
+        with mock.patch('django.utils.timezone.now', return_value=NOW + datetime.timedelta(seconds=2.5)), \
+                mock.patch('time.monotonic', return_value=100.0):
+            flush_stats()
+
+        assert dirty_games.last_flush == {'games': 1, 'duration': 0.0, 'staleness': 2.5}
+
+    def test_first_change_schedules_a_flush(self, settings, django_capture_on_commit_callbacks):
+        settings.GAME_STATS_FLUSH_INTERVAL = 5
+        first, second = create_games(2)
+
+        with mock.patch.object(stats_queue, 'schedule') as schedule, \
+                django_capture_on_commit_callbacks(execute=True):
+            dirty_games.mark(first.pk)
+            dirty_games.mark(second.pk)
+
+        schedule.assert_called_once_with(5, dirty_games.flush)
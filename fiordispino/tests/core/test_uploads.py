@@ -0,0 +1,100 @@
+import hashlib
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from mixer.backend.django import mixer
+
+from fiordispino import signals
+from fiordispino.core.renditions import load_box_art, renditions_exist
+from fiordispino.core.uploads import normalize_box_art
+from fiordispino.models import Game
+from fiordispino.signals import _process_box_art
+
+
+def jpeg_with_exif():
+    exif = Image.Exif()
+    exif[0x010F] = "Camera maker"
+    file_obj = BytesIO()
+    Image.new("RGB", (300, 400), (0, 0, 255)).save(file_obj, format='JPEG', exif=exif, quality=100)
+    return file_obj.getvalue()
+
+
+class TestNormalizeBoxArt:
+
+    def test_progressive_jpeg_without_metadata(self):
+        with Image.open(BytesIO(jpeg_with_exif())) as source:
+            source.load()
+            data = normalize_box_art(source)
+
+        with Image.open(BytesIO(data)) as normalized:
+            assert normalized.format == 'JPEG'
+            assert normalized.info.get('progressive')
+            assert 'exif' not in normalized.info
+            assert normalized.size == (300, 400)
+
+
+@pytest.mark.django_db
+class TestBoxArtProcessing:
+
+    def test_upload_is_normalized(self):
+        content = jpeg_with_exif()
+        game = mixer.blend(Game, title="game", box_art=SimpleUploadedFile("cover.jpg", content))
+        game.refresh_from_db()
+
+        with game.box_art.open('rb') as stored:
+            data = stored.read()
+        assert game.box_art_hash == hashlib.sha256(data).hexdigest() != hashlib.sha256(content).hexdigest()
+        assert game.box_art.name.endswith(f"{game.box_art_hash}.jpg")
+        assert renditions_exist(game.box_art)
+        assert game.box_art_preview
+
+    def test_raw_upload_is_deleted(self, django_capture_on_commit_callbacks):
+        content = jpeg_with_exif()
+        with django_capture_on_commit_callbacks(execute=True):
+            game = mixer.blend(Game, title="game", box_art=SimpleUploadedFile("cover.jpg", content))
+
+        raw_digest = hashlib.sha256(content).hexdigest()
+        assert not game.box_art.storage.exists(game.box_art.name.replace(game.box_art_hash, raw_digest))
+
+    def test_processing_runs_after_commit_in_background(self, settings, django_capture_on_commit_callbacks):
+        settings.BOX_ART_BACKGROUND_PROCESSING = True
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            game = mixer.blend(Game, title="game", box_art=SimpleUploadedFile("cover.jpg", jpeg_with_exif()))
+
+        # the save returned with the upload as it is, the worker is started only on commit
+        assert len(callbacks) == 1
+        assert game.box_art_preview == ''
+        assert not renditions_exist(game.box_art)
+
+        # what the worker runs
+        _process_box_art(game.pk)
+
+        game.refresh_from_db()
+        assert game.box_art_preview
+        assert renditions_exist(game.box_art)
+
+    @pytest.mark.parametrize('content', [jpeg_with_exif(), b"not an image"], ids=['image', 'undecodable'])
+    def test_replaced_upload_is_not_overwritten(self, settings, monkeypatch, content):
+        settings.BOX_ART_BACKGROUND_PROCESSING = True
+        game = mixer.blend(Game, title="game", box_art=SimpleUploadedFile("cover.jpg", content))
+        Game.objects.filter(pk=game.pk).update(box_art_color="#123456")
+
+        def replaced_while_loading(img):
+            # a newer upload lands while the worker is decoding this one
+            Game.objects.filter(pk=game.pk).update(box_art="games/covers/newer.jpg")
+            return load_box_art(img)
+
+        monkeypatch.setattr(signals, 'load_box_art', replaced_while_loading)
+
+        assert _process_box_art(game.pk) == {}
+        game.refresh_from_db()
+        assert game.box_art.name == "games/covers/newer.jpg"
+        assert game.box_art_color == "#123456"
+
+    def test_undecodable_upload_is_kept(self):
+        game = mixer.blend(Game, title="game", box_art=SimpleUploadedFile("cover.jpg", b"not an image"))
+
+        assert game.box_art_hash == hashlib.sha256(b"not an image").hexdigest()
@@ -1,7 +1,9 @@
+import json
 import pytest
 import re
+from io import BytesIO
 
-from fiordispino.core.utils import pattern, encode_image_to_base64
+from fiordispino.core.utils import pattern, encode_image_to_base64, iter_base64, iter_json_with_base64, get_base64_chunk_size
 import pytest
 import base64
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -54,7 +56,10 @@ class TestPatternUtility:
 @pytest.mark.django_db
 class TestImageEncoder:
 
-    def test_encode_valid_image_success(self):
+    def test_encode_valid_image_success(self, settings):
+        # the upload is stored as it is until the (here never started) background processing re-encodes it
+        settings.BOX_ART_BACKGROUND_PROCESSING = True
+
         # these raw bytes represent a 1x1 image
         small_gif_content = (
             b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x80\x00\x00\xff\x00\x00'
@@ -96,3 +101,31 @@ class TestImageEncoder:
 
         with pytest.raises(ImageEncoderException):
             encode_image_to_base64(game.box_art)
+
+
+class TestBase64Streaming:
+
+    @pytest.mark.parametrize("content", [b"", b"a", b"ab", b"abc", b"abcd", bytes(range(256)) * 10])
+    def test_chunks_concatenate_to_the_full_encoding(self, content):
+        chunks = list(iter_base64(BytesIO(content), chunk_size=3))
+
+        assert "".join(chunks) == base64.b64encode(content).decode()
+        assert all(len(chunk) <= 4 for chunk in chunks)
+
+    def test_chunk_size_is_rounded_to_a_multiple_of_three(self, settings):
+        settings.BOX_ART_BASE64_CHUNK_SIZE = 100
+
+        assert get_base64_chunk_size() == 99
+
+    def test_json_is_streamed_with_the_image_as_last_member(self):
+        image_file = BytesIO(b"image content")
+
+        body = "".join(iter_json_with_base64({'id': 1}, 'box_art', image_file))
+
+        assert json.loads(body) == {'id': 1, 'box_art': base64.b64encode(b"image content").decode()}
+        assert image_file.closed
+
+    def test_json_stream_of_empty_object(self):
+        body = "".join(iter_json_with_base64({}, 'box_art', BytesIO(b"x")))
+
+        assert json.loads(body) == {'box_art': 'eA=='}
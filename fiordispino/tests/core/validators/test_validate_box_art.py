@@ -0,0 +1,62 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from fiordispino.core.exceptions import ImageTooLargeException, InvalidImageContentException, InvalidImageFormatException
+from fiordispino.core.validators import validate_box_art
+
+
+def jpeg_upload(size=(100, 100), name='cover.jpg', format='JPEG'):
+    file_obj = BytesIO()
+    Image.new("RGB", size, (255, 0, 0)).save(file_obj, format=format)
+    return SimpleUploadedFile(name, file_obj.getvalue(), content_type='image/jpeg')
+
+
+class TestValidateBoxArt:
+    def test_valid_jpeg(self):
+        upload = jpeg_upload()
+
+        validate_box_art(upload)
+
+        # the file is left ready to be stored
+        assert upload.tell() == 0
+
+    def test_non_jpg_name_fails(self):
+        with pytest.raises(InvalidImageFormatException):
+            validate_box_art(jpeg_upload(name='cover.png'))
+
+    def test_other_format_named_jpg_fails(self):
+        with pytest.raises(InvalidImageContentException):
+            validate_box_art(jpeg_upload(format='PNG'))
+
+    def test_corrupt_image_fails(self):
+        with pytest.raises(InvalidImageContentException):
+            validate_box_art(SimpleUploadedFile('cover.jpg', b'not an image', content_type='image/jpeg'))
+
+    def test_truncated_image_fails(self):
+        upload = jpeg_upload()
+        truncated = SimpleUploadedFile('cover.jpg', upload.read()[:100], content_type='image/jpeg')
+
+        with pytest.raises(InvalidImageContentException):
+            validate_box_art(truncated)
+
+    def test_too_many_pixels_fails(self, settings):
+        # only the header is read: the same check rejects decompression bombs without decoding them
+        settings.BOX_ART_MAX_PIXELS = 50 * 50
+
+        with pytest.raises(ImageTooLargeException):
+            validate_box_art(jpeg_upload(size=(60, 60)))
+
+    def test_too_wide_image_fails(self, settings):
+        settings.BOX_ART_MAX_DIMENSION = 100
+
+        with pytest.raises(ImageTooLargeException):
+            validate_box_art(jpeg_upload(size=(101, 10)))
+
+    def test_too_big_file_fails(self, settings):
+        settings.BOX_ART_MAX_UPLOAD_BYTES = 100
+
+        with pytest.raises(ImageTooLargeException):
+            validate_box_art(jpeg_upload())
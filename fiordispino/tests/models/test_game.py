@@ -1,17 +1,30 @@
+import hashlib
 import os
 from datetime import date
+from io import BytesIO
 from time import sleep
+from unittest import mock
 
 import pytest
+from PIL import Image
 from django.core.exceptions import ValidationError
 from fiordispino.core.exceptions import InvalidImageFormatException
 from mixer.backend.django import mixer
+from django.core.files.uploadedfile import SimpleUploadedFile
 
 from fiordispino.models import Game, Genre, GamePlayed
+from fiordispino.core.renditions import rendition_names, renditions_exist
+from fiordispino.core.storage import ContentAddressedStorage
 from fiordispino.models.game import build_path
 from fiordispino.tests.utils_testing import *
 
 
+def jpeg_bytes():
+    buffer = BytesIO()
+    Image.new("RGB", (300, 400), (255, 0, 0)).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
 @pytest.mark.django_db
 class TestGameModel:
 
@@ -71,16 +84,95 @@ class TestGameModel:
             invalid_game.full_clean()
 
     def test_box_art_path_logic(self):
-        game = Game(title="The Legend of Zelda")
-        original_filename = "zelda.png"
+        # the box art is named after the sha256 of its content, in directories sharded by the first bytes of the hash
+        game = Game(title="The Legend of Zelda", box_art=SimpleUploadedFile("zelda.PNG", b"zelda cover"))
+        original_filename = "zelda.PNG"
 
         generated_path = build_path(game, original_filename)
 
-        expected_filename = "the_legend_of_zelda_cover.png"
-        expected_path = os.path.join('games', 'covers', expected_filename)
+        digest = hashlib.sha256(b"zelda cover").hexdigest()
+        expected_path = os.path.join('games', 'covers', digest[:2], digest[2:4], f"{digest}.png")
 
         assert generated_path == expected_path
 
+    def test_titles_differing_only_in_case_dont_share_box_art(self):
+        zelda = mixer.blend(Game, title="Zelda", box_art=SimpleUploadedFile("cover.jpg", b"zelda"))
+        other = mixer.blend(Game, title="ZELDA", box_art=SimpleUploadedFile("cover.jpg", b"another zelda"))
+
+        assert zelda.box_art.name != other.box_art.name
+        with zelda.box_art.open('rb') as f:
+            assert f.read() == b"zelda"
+
+    def test_identical_box_art_is_stored_once(self):
+        first = mixer.blend(Game, title="Dark Souls", box_art=SimpleUploadedFile("cover.jpg", b"same cover"))
+        second = mixer.blend(Game, title="Dark Souls Remastered", box_art=SimpleUploadedFile("other.jpg", b"same cover"))
+
+        assert first.box_art.name == second.box_art.name
+        assert len(os.listdir(os.path.dirname(first.box_art.path))) == 1
+
+    def test_shared_box_art_is_deleted_with_the_last_game(self, django_capture_on_commit_callbacks):
+        first = mixer.blend(Game, title="Dark Souls", box_art=SimpleUploadedFile("cover.jpg", b"same cover"))
+        second = mixer.blend(Game, title="Dark Souls Remastered", box_art=SimpleUploadedFile("cover.jpg", b"same cover"))
+        storage, name = first.box_art.storage, first.box_art.name
+
+        with django_capture_on_commit_callbacks(execute=True):
+            first.delete()
+        assert storage.exists(name)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            second.delete()
+        assert not storage.exists(name)
+
+    @pytest.mark.parametrize('content', [b"same cover", None], ids=['stored as uploaded', 'normalized'])
+    def test_box_art_released_while_an_identical_upload_reuses_it(self, content, django_capture_on_commit_callbacks):
+        content = content or jpeg_bytes()
+        first = mixer.blend(Game, title="Dark Souls", box_art=SimpleUploadedFile("cover.jpg", content))
+        storage, name = first.box_art.storage, first.box_art.name
+
+        with django_capture_on_commit_callbacks(execute=False) as released:
+            first.delete()
+
+        save = ContentAddressedStorage._save
+
+        def reuse_while_released(self, name, content, released_name=name):
+            # the deletion commits after the identical upload found the image, before the new game is committed
+            stored = save(self, name, content)
+            if name == released_name:
+                for callback in released:
+                    callback()
+                released.clear()
+            return stored
+
+        with mock.patch.object(ContentAddressedStorage, '_save', reuse_while_released), \
+                django_capture_on_commit_callbacks(execute=True):
+            second = mixer.blend(Game, title="Dark Souls Remastered", box_art=SimpleUploadedFile("cover.jpg", content))
+
+        assert second.box_art.name == name
+        assert storage.exists(name)
+        assert renditions_exist(second.box_art) == (content != b"same cover")
+
+    def test_box_art_used_again_before_the_release_is_kept(self):
+        game = mixer.blend(Game, title="Dark Souls", box_art=SimpleUploadedFile("cover.jpg", jpeg_bytes()))
+        storage, names = game.box_art.storage, [game.box_art.name, *rendition_names(game.box_art.name)]
+
+        # another game was committed between the two checks
+        assert not storage.delete_unreferenced(names, mock.Mock(side_effect=[False, True]))
+
+        assert all(storage.exists(name) for name in names)
+        assert storage.delete_unreferenced(names, mock.Mock(return_value=False))
+        assert not any(storage.exists(name) for name in names)
+
+    def test_replaced_box_art_is_deleted(self, django_capture_on_commit_callbacks):
+        game = mixer.blend(Game, title="Dark Souls", box_art=SimpleUploadedFile("cover.jpg", b"old cover"))
+        storage, old_name = game.box_art.storage, game.box_art.name
+
+        with django_capture_on_commit_callbacks(execute=True):
+            game.box_art = SimpleUploadedFile("cover.jpg", b"new cover")
+            game.save()
+
+        assert not storage.exists(old_name)
+        assert storage.exists(game.box_art.name)
+
     def test_game_rating_count_cant_be_negative(self):
         game = Game(
             title="Dragon quest V",
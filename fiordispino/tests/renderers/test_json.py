@@ -0,0 +1,81 @@
+import datetime
+import io
+import json
+import uuid
+from decimal import Decimal
+
+import pytest
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict
+
+from fiordispino.parsers import ORJSONParser
+from fiordispino.renderers import ORJSONRenderer
+
+PAYLOADS = [
+    {'id': 1, 'title': "Celeste", 'genres': [{'id': 1, 'name': "Platformer"}], 'global_rating': "9.3", 'pegi': None},
+    [{'release_date': datetime.date(2018, 1, 25), 'created_at': datetime.datetime(2024, 5, 1, 10, 30, 15, 123456,
+                                                                                   tzinfo=datetime.timezone.utc)}],
+    {'time': datetime.time(10, 30, 15, 500), 'naive': datetime.datetime(2024, 5, 1, 10, 30)},
+    {'rating': Decimal("9.3"), 'huge': Decimal("1e20"), 'uuid': uuid.UUID(int=42)},
+    {'text': "not a number:1e5,", 'name': "Ōkami"},
+    {'text': "àèìòù 日本語     \x00 \x1f \" \\ \n \t / \x7f", 'emoji': "🎮"},
+    {'floats': [0.1 + 0.2, -0.0, 123456789.0, 1e16, 1e-7, 5e-324]},
+    {'big': 2 ** 70, 'bool': True, 'tuple': (1, 2), 'keys': {1: "one"}},
+    {'lazy': gettext_lazy("Not found.")},
+    ReturnDict({'id': 1}, serializer=None),
+    [],
+    "just a string",
+]
+
+
+class TestORJSONRenderer:
+
+    @pytest.mark.parametrize("data", PAYLOADS)
+    def test_compat_mode_is_byte_identical(self, settings, data):
+        settings.JSON_RENDERER_COMPAT = True
+
+        assert ORJSONRenderer().render(data) == JSONRenderer().render(data)
+
+    @pytest.mark.parametrize("data", PAYLOADS[:1] + PAYLOADS[4:6] + PAYLOADS[7:])
+    def test_fast_mode_writes_the_same_json(self, data):
+        assert json.loads(ORJSONRenderer().render(data)) == json.loads(JSONRenderer().render(data))
+
+    def test_fast_mode_keeps_microseconds(self):
+        data = {'created_at': datetime.datetime(2024, 5, 1, 10, 30, 15, 123456, tzinfo=datetime.timezone.utc)}
+
+        assert ORJSONRenderer().render(data) == b'{"created_at":"2024-05-01T10:30:15.123456Z"}'
+
+    def test_compat_mode_refuses_nan_like_drf(self, settings):
+        settings.JSON_RENDERER_COMPAT = True
+
+        with pytest.raises(ValueError):
+            ORJSONRenderer().render({'rating': float('nan')})
+
+    def test_none_renders_nothing(self):
+        assert ORJSONRenderer().render(None) == b''
+
+    def test_indented_output_is_rendered_by_drf(self):
+        data = {'id': 1, 'genres': [1, 2]}
+
+        rendered = ORJSONRenderer().render(data, 'application/json; indent=4')
+
+        assert rendered == JSONRenderer().render(data, 'application/json; indent=4')
+
+
+class TestORJSONParser:
+
+    def test_parse(self):
+        stream = io.BytesIO('{"title": "Ōkami", "genres": [1, 2], "rating": 9.5}'.encode())
+
+        assert ORJSONParser().parse(stream) == {'title': "Ōkami", 'genres': [1, 2], 'rating': 9.5}
+
+    def test_invalid_json_fails(self):
+        with pytest.raises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"title": '))
+
+    def test_other_charsets_are_decoded(self):
+        stream = io.BytesIO('{"title": "Ōkami"}'.encode('utf-16'))
+
+        assert ORJSONParser().parse(stream, parser_context={'encoding': 'utf-16'}) == {'title': "Ōkami"}
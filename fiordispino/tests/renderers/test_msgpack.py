@@ -0,0 +1,73 @@
+import datetime
+import io
+from decimal import Decimal
+
+import msgpack
+import pytest
+from PIL import Image
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles
+
+from fiordispino.parsers import MessagePackParser
+from fiordispino.renderers import MessagePackRenderer
+from fiordispino.tests.utils_testing import decompression_bomb
+
+
+def jpeg_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (10, 10), (255, 0, 0)).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+class TestMessagePackRenderer:
+
+    def test_render(self):
+        data = {'id': 1, 'title': "Ōkami", 'genres': [1, 2], 'box_art': b"\xff\xd8 jpeg", 'pegi': None}
+
+        assert msgpack.unpackb(MessagePackRenderer().render(data)) == data
+
+    def test_types_json_has_no_native_form_for_are_written_as_json_does(self):
+        data = {'release_date': datetime.date(2018, 1, 25), 'rating': Decimal("9.3")}
+
+        assert msgpack.unpackb(MessagePackRenderer().render(data)) == {'release_date': "2018-01-25", 'rating': 9.3}
+
+    def test_none_renders_nothing(self):
+        assert MessagePackRenderer().render(None) == b''
+
+
+class TestMessagePackParser:
+
+    def test_parse(self):
+        stream = io.BytesIO(msgpack.packb({'game': 1, 'rating': 9.5}))
+
+        assert MessagePackParser().parse(stream) == {'game': 1, 'rating': 9.5}
+
+    def test_binary_values_are_files(self):
+        content = jpeg_bytes()
+        stream = io.BytesIO(msgpack.packb({'title': "Celeste", 'box_art': content}))
+
+        parsed = MessagePackParser().parse(stream)
+
+        assert isinstance(parsed, DataAndFiles)
+        assert parsed.data == {'title': "Celeste"}
+        assert parsed.files['box_art'].name == 'box_art.jpg'
+        assert parsed.files['box_art'].read() == content
+
+    def test_images_are_not_decoded(self):
+        content = decompression_bomb()
+        stream = io.BytesIO(msgpack.packb({'box_art': content}))
+
+        parsed = MessagePackParser().parse(stream)
+
+        # the size is checked by the validators
+        assert parsed.files['box_art'].name == 'box_art.png'
+        assert parsed.files['box_art'].read() == content
+
+    def test_unknown_binary_values_are_bin_files(self):
+        parsed = MessagePackParser().parse(io.BytesIO(msgpack.packb({'box_art': b"not an image"})))
+
+        assert parsed.files['box_art'].name == 'box_art.bin'
+
+    def test_invalid_msgpack_fails(self):
+        with pytest.raises(ParseError):
+            MessagePackParser().parse(io.BytesIO(b'\xc1'))
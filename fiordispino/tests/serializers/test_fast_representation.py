@@ -0,0 +1,66 @@
+import json
+
+import pytest
+from mixer.backend.django import mixer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from fiordispino.models import Game, Genre, GamePlayed, GamesToPlay
+from fiordispino.serializers.game_serializer import GameSerializer
+from fiordispino.serializers.games_played_serializer import GamesPlayedSerializer
+from fiordispino.serializers.games_to_play_serializer import GamesToPlaySerializer
+
+
+def make_context(params):
+    return {'request': Request(APIRequestFactory().get('/', params))}
+
+
+def assert_same_output(serializer_class, queryset, params):
+    context = make_context(params)
+    serializer = serializer_class(context=context)
+    queryset = serializer.restrict_queryset(queryset)
+
+    expected = serializer_class(queryset, many=True, context=context).data
+
+    # compared as json, which is what the client gets
+    assert json.dumps(serializer.fast_representation(queryset)) == json.dumps(expected)
+
+
+@pytest.mark.django_db
+class TestFastRepresentation:
+
+    @pytest.fixture
+    def library(self, user):
+        genres = mixer.cycle(3).blend(Genre)
+        for i, game in enumerate(mixer.cycle(3).blend(Game, title="Celeste", global_rating=7.5)):
+            game.genres.set(genres[:i + 1])
+            GamePlayed.objects.create(owner=user, game=game, rating=i + 1)
+
+        mixer.blend(Game, title="No genres")
+        GamesToPlay.objects.create(owner=user, game=Game.objects.get(title="No genres"))
+
+    @pytest.mark.parametrize("params", [
+        {},
+        {'size': 'thumb'},
+        {'box_art': 'url'},
+        {'box_art': 'url', 'size': 'medium'},
+        {'fields': 'id,title,global_rating,release_date'},
+        {'expand': ''},
+        {'fields': 'title,genres', 'expand': ''},
+    ])
+    def test_game(self, library, params):
+        assert_same_output(GameSerializer, Game.objects.all(), params)
+
+    @pytest.mark.parametrize("params", [
+        {'box_art': 'url'},
+        {'size': 'thumb'},
+        {'expand': ''},
+        {'expand': 'game'},
+        {'fields': 'id,game.title,game.genres', 'expand': 'game,game.genres'},
+    ])
+    @pytest.mark.parametrize("serializer_class, model", [
+        (GamesPlayedSerializer, GamePlayed),
+        (GamesToPlaySerializer, GamesToPlay),
+    ])
+    def test_library_entries(self, library, serializer_class, model, params):
+        assert_same_output(serializer_class, model.objects.all(), params)
@@ -0,0 +1,176 @@
+import json
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from mixer.backend.django import mixer
+
+from fiordispino.models import Game, GamePlayed
+from fiordispino.models.game import weighted_rating_prior
+from fiordispino.tests.utils_testing import *
+
+
+@pytest.fixture
+def catalogue(db):
+    return create_games(3)
+
+
+def rate(game, *ratings):
+    for rating in ratings:
+        GamePlayed.objects.create(owner=mixer.blend(get_user_model()), game=game, rating=rating)
+
+
+@pytest.mark.django_db
+def test_verify_game_stats_consistent(catalogue):
+    rate(catalogue[0], 10, 10, 8)
+    rate(catalogue[1], 3)
+
+    out = StringIO()
+    call_command('verify_game_stats', chunk_size=1, stdout=out)
+
+    assert f"{len(catalogue)} games checked, all consistent" in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_verify_game_stats_reports_mismatches(catalogue):
+    rate(catalogue[0], 10, 10, 8)
+    # an update() sends no signal: the stats are left as they were
+    GamePlayed.objects.filter(game=catalogue[0]).update(rating=1)
+    Game.objects.filter(pk=catalogue[1].pk).update(rating_count=4)
+
+    out = StringIO()
+    with pytest.raises(CommandError, match=f"2 of {len(catalogue)} games"):
+        call_command('verify_game_stats', stdout=out)
+
+    report = out.getvalue()
+    mean, votes = weighted_rating_prior()
+    weighted = f'{(votes * mean + 28) / (votes + 3)} -> {(votes * mean + 3) / (votes + 3)}'
+    assert (f'Game {catalogue[0].pk} "{catalogue[0].title}": global_rating 9.3 -> 1, weighted_rating {weighted}, '
+            'rating_sum 28 -> 3, ratings_1 0 -> 3, ratings_8 1 -> 0, ratings_10 2 -> 0') in report
+    assert f'Game {catalogue[1].pk} "{catalogue[1].title}": rating_count 4 -> 0' in report
+
+
+@pytest.mark.django_db
+def test_verify_game_stats_fix(catalogue):
+    rate(catalogue[0], 10, 10, 8)
+    GamePlayed.objects.filter(game=catalogue[0]).update(rating=2)
+
+    out = StringIO()
+    call_command('verify_game_stats', fix=True, stdout=out)
+    assert f"{len(catalogue)} games checked, 1 fixed" in out.getvalue()
+
+    catalogue[0].refresh_from_db()
+    assert (catalogue[0].rating_sum, catalogue[0].rating_count, catalogue[0].global_rating) == (6, 3, 2)
+
+    call_command('verify_game_stats', stdout=StringIO())
+
+
+@pytest.mark.django_db
+def test_verify_game_stats_rejects_chunk_size():
+    with pytest.raises(CommandError):
+        call_command('verify_game_stats', chunk_size=0)
+
+
+@pytest.fixture
+def drifted(catalogue):
+    # stats that no longer match the ratings, as after restoring a backup
+    rate(catalogue[0], 10, 10, 8)
+    rate(catalogue[2], 4, 5)
+    GamePlayed.objects.filter(game=catalogue[0]).update(rating=2)
+    Game.objects.filter(pk=catalogue[2].pk).update(rating_count=0, rating_sum=0)
+    return catalogue
+
+
+def stats(game):
+    game.refresh_from_db()
+    return game.rating_sum, game.rating_count, float(game.global_rating), game.ratings_2
+
+
+@pytest.mark.django_db
+def test_recompute_game_stats(drifted):
+    out = StringIO()
+    call_command('recompute_game_stats', chunk_size=2, stdout=out)
+
+    assert f"{len(drifted)} games checked, 2 changed" in out.getvalue()
+    assert stats(drifted[0]) == (6, 3, 2.0, 3)
+    assert stats(drifted[2]) == (9, 2, 4.5, 0)
+    call_command('verify_game_stats', stdout=StringIO())
+
+
+@pytest.mark.django_db
+def test_recompute_game_stats_after_changing_the_prior(settings, catalogue):
+    rate(catalogue[0], 10, 8)
+
+    settings.GAME_WEIGHTED_RATING_PRIOR_MEAN = 6.0
+    settings.GAME_WEIGHTED_RATING_PRIOR_VOTES = 2
+    call_command('recompute_game_stats', stdout=StringIO())
+
+    weighted = [game.weighted_rating for game in Game.objects.filter(pk__in=[game.pk for game in catalogue])]
+    # (2 * 6 + 18) / (2 + 2), the games nobody rated are worth the mean
+    assert sorted(weighted) == [6.0, 6.0, 7.5]
+
+
+@pytest.mark.django_db
+def test_recompute_game_stats_dry_run(drifted):
+    out = StringIO()
+    call_command('recompute_game_stats', dry_run=True, stdout=out)
+
+    report = out.getvalue()
+    assert f'Game {drifted[0].pk} "{drifted[0].title}": global_rating 9.3 -> 2, weighted_rating ' in report
+    assert 'rating_sum 28 -> 6' in report
+    assert f'Game {drifted[2].pk} "{drifted[2].title}": rating_sum 0 -> 9, rating_count 0 -> 2' in report
+    assert "2 would change" in report
+    # nothing written
+    assert stats(drifted[0]) == (28, 3, 9.3, 0)
+
+
+@pytest.mark.django_db
+def test_recompute_game_stats_in_parallel_slices(drifted, tmp_path):
+    checkpoint = tmp_path / "checkpoint.json"
+
+    call_command('recompute_game_stats', parallel=3, chunk_size=1, checkpoint=str(checkpoint), stdout=StringIO())
+
+    assert stats(drifted[0]) == (6, 3, 2.0, 3)
+    assert stats(drifted[2]) == (9, 2, 4.5, 0)
+    # removed once completed
+    assert not checkpoint.exists()
+
+
+@pytest.mark.django_db
+def test_recompute_game_stats_resumes_from_the_checkpoint(drifted, tmp_path):
+    checkpoint = tmp_path / "checkpoint.json"
+    first, last = drifted[0].pk, drifted[-1].pk
+    # interrupted after the first game
+    checkpoint.write_text(json.dumps({'slices': [{'start': first, 'end': last, 'done': first}]}))
+
+    out = StringIO()
+    call_command('recompute_game_stats', checkpoint=str(checkpoint), stdout=out)
+
+    assert "Resuming" in out.getvalue()
+    assert f"{len(drifted) - 1} games checked, 1 changed" in out.getvalue()
+    assert stats(drifted[0]) == (28, 3, 9.3, 0)
+    assert stats(drifted[2]) == (9, 2, 4.5, 0)
+
+    # --restart ignores it
+    checkpoint.write_text(json.dumps({'slices': [{'start': first, 'end': last, 'done': last}]}))
+    call_command('recompute_game_stats', checkpoint=str(checkpoint), restart=True, stdout=StringIO())
+    assert stats(drifted[0]) == (6, 3, 2.0, 3)
+
+
+@pytest.mark.django_db
+def test_recompute_game_stats_rejects_invalid_checkpoint(catalogue, tmp_path):
+    checkpoint = tmp_path / "checkpoint.json"
+    checkpoint.write_text("not json")
+
+    with pytest.raises(CommandError, match="--restart"):
+        call_command('recompute_game_stats', checkpoint=str(checkpoint), stdout=StringIO())
+
+
+@pytest.mark.django_db
+def test_recompute_game_stats_without_games():
+    out = StringIO()
+    call_command('recompute_game_stats', stdout=out)
+
+    assert "No games" in out.getvalue()
@@ -1,6 +1,7 @@
 import pytest
 from mixer.backend.django import mixer
 from django.contrib.auth import get_user_model
+from django.db import DatabaseError
 from fiordispino.models import Game, GamePlayed
 from fiordispino.tests.utils_testing import *
 
@@ -83,3 +84,145 @@ def test_signal_rating_deletion(user, games):
     assert game.rating_count == 0
     assert game.global_rating == 0.0
 
+
+
+@pytest.mark.django_db
+def test_signal_rating_sum_is_kept_up_to_date(user, games):
+    game = games[0]
+    user2 = mixer.blend(get_user_model())
+
+    gp = GamePlayed.objects.create(owner=user, game=game, rating=7)
+    GamePlayed.objects.create(owner=user2, game=game, rating=4)
+
+    gp.rating = 9
+    gp.save()
+
+    game.refresh_from_db()
+    assert game.rating_sum == 13
+    assert game.rating_count == 2
+    assert game.global_rating == 6.5
+
+
+@pytest.mark.django_db
+def test_signal_rating_update_from_a_stale_instance(user, games):
+    # the difference is computed against the rating in the database, not the one the instance was loaded with
+    game = games[0]
+    gp = GamePlayed.objects.create(owner=user, game=game, rating=5)
+
+    stale = GamePlayed.objects.get(pk=gp.pk)
+    gp.rating = 8
+    gp.save()
+
+    stale.rating = 10
+    stale.save()
+
+    game.refresh_from_db()
+    assert game.rating_sum == 10
+    assert game.global_rating == 10.0
+
+
+@pytest.mark.django_db
+def test_signal_save_without_rating_change_keeps_stats(user, games):
+    game = games[0]
+    gp = GamePlayed.objects.create(owner=user, game=game, rating=6)
+
+    gp.save()
+    gp.save(update_fields=['updated_at'])
+
+    game.refresh_from_db()
+    assert game.rating_sum == 6
+    assert game.rating_count == 1
+
+
+@pytest.mark.django_db
+def test_signal_rating_moved_to_another_game(user, games):
+    gp = GamePlayed.objects.create(owner=user, game=games[0], rating=6)
+
+    gp.game = games[1]
+    gp.rating = 3
+    gp.save()
+
+    games[0].refresh_from_db()
+    games[1].refresh_from_db()
+    assert (games[0].rating_sum, games[0].rating_count, games[0].global_rating) == (0, 0, 0)
+    assert (games[1].rating_sum, games[1].rating_count, games[1].global_rating) == (3, 1, 3)
+
+
+@pytest.mark.django_db
+def test_signal_ratings_removed_with_their_owner(user, games):
+    GamePlayed.objects.create(owner=user, game=games[0], rating=6)
+    GamePlayed.objects.create(owner=mixer.blend(get_user_model()), game=games[0], rating=9)
+
+    user.delete()
+
+    games[0].refresh_from_db()
+    assert (games[0].rating_sum, games[0].rating_count, games[0].global_rating) == (9, 1, 9)
+
+
+@pytest.mark.django_db
+def test_signal_rating_histogram(user, games):
+    game = games[0]
+    user2 = mixer.blend(get_user_model())
+
+    gp = GamePlayed.objects.create(owner=user, game=game, rating=7)
+    GamePlayed.objects.create(owner=user2, game=game, rating=7)
+    game.refresh_from_db()
+    assert (game.ratings_7, game.ratings_9) == (2, 0)
+
+    gp.rating = 9
+    gp.save()
+    game.refresh_from_db()
+    assert (game.ratings_7, game.ratings_9) == (1, 1)
+
+    gp.delete()
+    game.refresh_from_db()
+    assert (game.ratings_7, game.ratings_9) == (1, 0)
+
+
+@pytest.mark.django_db
+def test_signal_rating_deleted_twice_is_removed_once(user, games):
+    # e.g. two devices deleting the same entry: the second delete finds nothing
+    game = games[0]
+    gp = GamePlayed.objects.create(owner=user, game=game, rating=5)
+    GamePlayed.objects.create(owner=mixer.blend(get_user_model()), game=game, rating=9)
+
+    stale = GamePlayed.objects.get(pk=gp.pk)
+    gp.rating = 8
+    gp.save()
+    gp.delete()
+    stale.delete()
+
+    game.refresh_from_db()
+    assert (game.rating_sum, game.rating_count, game.ratings_5, game.ratings_8) == (9, 1, 0, 0)
+
+
+@pytest.mark.django_db
+def test_signal_deleted_rating_is_not_saved_again(user, games):
+    game = games[0]
+    gp = GamePlayed.objects.create(owner=user, game=game, rating=5)
+    GamePlayed.objects.filter(pk=gp.pk).delete()
+
+    gp.rating = 7
+    with pytest.raises(DatabaseError):
+        gp.save()
+
+    game.refresh_from_db()
+    assert not GamePlayed.objects.filter(pk=gp.pk).exists()
+    assert (game.rating_sum, game.rating_count) == (0, 0)
+
+
+
+@pytest.mark.django_db
+def test_signal_weighted_rating(settings, user, games):
+    settings.GAME_WEIGHTED_RATING_PRIOR_MEAN = 5.0
+    settings.GAME_WEIGHTED_RATING_PRIOR_VOTES = 2
+    game = games[0]
+
+    gp = GamePlayed.objects.create(owner=user, game=game, rating=9)
+    GamePlayed.objects.create(owner=mixer.blend(get_user_model()), game=game, rating=7)
+    game.refresh_from_db()
+    assert game.weighted_rating == 6.5
+
+    gp.delete()
+    game.refresh_from_db()
+    assert game.weighted_rating == 17 / 3
@@ -1,4 +1,6 @@
 import json
+import struct
+import zlib
 from io import BytesIO
 
 import pytest
@@ -125,4 +127,90 @@ def contains(response, key, value):
     obj = parse(response)
     if key not in obj:
         return False
-    return value in obj[key]
\ No newline at end of file
+    return value in obj[key]
+
+
+def create_games(n, **fields):
+    # n games with two genres each, bulk created without signals and image processing, so that even thousands of games
+    # are quick to set up
+    from fiordispino.models import Game, Genre
+
+    genres = mixer.cycle(2).blend(Genre)
+    games = Game.objects.bulk_create(
+        Game(**{'title': f"Game {i}", 'description': "A game", 'pegi': 12, 'release_date': "2020-01-01",
+                'box_art': "games/covers/missing.jpg", **fields})
+        for i in range(n)
+    )
+    Game.genres.through.objects.bulk_create(
+        Game.genres.through(game=game, genre=genre) for game in games for genre in genres
+    )
+    return games
+
+
+@pytest.fixture
+def stored_box_art(settings):
+    # the image create_games points at, for the tests that encode it (the default ?box_art=base64)
+    from django.core.files.base import ContentFile
+    from django.core.files.storage import FileSystemStorage
+
+    image = BytesIO()
+    Image.new("RGB", (16, 16), (255, 0, 0)).save(image, format='JPEG')
+    FileSystemStorage(location=settings.MEDIA_ROOT).save("games/covers/missing.jpg", ContentFile(image.getvalue()))
+
+
+def decompression_bomb(width=20000, height=20000):
+    # the header of a png far over the pillow pixel limit: decoding it (even just opening it) raises
+    # DecompressionBombError, only the dimensions are needed to reject it
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(b'')) + chunk(b'IEND', b'')
+
+
+def create_library(model, owner, n, **fields):
+    # n games (see create_games), all in the `model` (GamesToPlay or GamePlayed) list of `owner`
+    return model.objects.bulk_create(model(owner=owner, game=game, **fields) for game in create_games(n))
+
+
+def count_queries(client, url, params=None):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, params)
+    assert response.status_code == 200
+    return len(queries)
+
+
+def page_query_plan(client, url, params=None):
+    # SQLite's plan of the query loading the page (the one with an ORDER BY), as a single string. Explained with its
+    # parameters bound like the request ran it: with the values inlined SQLite can plan a better query
+    from django.db import connection
+
+    queries = []
+
+    def capture(execute, sql, sql_params, many, context):
+        queries.append((sql, sql_params))
+        return execute(sql, sql_params, many, context)
+
+    with connection.execute_wrapper(capture):
+        response = client.get(url, params)
+    assert response.status_code == 200
+
+    (page, page_params), = [query for query in queries if 'ORDER BY' in query[0]]
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {page}', page_params)
+        return ' '.join(row[-1] for row in cursor.fetchall())
+
+
+def walk_pages(client, url, params=None):
+    # follows the `next` links of a cursor paginated list, returns the results of every page
+    results = []
+    while url:
+        response = client.get(url, params)
+        assert response.status_code == 200
+        data = parse(response)
+        results += data['results']
+        url, params = data['next'], None
+    return results
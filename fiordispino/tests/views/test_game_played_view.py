@@ -1,9 +1,15 @@
+import random
+import threading
+from unittest import mock
+
 import pytest
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.db import connection, OperationalError
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from fiordispino.models import GamesToPlay, GamePlayed
+from fiordispino.core.stats import stats_mismatches
+from fiordispino.models import Game, GamesToPlay, GamePlayed
 from fiordispino.tests.utils_testing import *
 from fiordispino.core.exceptions import GameAlreadyInGamesToPlay, GameAlreadyInGamesPlayed
 
@@ -126,7 +132,7 @@ class TestGamePlayedView:
         url = reverse('games-played-get-by-owner', kwargs={'username': user.username})
         response = client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        data = parse(response)
+        data = parse(response)['results']
         assert len(data) == 1
 
     def test_get_by_owner_returns_empty_list_if_no_games(self, user):
@@ -137,7 +143,7 @@ class TestGamePlayedView:
 
         assert response.status_code == status.HTTP_200_OK
         data = parse(response)
-        assert data == []
+        assert data['results'] == []
 
     def test_get_by_owner_invalid_username_format(self, user):
         client = get_client(user)
@@ -205,4 +211,246 @@ class TestGamePlayedView:
         client = APIClient()
         url = reverse('games-played-check-status')
         response = client.get(url, {'game_id': games[0].id})
-        assert response.status_code == status.HTTP_401_UNAUTHORIZED
\ No newline at end of file
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_get_by_owner_sparse_fields(self, user, games):
+        GamePlayed.objects.create(owner=user, game=games[0], rating=10)
+        client = get_client(user)
+        url = reverse('games-played-get-by-owner', kwargs={'username': user.username})
+
+        response = client.get(url, {'fields': 'id,rating,game.title'})
+
+        assert response.status_code == status.HTTP_200_OK
+        data = parse(response)['results']
+        assert set(data[0]) == {'id', 'rating', 'game'}
+        assert data[0]['game'] == {'title': games[0].title}
+
+    def test_list_without_expand_returns_game_id(self, user, games):
+        GamePlayed.objects.create(owner=user, game=games[0], rating=10)
+        client = get_client(user)
+
+        response = client.get(reverse('games-played-list'), {'expand': ''})
+
+        data = parse(response)
+        assert data[0]['game'] == games[0].id
+
+    def test_list_expand_game_only(self, user, games):
+        GamePlayed.objects.create(owner=user, game=games[0], rating=10)
+        client = get_client(user)
+
+        response = client.get(reverse('games-played-list'), {'expand': 'game', 'fields': 'game.genres'})
+
+        data = parse(response)
+        # the game is nested, its genres are not
+        assert data[0]['game'] == {'genres': list(games[0].genres.values_list('id', flat=True))}
+
+    def test_list_unknown_field_fails(self, user, games):
+        client = get_client(user)
+
+        response = client.get(reverse('games-played-list'), {'fields': 'id,game.publisher'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    @pytest.mark.parametrize("url_name", ['games-played-list', 'games-played-get-by-owner'])
+    def test_nested_games_queries_do_not_grow_with_the_number_of_entries(self, user, url_name):
+        client = get_client(user)
+        kwargs = {'username': user.username} if url_name.endswith('owner') else {}
+        genres = mixer.cycle(2).blend('fiordispino.Genre')
+
+        url = reverse(url_name, kwargs=kwargs)
+
+        def add_entries(n):
+            for game in mixer.cycle(n).blend('fiordispino.Game', title="Celeste"):
+                game.genres.set(genres)
+                GamePlayed.objects.create(owner=user, game=game, rating=7)
+
+        add_entries(2)
+        few = count_queries(client, url, {'box_art': 'url'})
+        add_entries(8)
+
+        assert count_queries(client, url, {'box_art': 'url'}) == few
+
+    @pytest.mark.parametrize("url_name", ['games-played-list', 'games-played-get-by-owner'])
+    @pytest.mark.parametrize("size", [10, 100, 1000])
+    @pytest.mark.parametrize("box_art", ['url', 'base64'])
+    def test_library_queries_are_constant(self, user, stored_box_art, url_name, size, box_art):
+        client = get_client(user)
+        url = reverse(url_name, kwargs={'username': user.username} if url_name.endswith('owner') else {})
+
+        create_library(GamePlayed, user, 1, rating=7)
+        expected = count_queries(client, url, {'box_art': box_art})
+        create_library(GamePlayed, user, size - 1, rating=7)
+
+        assert count_queries(client, url, {'box_art': box_art}) == expected
+
+    @pytest.mark.skipif(connection.vendor != 'sqlite', reason="reads SQLite's query plan")
+    @pytest.mark.parametrize("sort, index, bound", [
+        ('-created_at', 'played_owner_created_idx', 'created_at<?'),
+        ('rating', 'played_owner_rating_idx', 'rating>?'),
+    ])
+    def test_get_by_owner_deep_pages_seek_to_the_cursor(self, user, sort, index, bound):
+        create_library(GamePlayed, user, 30, rating=7)
+        client = get_client(user)
+        url = reverse('games-played-get-by-owner', kwargs={'username': user.username})
+        second = parse(client.get(url, {'sort': sort, 'page_size': 5, 'fields': 'id'}))['next']
+
+        # the owner's range of the index, from the cursor on
+        plan = page_query_plan(client, second)
+
+        assert f'{index} (owner_id=? AND {bound})' in plan
+        assert 'TEMP B-TREE' not in plan
+
+    def test_get_by_owner_sorted_by_rating_across_pages(self, user):
+        entries = [GamePlayed.objects.create(owner=user, game=game, rating=rating)
+                   for game, rating in zip(mixer.cycle(7).blend('fiordispino.Game'), [3, 9, 7, 9, 3, 5, 9])]
+        client = get_client(user)
+        url = reverse('games-played-get-by-owner', kwargs={'username': user.username})
+
+        results = walk_pages(client, url, {'sort': '-rating', 'page_size': 2, 'fields': 'id'})
+
+        # ties on the rating are broken by the id, nothing is skipped or repeated between pages
+        expected = sorted(entries, key=lambda entry: (entry.rating, entry.pk), reverse=True)
+        assert [item['id'] for item in results] == [entry.pk for entry in expected]
+
+    def test_get_by_owner_sorted_by_game_title(self, user):
+        for title in ["Hades", "Celeste", "Zelda"]:
+            GamePlayed.objects.create(owner=user, game=mixer.blend('fiordispino.Game', title=title), rating=5)
+        client = get_client(user)
+        url = reverse('games-played-get-by-owner', kwargs={'username': user.username})
+
+        results = walk_pages(client, url, {'sort': 'title', 'page_size': 2, 'fields': 'game.title'})
+
+        assert [item['game']['title'] for item in results] == ["Celeste", "Hades", "Zelda"]
+
+    def test_get_by_owner_is_newest_first_by_default(self, user):
+        entries = create_library(GamePlayed, user, 3, rating=5)
+        client = get_client(user)
+
+        data = parse(client.get(reverse('games-played-get-by-owner', kwargs={'username': user.username}), {'fields': 'id'}))
+
+        assert [item['id'] for item in data['results']] == [entry.pk for entry in reversed(entries)]
+
+    @pytest.mark.parametrize("params, expected", [
+        ({'rating_min': 5}, [5, 9]),
+        ({'rating_max': 5}, [3, 5]),
+        ({'rating_min': 4, 'rating_max': 8}, [5]),
+        ({'pegi': 18}, [9]),
+        ({'genre': 'rpg'}, [3, 9]),
+    ])
+    def test_get_by_owner_filters(self, user, params, expected):
+        rpg = mixer.blend('fiordispino.Genre')
+        for rating, pegi in [(3, 12), (5, 12), (9, 18)]:
+            game = mixer.blend('fiordispino.Game', pegi=pegi)
+            if rating != 5:
+                game.genres.add(rpg)
+            GamePlayed.objects.create(owner=user, game=game, rating=rating)
+        if params.get('genre') == 'rpg':
+            params = {'genre': rpg.pk}
+        client = get_client(user)
+
+        data = parse(client.get(reverse('games-played-get-by-owner', kwargs={'username': user.username}),
+                                {**params, 'sort': 'rating'}))
+
+        assert [item['rating'] for item in data['results']] == expected
+
+    @pytest.mark.parametrize("params", [{'sort': 'pegi'}, {'rating_min': 11}, {'pegi': 5}, {'genre': 'rpg'},
+                                        {'genre': 2**63}])
+    def test_get_by_owner_invalid_sort_or_filter(self, user, params):
+        client = get_client(user)
+
+        response = client.get(reverse('games-played-get-by-owner', kwargs={'username': user.username}), params)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_update_of_entry_deleted_meanwhile_is_not_found(self, user, games):
+        played = GamePlayed.objects.create(owner=user, game=games[0], rating=8)
+        save = GamePlayed.save
+
+        def delete_then_save(instance, *args, **kwargs):
+            # another device removed the entry after this request loaded it
+            GamePlayed.objects.filter(pk=instance.pk).delete()
+            save(instance, *args, **kwargs)
+
+        with mock.patch.object(GamePlayed, 'save', delete_then_save):
+            response = get_client(user).patch(reverse('games-played-detail', kwargs={'pk': played.pk}), {'rating': 9})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert not GamePlayed.objects.exists()
+
+    def test_update_database_errors_are_not_hidden(self, user, games):
+        played = GamePlayed.objects.create(owner=user, game=games[0], rating=8)
+
+        with mock.patch.object(GamePlayed, 'save', side_effect=OperationalError("database is locked")):
+            with pytest.raises(OperationalError):
+                get_client(user).patch(reverse('games-played-detail', kwargs={'pk': played.pk}), {'rating': 9})
+
+        assert GamePlayed.objects.get().rating == 8
+
+
+@pytest.mark.django_db(transaction=True)
+class TestConcurrentRatings:
+    """
+    Players voting on the same games at the same time, from two devices each (two threads, each with its own database
+    connection, sending the same requests): the stats of the games must count every rating stored exactly once.
+    """
+    PLAYERS = 8
+    ROUNDS = 5
+
+    def expect(self, response, *codes):
+        if response.status_code not in codes:
+            self.errors.append((response.request['PATH_INFO'], response.status_code))
+
+    def play(self, player, client, games, barrier):
+        try:
+            rng = random.Random()
+            barrier.wait(timeout=10)
+
+            for round_ in range(self.ROUNDS):
+                # rated directly: one of the two devices gets a conflict (the box arts are not stored, sent as urls)
+                response = client.post(f"{reverse('games-played-list')}?box_art=url",
+                                       {'game': games[0].pk, 'rating': rng.randint(1, 10)})
+                self.expect(response, status.HTTP_201_CREATED, status.HTTP_400_BAD_REQUEST)
+                played = parse(response)['id'] if response.status_code == status.HTTP_201_CREATED else None
+                if played is not None:
+                    response = client.patch(f"{reverse('games-played-detail', kwargs={'pk': played})}?box_art=url",
+                                            {'rating': rng.randint(1, 10)})
+                    self.expect(response, status.HTTP_200_OK, status.HTTP_404_NOT_FOUND)
+
+                # moved from the games to play: the other device may have moved it already
+                to_play, _ = GamesToPlay.objects.get_or_create(owner=player, game=games[1])
+                response = client.post(reverse('games-to-play-move-to-played', kwargs={'pk': to_play.pk}),
+                                       {'rating': rng.randint(1, 10)})
+                self.expect(response, status.HTTP_200_OK, status.HTTP_400_BAD_REQUEST, status.HTTP_404_NOT_FOUND)
+
+                # the next round starts over, the ratings of the last one stay
+                if round_ < self.ROUNDS - 1:
+                    for game in games:
+                        entry = GamePlayed.objects.filter(owner=player, game=game).first()
+                        if entry is not None:
+                            response = client.delete(reverse('games-played-detail', kwargs={'pk': entry.pk}))
+                            self.expect(response, status.HTTP_204_NO_CONTENT, status.HTTP_404_NOT_FOUND)
+        except Exception as error:
+            self.errors.append(error)
+        finally:
+            connection.close()
+
+    def test_concurrent_votes_are_counted_exactly(self):
+        games = create_games(2)
+        players = [mixer.blend(get_user_model()) for _ in range(self.PLAYERS)]
+        barrier = threading.Barrier(2 * self.PLAYERS)
+        self.errors = []
+
+        threads = [threading.Thread(target=self.play, args=(player, get_client(player), games, barrier))
+                   for player in players for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert self.errors == []
+        assert stats_mismatches(Game.objects.all()) == []
+        for game in games:
+            game.refresh_from_db()
+            ratings = list(GamePlayed.objects.filter(game=game).values_list('rating', flat=True))
+            assert game.rating_count == len(ratings) > 0
+            assert game.rating_sum == sum(ratings)
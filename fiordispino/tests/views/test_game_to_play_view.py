@@ -113,7 +113,7 @@ class TestGamesToPlayView:
 
         assert response.status_code == status.HTTP_200_OK
 
-        data = parse(response)
+        data = parse(response)['results']
 
         assert len(data) == 1
 
@@ -122,7 +122,7 @@ class TestGamesToPlayView:
         url = reverse('games-to-play-get-by-owner', kwargs={'username': user.username})
         response = client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        data = parse(response)
+        data = parse(response)['results']
         assert len(data) == 0
 
     def test_create_duplicate_in_same_table_fails(self, user, games):
@@ -218,3 +218,56 @@ class TestGamesToPlayView:
         url = reverse('games-to-play-check-status')
         response = client.get(url, {'game_id': games[0].id})
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_get_by_owner_sparse_fields(self, user, games):
+        GamesToPlay.objects.create(owner=user, game=games[0])
+        client = get_client(user)
+        url = reverse('games-to-play-get-by-owner', kwargs={'username': user.username})
+
+        response = client.get(url, {'fields': 'id,game.id,game.title'})
+
+        assert response.status_code == status.HTTP_200_OK
+        data = parse(response)['results']
+        assert data == [{'id': data[0]['id'], 'game': {'id': games[0].id, 'title': games[0].title}}]
+
+    @pytest.mark.parametrize("url_name", ['games-to-play-list', 'games-to-play-get-by-owner'])
+    @pytest.mark.parametrize("size", [10, 100, 1000])
+    @pytest.mark.parametrize("box_art", ['url', 'base64'])
+    def test_library_queries_are_constant(self, user, stored_box_art, url_name, size, box_art):
+        client = get_client(user)
+        url = reverse(url_name, kwargs={'username': user.username} if url_name.endswith('owner') else {})
+
+        create_library(GamesToPlay, user, 1)
+        expected = count_queries(client, url, {'box_art': box_art})
+        create_library(GamesToPlay, user, size - 1)
+
+        assert count_queries(client, url, {'box_art': box_art}) == expected
+
+    def test_get_by_owner_sorted_by_game_title_across_pages(self, user):
+        titles = ["Hades", "Celeste", "Zelda", "Celeste"]
+        for title in titles:
+            GamesToPlay.objects.create(owner=user, game=mixer.blend('fiordispino.Game', title=title))
+        client = get_client(user)
+        url = reverse('games-to-play-get-by-owner', kwargs={'username': user.username})
+
+        results = walk_pages(client, url, {'sort': '-title', 'page_size': 1, 'fields': 'game.title'})
+
+        assert [item['game']['title'] for item in results] == sorted(titles, reverse=True)
+
+    def test_get_by_owner_filtered_by_pegi(self, user):
+        for pegi in [3, 18]:
+            GamesToPlay.objects.create(owner=user, game=mixer.blend('fiordispino.Game', pegi=pegi))
+        client = get_client(user)
+
+        response = client.get(reverse('games-to-play-get-by-owner', kwargs={'username': user.username}),
+                              {'pegi': 18, 'fields': 'game.pegi'})
+
+        assert parse(response)['results'] == [{'game': {'pegi': 18}}]
+
+    @pytest.mark.parametrize("params", [{'sort': 'rating'}, {'rating_min': 5}])
+    def test_get_by_owner_has_no_rating_sort_or_filter(self, user, params):
+        client = get_client(user)
+
+        response = client.get(reverse('games-to-play-get-by-owner', kwargs={'username': user.username}), params)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -1,3 +1,4 @@
+import msgpack
 import pytest
 from io import BytesIO
 from PIL import Image
@@ -7,10 +8,12 @@ from rest_framework.test import APIRequestFactory, force_authenticate
 from django.core.files.uploadedfile import SimpleUploadedFile
 from mixer.backend.django import mixer
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from fiordispino.core.exceptions import InvalidNumberOfGamesException
 from fiordispino.views import GameViewSet
-from fiordispino.models import Game, Genre
+from fiordispino.models import Game, Genre, GamePlayed, GamesToPlay
 from fiordispino.tests.utils_testing import *
 
 
@@ -39,7 +42,7 @@ class TestGameView:
         response = view(request)
 
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == 3
+        assert len(response.data['results']) == 3
 
     def test_create_game_view_as_admin(self, admin_user):
         factory = APIRequestFactory()
@@ -141,6 +144,59 @@ class TestGameView:
         data = parse(response)
         assert len(data) == 20
 
+    def test_get_random_games_never_shuffle_the_catalogue(self, user):
+        games = create_games(100)
+        Game.objects.filter(pk__in=[game.pk for game in games[::2]]).delete()
+        client = get_client(user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('game-get-random-games'), {'n_games': 20, 'fields': 'id'})
+
+        ids = [item['id'] for item in parse(response)]
+        assert len(set(ids)) == 20
+        assert set(ids) <= {game.pk for game in games[1::2]}
+        assert not any('RANDOM()' in query['sql'] for query in queries)
+
+    @pytest.mark.parametrize("params, expected", [
+        ({'pegi_max': 12}, {"Celeste", "Hades"}),
+        ({'global_rating_min': '8.5'}, {"Hades", "Doom"}),
+        ({'genre': 'shooter'}, {"Doom"}),
+        ({'pegi_max': 16, 'global_rating_min': 8, 'weight': 'rating'}, {"Hades"}),
+    ])
+    def test_get_random_games_filters(self, user, params, expected):
+        shooter = mixer.blend(Genre)
+        for title, pegi, rating in [("Celeste", 7, 7.5), ("Hades", 12, 9), ("Doom", 18, 8.5)]:
+            game = mixer.blend(Game, title=title, pegi=pegi, global_rating=rating)
+            if title == "Doom":
+                game.genres.add(shooter)
+        if params.get('genre') == 'shooter':
+            params = {'genre': shooter.pk}
+        client = get_client(user)
+
+        response = client.get(reverse('game-get-random-games'), {**params, 'n_games': 5, 'fields': 'title'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert {item['title'] for item in parse(response)} == expected
+
+    def test_get_random_games_exclude_library(self, user):
+        played, to_play, new = mixer.cycle(3).blend(Game)
+        GamePlayed.objects.create(owner=user, game=played, rating=8)
+        GamesToPlay.objects.create(owner=user, game=to_play)
+        client = get_client(user)
+
+        response = client.get(reverse('game-get-random-games'), {'exclude_library': 'true', 'fields': 'id'})
+
+        assert parse(response) == [{'id': new.pk}]
+
+    @pytest.mark.parametrize("params", [{'weight': 'price'}, {'pegi_max': 4}, {'global_rating_min': 'high'},
+                                        {'exclude_library': 'yes'}, {'genre': 2**70}])
+    def test_get_random_games_invalid_filters(self, user, params):
+        client = get_client(user)
+
+        response = client.get(reverse('game-get-random-games'), params)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
     @pytest.mark.parametrize("invalid_input", [
         "0",  # Too low (min 1)
         "-5",  # Negative
@@ -155,4 +211,523 @@ class TestGameView:
 
         response = client.get(url, {'n_games': invalid_input})
 
-        assert response.status_code == status.HTTP_400_BAD_REQUEST
\ No newline at end of file
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_featured_games_are_a_cache_read(self, settings):
+        settings.FEATURED_GAMES_COUNT = 5
+        create_games(20)
+        client = get_client()
+
+        first = client.get(reverse('game-get-featured'), {'fields': 'id,title'})
+        with CaptureQueriesContext(connection) as queries:
+            second = client.get(reverse('game-get-featured'), {'fields': 'id,title'})
+
+        assert first.status_code == second.status_code == status.HTTP_200_OK
+        assert len(parse(first)) == 5
+        assert parse(second) == parse(first)
+        assert len(queries) == 0
+        assert 'public' in second['Cache-Control'] and 'max-age=' in second['Cache-Control']
+
+    def test_featured_games_follow_the_catalogue_changes(self, settings):
+        settings.FEATURED_GAMES_COUNT = 5
+        create_games(20)
+        client = get_client()
+
+        ids = [item['id'] for item in parse(client.get(reverse('game-get-featured'), {'fields': 'id'}))]
+        Game.objects.get(pk=ids[0]).delete()
+        create_games(20)
+
+        # the deleted game is gone, the new ones don't reshuffle the selection of the day
+        assert [item['id'] for item in parse(client.get(reverse('game-get-featured'), {'fields': 'id'}))] == ids[1:]
+
+    def test_featured_games_invalid_fields(self):
+        response = get_client().get(reverse('game-get-featured'), {'fields': 'id,price'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_list_games_sparse_fields_loads_only_needed_columns(self, user):
+        mixer.blend(Game, title="Celeste", description="A mountain")
+        client = get_client(user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('game-list'), {'fields': 'id,title'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert parse(response)['results'] == [{'id': Game.objects.get().id, 'title': "Celeste"}]
+        # neither the image nor the description are read
+        assert 'box_art' not in queries[0]['sql'] and 'description' not in queries[0]['sql']
+
+    def test_retrieve_game_genres_as_ids_when_not_expanded(self, user):
+        genre = mixer.blend(Genre, name="Platformer")
+        game = mixer.blend(Game, title="Celeste")
+        game.genres.add(genre)
+        client = get_client(user)
+
+        response = client.get(reverse('game-detail', kwargs={'pk': game.pk}), {'expand': '', 'box_art': 'url'})
+
+        assert parse(response)['genres'] == [genre.pk]
+
+    def test_list_games_unknown_field_fails(self, user):
+        client = get_client(user)
+
+        response = client.get(reverse('game-list'), {'fields': 'id,publisher'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_update_game_with_sparse_fields(self, admin_user):
+        game = mixer.blend(Game, title="Celeste", description="A mountain")
+        client = get_admin(admin_user)
+
+        response = client.patch(reverse('game-detail', kwargs={'pk': game.pk}) + '?fields=id,title', {'title': "Celeste Classic"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert parse(response) == {'id': game.pk, 'title': "Celeste Classic"}
+        game.refresh_from_db()
+        assert game.description == "A mountain"
+
+    @pytest.mark.parametrize("url_name, params", [
+        ('game-list', {}),
+        ('game-list', {'box_art': 'url'}),
+        ('game-get-random-games', {'n_games': 20}),
+    ])
+    def test_game_list_queries_do_not_grow_with_the_number_of_games(self, user, url_name, params):
+        genres = mixer.cycle(3).blend(Genre)
+        client = get_client(user)
+
+        def add_games(n):
+            for game in mixer.cycle(n).blend(Game, title="Celeste"):
+                game.genres.set(genres)
+
+        add_games(2)
+        few = count_queries(client, reverse(url_name), params)
+        add_games(8)
+        many = count_queries(client, reverse(url_name), params)
+
+        assert few == many
+
+    def test_list_games_is_paginated_by_title_and_id(self, user):
+        # duplicated titles are ordered by id, never skipped nor repeated across pages
+        titles = ["Zelda", "Celeste", "Hades", "Celeste", "Metroid", "Celeste", "Hades"]
+        games = [mixer.blend(Game, title=title) for title in titles]
+        expected = [game.pk for game in sorted(games, key=lambda game: (game.title, game.pk))]
+        client = get_client(user)
+
+        seen, pages = [], []
+        url, params = reverse('game-list'), {'page_size': 2, 'fields': 'id'}
+        while url:
+            data = parse(client.get(url, params))
+            pages.append(data)
+            seen += [item['id'] for item in data['results']]
+            url, params = data['next'], None
+
+        assert seen == expected
+        assert [len(page['results']) for page in pages] == [2, 2, 2, 1]
+        assert pages[0]['previous'] is None
+
+        # and back from the last page
+        previous = parse(client.get(pages[-1]['previous']))
+        assert previous['results'] == pages[-2]['results']
+        assert parse(client.get(previous['previous']))['results'] == pages[-3]['results']
+
+    def test_list_games_page_size_is_capped(self, settings, user):
+        settings.API_MAX_PAGE_SIZE = 3
+        mixer.cycle(5).blend(Game, title="Celeste")
+        client = get_client(user)
+
+        data = parse(client.get(reverse('game-list'), {'page_size': 1000, 'fields': 'id'}))
+
+        assert len(data['results']) == 3
+        assert data['next'] is not None
+
+    @pytest.mark.skipif(connection.vendor != 'sqlite', reason="reads SQLite's query plan")
+    def test_list_games_deep_pages_seek_to_the_cursor(self, user):
+        create_games(30)
+        client = get_client(user)
+        second = parse(client.get(reverse('game-list'), {'page_size': 5, 'box_art': 'url'}))['next']
+        third = parse(client.get(second))['next']
+
+        # a range of the (title, id) index starting at the cursor, not a scan from the first title. Backwards too
+        for url, bound in ((third, 'title>?'), (parse(client.get(third))['previous'], 'title<?')):
+            plan = page_query_plan(client, url)
+            assert plan.startswith('SEARCH fiordispino_game')
+            assert f'game_title_id_idx ({bound})' in plan
+            assert 'TEMP B-TREE' not in plan
+
+    def test_list_games_never_counts(self, user):
+        mixer.cycle(3).blend(Game, title="Celeste")
+        client = get_client(user)
+
+        with CaptureQueriesContext(connection) as queries:
+            client.get(reverse('game-list'), {'page_size': 1, 'fields': 'id,title'})
+
+        assert not any('COUNT(' in query['sql'] for query in queries)
+
+    @pytest.mark.parametrize("cursor", ["not a cursor", "eyJ2IjpbInoiXSwiciI6ZmFsc2V9", "eyJ2IjpbInoiLCJ4Il0sInIiOmZhbHNlfQ=="])
+    def test_list_games_invalid_cursor(self, user, cursor):
+        client = get_client(user)
+
+        response = client.get(reverse('game-list'), {'cursor': cursor})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_retrieve_game_loads_genres_once(self, user):
+        game = mixer.blend(Game, title="Celeste")
+        game.genres.set(mixer.cycle(3).blend(Genre))
+        client = get_client(user)
+
+        # the game and its genres, whatever the number of genres
+        assert count_queries(client, reverse('game-detail', kwargs={'pk': game.pk}), {'box_art': 'url'}) == 2
+
+    def test_retrieve_game_rating_distribution(self, user):
+        game = mixer.blend(Game, title="Celeste")
+        for rating in (10, 10, 8, 7, 3):
+            GamePlayed.objects.create(owner=mixer.blend(get_user_model()), game=game, rating=rating)
+        client = get_client(user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('game-detail', kwargs={'pk': game.pk}), {'box_art': 'url'})
+
+        assert response.status_code == status.HTTP_200_OK
+        data = parse(response)
+        assert data['rating_histogram'] == [0, 0, 1, 0, 0, 0, 1, 1, 0, 2]
+        assert data['rating_percentiles'] == {'p25': 7.0, 'median': 8.0, 'p75': 10.0, 'p90': 10.0}
+        # read from the game row
+        assert not any(GamePlayed._meta.db_table in query['sql'] for query in queries)
+
+    def test_retrieve_unrated_game_has_no_percentiles(self, user):
+        game = mixer.blend(Game, title="Celeste")
+
+        data = parse(get_client(user).get(reverse('game-detail', kwargs={'pk': game.pk}), {'box_art': 'url'}))
+
+        assert data['rating_histogram'] == [0] * 10
+        assert data['rating_percentiles'] == {'p25': None, 'median': None, 'p75': None, 'p90': None}
+
+    def test_rating_distribution_only_on_the_game_page(self, user):
+        mixer.blend(Game, title="Celeste")
+
+        data = parse(get_client(user).get(reverse('game-list'), {'box_art': 'url'}))
+
+        assert 'rating_histogram' not in data['results'][0]
+        assert 'rating_percentiles' not in data['results'][0]
+
+
+@pytest.mark.django_db
+class TestTopGames:
+
+    def rate(self, game, *ratings):
+        for rating in ratings:
+            GamePlayed.objects.create(owner=mixer.blend(get_user_model()), game=game, rating=rating)
+
+    def top(self, user, **params):
+        return parse(get_client(user).get(reverse('game-get-top'), {'box_art': 'url', **params}))
+
+    def test_many_ratings_outrank_a_single_perfect_one(self, settings, user):
+        settings.GAME_WEIGHTED_RATING_PRIOR_MEAN = 5.0
+        settings.GAME_WEIGHTED_RATING_PRIOR_VOTES = 10
+        lucky, classic, unrated = create_games(3)
+        self.rate(lucky, 10)
+        self.rate(classic, *[10] * 15, *[9] * 15)
+
+        data = self.top(user)
+
+        assert [game['id'] for game in data['results']] == [classic.pk, lucky.pk]
+        # (10 * 5 + 285) / (10 + 30), (10 * 5 + 10) / (10 + 1)
+        assert [game['weighted_rating'] for game in data['results']] == [pytest.approx(8.375), pytest.approx(60 / 11)]
+
+    def test_by_genre_and_pegi(self, user):
+        action, puzzle = mixer.cycle(2).blend(Genre)
+        games = create_games(4)
+        for game, genre, pegi, rating in zip(games, (action, action, puzzle, action), (7, 18, 7, 7), (9, 8, 10, 6)):
+            game.genres.set([genre])
+            Game.objects.filter(pk=game.pk).update(pegi=pegi)
+            self.rate(game, rating)
+
+        assert [game['id'] for game in self.top(user, genre=action.pk)['results']] == [games[0].pk, games[1].pk,
+                                                                                      games[3].pk]
+        assert [game['id'] for game in self.top(user, pegi=7)['results']] == [games[2].pk, games[0].pk, games[3].pk]
+        assert [game['id'] for game in self.top(user, genre=action.pk, pegi=7)['results']] == [games[0].pk,
+                                                                                              games[3].pk]
+
+    def test_pages_follow_the_ranking(self, user):
+        games = create_games(5)
+        for game, rating in zip(games, (7, 9, 7, 3, 10)):
+            self.rate(game, rating)
+        client = get_client(user)
+
+        pages = [parse(client.get(reverse('game-get-top'), {'page_size': 2, 'fields': 'id'}))]
+        while pages[-1]['next']:
+            pages.append(parse(client.get(pages[-1]['next'])))
+
+        # ties (the two 7s) newest first
+        assert [game['id'] for page in pages for game in page['results']] == [
+            games[4].pk, games[1].pk, games[2].pk, games[0].pk, games[3].pk]
+
+    @pytest.mark.skipif(connection.vendor != 'sqlite', reason="reads SQLite's query plan")
+    @pytest.mark.parametrize("by_genre", [False, True])
+    @pytest.mark.parametrize("by_pegi", [False, True])
+    def test_top_games_are_read_in_index_order(self, user, by_genre, by_pegi):
+        games = create_games(12, rating_count=1)
+        client = get_client(user)
+        params = {'fields': 'id', 'page_size': 5,
+                  **({'genre': games[0].genres.first().pk} if by_genre else {}), **({'pegi': 12} if by_pegi else {})}
+        second = parse(client.get(reverse('game-get-top'), params))['next']
+
+        # the pages are read off the weighted rating indexes, the games are never sorted. After the first one, the
+        # index range starts at the cursor
+        plans = [page_query_plan(client, reverse('game-get-top'), params), page_query_plan(client, second)]
+        for plan in plans:
+            assert 'weighted' in plan
+            assert 'TEMP B-TREE' not in plan
+        assert ('(pegi=? AND weighted_rating<?)' if by_pegi else '(weighted_rating<?)') in plans[1]
+
+    @pytest.mark.parametrize("params", [{'pegi': 5}, {'genre': 'rpg'}, {'genre': 2**70}])
+    def test_invalid_filter(self, user, params):
+        response = get_client(user).get(reverse('game-get-top'), params)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestBoxArtView:
+
+    @pytest.fixture
+    def game(self):
+        return mixer.blend(Game, title="Hollow Knight",
+                           box_art=SimpleUploadedFile("cover.jpg", b"jpeg bytes", content_type="image/jpeg"))
+
+    def test_box_art_url_mode_returns_links_instead_of_images(self, user, game):
+        client = get_client(user)
+
+        response = client.get(reverse('game-detail', kwargs={'pk': game.pk}), {'box_art': 'url'})
+
+        assert response.status_code == status.HTTP_200_OK
+        data = parse(response)
+        assert data['box_art'].endswith(f"/api/v1/game/{game.pk}/box-art/?v={game.box_art_hash[:16]}")
+
+    def test_box_art_url_mode_is_propagated_to_nested_games(self, user, game):
+        mixer.blend('fiordispino.GamesToPlay', owner=user, game=game)
+        client = get_client(user)
+
+        response = client.get(reverse('games-to-play-get-by-owner', kwargs={'username': user.username}), {'box_art': 'url'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert '/box-art/?v=' in parse(response)['results'][0]['game']['box_art']
+
+    def test_msgpack_sends_the_box_art_as_bytes(self, user, game):
+        client = get_client(user)
+
+        response = client.get(reverse('game-detail', kwargs={'pk': game.pk}), HTTP_ACCEPT='application/msgpack')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'application/msgpack'
+        assert msgpack.unpackb(response.content)['box_art'] == b"jpeg bytes"
+
+    def test_msgpack_game_list_sends_the_box_art_as_bytes(self, user, game):
+        client = get_client(user)
+
+        response = client.get(reverse('game-list'), HTTP_ACCEPT='application/msgpack')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [item['box_art'] for item in msgpack.unpackb(response.content)['results']] == [b"jpeg bytes"]
+
+    def test_create_game_with_msgpack(self, admin_user, game_data):
+        client = get_client(admin_user)
+        game_data['box_art'] = game_data['box_art'].read()
+
+        response = client.post(reverse('game-list'), msgpack.packb(game_data), content_type='application/msgpack',
+                               HTTP_ACCEPT='application/msgpack')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert msgpack.unpackb(response.content)['title'] == game_data['title']
+        assert Game.objects.get().box_art_hash
+
+    def test_invalid_box_art_mode(self, user, game):
+        client = get_client(user)
+
+        response = client.get(reverse('game-detail', kwargs={'pk': game.pk}), {'box_art': 'png'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_versioned_box_art_is_immutable(self, game):
+        client = get_client()
+
+        response = client.get(reverse('game-box-art', kwargs={'pk': game.pk}), {'v': game.box_art_hash[:16]})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert b"".join(response.streaming_content) == b"jpeg bytes"
+        assert response['Content-Type'] == 'image/jpeg'
+        assert response['ETag'] == f'"{game.box_art_hash}"'
+        assert 'immutable' in response['Cache-Control']
+
+    def test_unversioned_box_art_must_be_revalidated(self, game):
+        client = get_client()
+
+        response = client.get(reverse('game-box-art', kwargs={'pk': game.pk}), HTTP_ACCEPT='image/*')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert 'no-cache' in response['Cache-Control']
+
+    def test_box_art_not_modified(self, game):
+        client = get_client()
+
+        response = client.get(reverse('game-box-art', kwargs={'pk': game.pk}), HTTP_IF_NONE_MATCH=f'"{game.box_art_hash}"')
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_box_art_of_missing_game(self):
+        client = get_client()
+
+        response = client.get(reverse('game-box-art', kwargs={'pk': 999}), HTTP_ACCEPT='image/jpeg')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_box_art_rendition_format_is_negotiated(self):
+        file_obj = BytesIO()
+        Image.new("RGB", (800, 800), (255, 0, 0)).save(file_obj, format='JPEG')
+        game = mixer.blend(Game, title="Celeste",
+                           box_art=SimpleUploadedFile("cover.jpg", file_obj.getvalue(), content_type="image/jpeg"))
+        client = get_client()
+
+        response = client.get(reverse('game-box-art', kwargs={'pk': game.pk}), {'size': 'thumb'}, HTTP_ACCEPT='image/webp,*/*')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'image/webp'
+        assert response['ETag'] == f'"{game.box_art_hash}-thumb.webp"'
+        assert 'Accept' in response['Vary']
+
+    def test_box_art_url_mode_keeps_the_size(self, user, game):
+        client = get_client(user)
+
+        response = client.get(reverse('game-detail', kwargs={'pk': game.pk}), {'box_art': 'url', 'size': 'thumb'})
+
+        assert parse(response)['box_art'].endswith('&size=thumb')
+
+    def test_invalid_box_art_size(self, game):
+        client = get_client()
+
+        response = client.get(reverse('game-box-art', kwargs={'pk': game.pk}), {'size': 'huge'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_box_art_base64_encoding_is_streamed(self, game):
+        client = get_client()
+
+        response = client.get(reverse('game-box-art', kwargs={'pk': game.pk}), {'encoding': 'base64'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        assert response['Content-Type'] == 'application/json'
+        assert response['ETag'] == f'"{game.box_art_hash}-base64"'
+        data = json.loads(b"".join(response.streaming_content))
+        assert data == {'id': game.pk, 'box_art_hash': game.box_art_hash, 'box_art': 'anBlZyBieXRlcw=='}
+
+    def test_invalid_box_art_encoding(self, game):
+        client = get_client()
+
+        response = client.get(reverse('game-box-art', kwargs={'pk': game.pk}), {'encoding': 'hex'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_box_art_range_request(self, game):
+        client = get_client()
+
+        response = client.get(reverse('game-box-art', kwargs={'pk': game.pk}), HTTP_RANGE='bytes=5-')
+
+        assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+        assert b"".join(response.streaming_content) == b"bytes"
+        assert response['Content-Range'] == 'bytes 5-9/10'
+        assert response['Content-Length'] == '5'
+
+    def test_box_art_range_with_matching_if_range(self, game):
+        client = get_client()
+
+        response = client.get(reverse('game-box-art', kwargs={'pk': game.pk}),
+                              HTTP_RANGE='bytes=0-3', HTTP_IF_RANGE=f'"{game.box_art_hash}"')
+
+        assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+        assert b"".join(response.streaming_content) == b"jpeg"
+
+    def test_box_art_range_with_stale_if_range_sends_everything(self, game):
+        client = get_client()
+
+        response = client.get(reverse('game-box-art', kwargs={'pk': game.pk}),
+                              HTTP_RANGE='bytes=0-3', HTTP_IF_RANGE='"an old version"')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert b"".join(response.streaming_content) == b"jpeg bytes"
+        assert response['Accept-Ranges'] == 'bytes'
+
+    def test_box_art_unsatisfiable_range(self, game):
+        client = get_client()
+
+        response = client.get(reverse('game-box-art', kwargs={'pk': game.pk}), HTTP_RANGE='bytes=100-')
+
+        assert response.status_code == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        assert response['Content-Range'] == 'bytes */10'
+
+    def test_box_art_head(self, game):
+        client = get_client()
+
+        response = client.head(reverse('game-box-art', kwargs={'pk': game.pk}))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Length'] == '10'
+        assert response['ETag'] == f'"{game.box_art_hash}"'
+        assert response.content == b""
+
+    @pytest.mark.parametrize("offload, header, expected", [
+        ('x-sendfile', 'X-Sendfile', None),
+        ('x-accel-redirect', 'X-Accel-Redirect', '/protected-media/{name}'),
+    ])
+    def test_box_art_offload(self, settings, game, offload, header, expected):
+        settings.BOX_ART_OFFLOAD = offload
+        client = get_client()
+
+        response = client.get(reverse('game-box-art', kwargs={'pk': game.pk}))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.content == b""
+        assert response['Content-Type'] == 'image/jpeg'
+        expected = expected.format(name=game.box_art.name) if expected else game.box_art.path
+        assert response[header] == expected
+
+    def test_placeholder_is_returned_with_the_game(self, user):
+        game = mixer.blend(Game, title="Celeste")
+        client = get_client(user)
+
+        response = client.get(reverse('game-detail', kwargs={'pk': game.pk}), {'box_art': 'url'})
+
+        data = parse(response)
+        assert data['box_art_color'].startswith('#')
+        assert data['box_art_preview'].startswith('data:image/')
+
+    def test_create_returns_before_box_art_processing(self, settings, admin_user, game_data,
+                                                      django_capture_on_commit_callbacks):
+        settings.BOX_ART_BACKGROUND_PROCESSING = True
+        client = get_admin(admin_user)
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            response = client.post(reverse('game-list'), game_data, format='multipart')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        # the re-encoding has been left to the worker pool
+        assert len(callbacks) == 1
+        assert Game.objects.get().box_art_preview == ''
+
+    def test_create_rejects_too_large_box_art(self, settings, admin_user, game_data):
+        settings.BOX_ART_MAX_PIXELS = 50 * 50
+        client = get_admin(admin_user)
+
+        response = client.post(reverse('game-list'), game_data, format='multipart')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert Game.objects.count() == 0
+
+    def test_create_rejects_decompression_bomb_with_msgpack(self, admin_user, game_data):
+        client = get_client(admin_user)
+        game_data['box_art'] = decompression_bomb()
+
+        response = client.post(reverse('game-list'), msgpack.packb(game_data), content_type='application/msgpack')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert Game.objects.count() == 0
@@ -1,8 +1,12 @@
+import random
+
 from django.contrib.auth import get_user_model, authenticate
-from django.db import transaction
-# Rimosso IntegrityError dagli import perché non serve più
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Q, Subquery
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
@@ -22,7 +26,7 @@ from drf_spectacular.utils import (
 # Project imports
 from fiordispino.models import Genre, Game, GamesToPlay, GamePlayed
 from fiordispino.serializers.genre_serializers import GenreSerializer
-from fiordispino.serializers.game_serializer import GameSerializer
+from fiordispino.serializers.game_serializer import GameDetailSerializer, GameSerializer, TopGameSerializer
 from fiordispino import permissions as custom_permissions
 from fiordispino.serializers.games_to_play_serializer import GamesToPlaySerializer, MoveToPlayedSerializer
 from fiordispino.serializers.games_played_serializer import GamesPlayedSerializer
@@ -30,17 +34,119 @@ from fiordispino.core.exceptions import GameAlreadyInGamesToPlay, GameAlreadyInG
 from fiordispino.serializers.login_serializers import LoginSerializer
 from fiordispino.serializers.register_serializers import RegisterSerializer
 from fiordispino.serializers.user_serializer import UserSerializer
-from fiordispino.core.validators import validate_username, validate_random_games_limit
+from fiordispino.core.validators import (
+    validate_username,
+    validate_random_games_limit,
+    validate_box_art_size,
+    validate_box_art_encoding,
+    validate_random_weight
+)
 from fiordispino.permissions import IsAdminUnlessMe
+from fiordispino.renderers import ORJSONRenderer, PassthroughRenderer
+from fiordispino.pagination import GamePagination, LibraryPagination, GamesPlayedPagination, TopGamesPagination
+from fiordispino.filters import DiscoveryFilterBackend, LibraryFilterBackend, TopGamesFilterBackend
+from fiordispino.core.box_art import box_art_response
+from fiordispino.core.renditions import ORIGINAL_SIZE
+from fiordispino.core.featured import get_featured_ids, get_featured_payload, seconds_left, variant_key
+from fiordispino.core.sampling import RANDOM_WEIGHTS, sample_ids, weighted_sample_ids
 
 from fiordispino.core.docs_utils import (
+    GameDetailDocsSerializer,
     GameDocsSerializer,
     GamesToPlayResponseSerializer,
-    GamesPlayedResponseSerializer
+    GamesPlayedResponseSerializer,
+    TopGameDocsSerializer
 )
 
 User = get_user_model()
 
+# shared by every endpoint that returns games (also nested ones)
+BOX_ART_MODE_PARAMETER = OpenApiParameter(
+    name='box_art',
+    type=OpenApiTypes.STR,
+    location=OpenApiParameter.QUERY,
+    enum=['base64', 'url'],
+    description="How box art is returned: inline 'base64' or a cacheable 'url' to the box-art endpoint (default: base64). "
+                "With Accept: application/msgpack the inline box art is sent as raw bytes.",
+    required=False
+)
+
+BOX_ART_SIZE_PARAMETER = OpenApiParameter(
+    name='size',
+    type=OpenApiTypes.STR,
+    location=OpenApiParameter.QUERY,
+    enum=['original', 'thumb', 'medium'],
+    description="Box art size: 'thumb' (200px) and 'medium' (600px) are downscaled renditions (default: original).",
+    required=False
+)
+
+FIELDS_PARAMETER = OpenApiParameter(
+    name='fields',
+    type=OpenApiTypes.STR,
+    location=OpenApiParameter.QUERY,
+    description="Comma separated fields to return, nested game fields use the dotted notation "
+                "(e.g. 'id,title' or 'id,rating,game.title'). Default: every field.",
+    required=False
+)
+
+EXPAND_PARAMETER = OpenApiParameter(
+    name='expand',
+    type=OpenApiTypes.STR,
+    location=OpenApiParameter.QUERY,
+    description="Comma separated relations to nest (e.g. 'game,game.genres'), the others are returned as ids. "
+                "Default: every relation is nested.",
+    required=False
+)
+
+
+def owned_by(username):
+    # the owner id as a scalar subquery instead of a join on the users: the (owner, ...) indexes of the libraries are then
+    # walked in order, and it is still a single query
+    return Q(owner_id=Subquery(User.objects.filter(username=username).values('pk')[:1]))
+
+
+class SparseFieldsetMixin:
+    """
+    Loads only the columns needed by ?fields= and ?expand=, so a client listing titles never pays for images or
+    descriptions. Just for reads: a write may need the whole row.
+    Actions that don't serialize the objects can opt out with @action(..., sparse_fieldset=False).
+    """
+    sparse_fieldset = True
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+
+        if not self.sparse_fieldset or self.request is None or self.request.method not in permissions.SAFE_METHODS:
+            return queryset
+
+        return self.get_serializer().restrict_queryset(queryset)
+
+    def serialize_list(self, queryset):
+        # read-only lists skip the field by field serialization, the output is the same
+        return self.get_serializer().fast_representation(queryset)
+
+    def paginate_list(self, queryset):
+        # keyset pages are built from values() rows too, the cursor columns are loaded with the page
+        paginate_rows = getattr(self.paginator, 'paginate_rows', None)
+        if paginate_rows is None:
+            page = self.paginate_queryset(queryset)
+            return None if page is None else self.get_serializer(page, many=True).data
+
+        def fetch(page_queryset, key_fields):
+            rows, build_row = self.get_serializer().fast_rows(page_queryset, key_fields)
+            return [(tuple(row[field] for field in key_fields), build_row(row)) for row in rows]
+
+        return paginate_rows(queryset, self.request, fetch, view=self)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = self.paginate_list(queryset)
+        if page is not None:
+            return self.get_paginated_response(page)
+
+        return Response(self.serialize_list(queryset))
+
 
 # --- GENRE VIEWSET ---
 @extend_schema_view(
@@ -77,7 +183,9 @@ class GenreViewSet(viewsets.ModelViewSet):
 @extend_schema_view(
     list=extend_schema(
         summary="List all games",
-        description="Returns a paginated list of all games.",
+        description="Returns a paginated list of all games, sorted by title. Pages are linked by opaque cursors "
+                    "(next/previous), their size can be chosen with ?page_size= up to a maximum.",
+        parameters=[BOX_ART_MODE_PARAMETER, BOX_ART_SIZE_PARAMETER, FIELDS_PARAMETER, EXPAND_PARAMETER],
         responses={200: GameDocsSerializer(many=True)}
     ),
     create=extend_schema(
@@ -103,8 +211,10 @@ class GenreViewSet(viewsets.ModelViewSet):
     ),
     retrieve=extend_schema(
         summary="Retrieve game details",
-        description="Returns full details of a specific game.",
-        responses={200: GameDocsSerializer},
+        description="Returns full details of a specific game, with the distribution of its ratings (how many players "
+                    "gave each rating, from 1 to 10) and its percentiles (null if nobody rated the game).",
+        parameters=[BOX_ART_MODE_PARAMETER, BOX_ART_SIZE_PARAMETER, FIELDS_PARAMETER, EXPAND_PARAMETER],
+        responses={200: GameDetailDocsSerializer},
         examples=[
             OpenApiExample(
                 'Game Detail Example',
@@ -122,7 +232,11 @@ class GenreViewSet(viewsets.ModelViewSet):
                     "release_date": "2015-05-19",
                     "global_rating": 9.8,
                     "rating_count": 45200,
-                    "box_art": "witcher3.jpg"
+                    "rating_histogram": [20, 15, 30, 45, 80, 160, 400, 1850, 3600, 39000],
+                    "rating_percentiles": {"p25": 10.0, "median": 10.0, "p75": 10.0, "p90": 10.0},
+                    "box_art": "witcher3.jpg",
+                    "box_art_color": "#2b3a4c",
+                    "box_art_preview": "data:image/webp;base64,UklGRlQAAABXRUJQVlA4IEgAAAAwAwCdASoQABAAPm0wlUekIqIhKAgAkA2JaQAAW+..."
                 },
                 response_only=True,
                 status_codes=[200]
@@ -141,14 +255,25 @@ class GenreViewSet(viewsets.ModelViewSet):
     ),
     destroy=extend_schema(summary="Delete a game", description="Removes a game. (Admin only)"),
 )
-class GameViewSet(viewsets.ModelViewSet):
+class GameViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     permission_classes = [custom_permissions.IsAdminOrReadOnly]
     queryset = Game.objects.all()
     serializer_class = GameSerializer
+    pagination_class = GamePagination
+
+    def get_serializer_class(self):
+        # the game page also gets the distribution of the ratings
+        if self.action == 'retrieve':
+            return GameDetailSerializer
+        # the ranking also gets the score it is sorted by
+        if self.action == 'get_top':
+            return TopGameSerializer
+        return super().get_serializer_class()
 
     @extend_schema(
         summary="Get random games",
-        description="Returns a list of random games.",
+        description="Returns a list of random games, optionally filtered (genre, PEGI, rating, not in my lists) and "
+                    "weighted towards the best rated or the least known games.",
         parameters=[
             OpenApiParameter(
                 name='n_games',
@@ -156,19 +281,140 @@ class GameViewSet(viewsets.ModelViewSet):
                 location=OpenApiParameter.QUERY,
                 description='Number of random games (min=5; max=20; default=5).',
                 required=False
-            )
+            ),
+            OpenApiParameter(
+                name='weight',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                enum=list(RANDOM_WEIGHTS),
+                description="Favour the best rated games ('rating') or the ones few players rated ('exposure'). "
+                            "Default: every game has the same chance.",
+                required=False
+            ),
+            BOX_ART_MODE_PARAMETER,
+            BOX_ART_SIZE_PARAMETER,
+            FIELDS_PARAMETER,
+            EXPAND_PARAMETER
         ],
         responses={200: GameDocsSerializer(many=True)}
     )
-    @action(detail=False, methods=['get'], url_path='random-games')
+    @action(detail=False, methods=['get'], url_path='random-games', pagination_class=None,
+            filter_backends=[DiscoveryFilterBackend])
     def get_random_games(self, request):
         raw_n = request.query_params.get('n_games', "5")
         validate_random_games_limit(raw_n)
         n_games = int(raw_n)
 
-        games = Game.objects.order_by('?')[:n_games]
-        serializer = self.get_serializer(games, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        candidates = self.filter_queryset(Game.objects.all())
+
+        # no ORDER BY RANDOM(): it would sort the whole catalogue on every call
+        weight = request.query_params.get('weight')
+        if weight is None:
+            ids = sample_ids(candidates, n_games)
+        else:
+            validate_random_weight(weight)
+            ids = weighted_sample_ids(candidates, n_games, weight)
+
+        games = self.serialize_list(self.get_queryset().filter(pk__in=ids))
+        random.shuffle(games)
+        return Response(games, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        summary="Get featured games",
+        description="Returns the featured games of the period (a day by default). They are picked at random once per "
+                    "period, the same for everybody, and served from a cache: when the period is over the previous "
+                    "selection is still returned while the new one is built in the background.",
+        parameters=[BOX_ART_MODE_PARAMETER, BOX_ART_SIZE_PARAMETER, FIELDS_PARAMETER, EXPAND_PARAMETER],
+        responses={200: GameDocsSerializer(many=True)}
+    )
+    @action(detail=False, methods=['get'], url_path='featured', pagination_class=None)
+    def get_featured(self, request):
+        # validates ?fields=, ?expand=, ?box_art= and ?size= before anything is cached
+        serializer = self.get_serializer()
+        serializer.get_box_art_mode()
+        serializer.get_box_art_size()
+
+        # one payload per representation: urls are absolute, binary renderers get the raw box arts
+        key = variant_key(request.build_absolute_uri('/'), request.accepted_renderer.format,
+                          *(request.query_params.get(name) for name in ('box_art', 'size', 'fields', 'expand')))
+
+        def build(period_index):
+            ids = get_featured_ids(Game.objects.all(), period_index)
+            return self.serialize_list(self.get_queryset().filter(pk__in=ids).order_by('pk'))
+
+        games, period_index = get_featured_payload(key, build)
+
+        response = Response(games, status=status.HTTP_200_OK)
+        patch_cache_control(response, public=True, max_age=seconds_left(period_index))
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    @extend_schema(
+        summary="Get top games",
+        description="Returns the games ranked by weighted rating, best first: the average of their ratings with a few "
+                    "imaginary votes of an average score added, so a game rated 10 by a single player doesn't outrank "
+                    "one thousands of players rated 9.8. Games nobody rated are left out. Can be narrowed down to a "
+                    "genre and a PEGI rating, paginated like the catalogue (cursor based).",
+        parameters=[BOX_ART_MODE_PARAMETER, BOX_ART_SIZE_PARAMETER, FIELDS_PARAMETER, EXPAND_PARAMETER],
+        responses={200: TopGameDocsSerializer(many=True)}
+    )
+    @action(detail=False, methods=['get'], url_path='top', pagination_class=TopGamesPagination,
+            filter_backends=[TopGamesFilterBackend])
+    def get_top(self, request):
+        games = self.filter_queryset(self.get_queryset().filter(rating_count__gt=0))
+        return self.get_paginated_response(self.paginate_list(games))
+
+    @extend_schema(
+        summary="Get game box art",
+        description="Returns the box art image of a game. Urls returned with ?box_art=url are versioned with the image "
+                    "content hash, so they can be cached forever (Cache-Control: immutable). Supports ETag revalidation. "
+                    "Renditions (?size=thumb|medium) are served as AVIF/WebP when the Accept header allows it. "
+                    "Clients that need the image inline can ask for ?encoding=base64, the json is then streamed. "
+                    "Raw images support HEAD and single Range/If-Range requests, to resume interrupted downloads.",
+        parameters=[
+            OpenApiParameter(
+                name='v',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description='Box art version (content hash prefix), as returned in the game payloads.',
+                required=False
+            ),
+            BOX_ART_SIZE_PARAMETER,
+            OpenApiParameter(
+                name='encoding',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                enum=['raw', 'base64'],
+                description="'raw' returns the image, 'base64' a json object with the encoded image (default: raw).",
+                required=False
+            )
+        ],
+        responses={
+            (200, 'image/*'): OpenApiTypes.BINARY,
+            (206, 'image/*'): OpenApiTypes.BINARY,
+            (200, 'application/json'): inline_serializer(
+                name='BoxArtBase64Response',
+                fields={
+                    'id': serializers.IntegerField(),
+                    'box_art_hash': serializers.CharField(),
+                    'box_art': serializers.CharField(help_text="Base64 encoded image")
+                }
+            ),
+            304: None,
+            404: None,
+            416: None
+        }
+    )
+    @action(detail=True, methods=['get'], url_path='box-art', renderer_classes=[ORJSONRenderer, PassthroughRenderer],
+            sparse_fieldset=False)
+    def box_art(self, request, pk=None):
+        size = request.query_params.get('size', ORIGINAL_SIZE)
+        validate_box_art_size(size)
+
+        encoding = request.query_params.get('encoding', 'raw')
+        validate_box_art_encoding(encoding)
+
+        return box_art_response(request, self.get_object(), size, encoding)
 
 
 # --- GAMES TO PLAY VIEWSET ---
@@ -176,6 +422,7 @@ class GameViewSet(viewsets.ModelViewSet):
     list=extend_schema(
         summary="List 'Games to Play'",
         description="Returns the backlog list.",
+        parameters=[BOX_ART_MODE_PARAMETER, BOX_ART_SIZE_PARAMETER, FIELDS_PARAMETER, EXPAND_PARAMETER],
         responses={200: GamesToPlayResponseSerializer(many=True)}
     ),
     create=extend_schema(
@@ -192,13 +439,14 @@ class GameViewSet(viewsets.ModelViewSet):
     ),
     retrieve=extend_schema(
         summary="Retrieve entry details",
+        parameters=[BOX_ART_MODE_PARAMETER, BOX_ART_SIZE_PARAMETER, FIELDS_PARAMETER, EXPAND_PARAMETER],
         responses={200: GamesToPlayResponseSerializer}
     ),
     update=extend_schema(summary="Update entry"),
     partial_update=extend_schema(summary="Partially update entry"),
     destroy=extend_schema(summary="Remove from 'Games to Play'"),
 )
-class GamesToPlayViewSet(viewsets.ModelViewSet):
+class GamesToPlayViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, custom_permissions.IsOwnerOrAdminOrReadOnly]
     queryset = GamesToPlay.objects.all()
     serializer_class = GamesToPlaySerializer
@@ -219,15 +467,17 @@ class GamesToPlayViewSet(viewsets.ModelViewSet):
 
     @extend_schema(
         summary="Get games to play by owner",
-        description="Returns the 'Games to Play' list for a specific user.",
+        description="Returns the 'Games to Play' list for a specific user, paginated (cursor based, newest first by "
+                    "default). Can be sorted with ?sort= and filtered by genre and PEGI.",
+        parameters=[BOX_ART_MODE_PARAMETER, BOX_ART_SIZE_PARAMETER, FIELDS_PARAMETER, EXPAND_PARAMETER],
         responses={200: GamesToPlayResponseSerializer(many=True)}
     )
-    @action(detail=False, methods=['get'], url_path=r'owner/(?P<username>[^/.]+)')
+    @action(detail=False, methods=['get'], url_path=r'owner/(?P<username>[^/.]+)',
+            pagination_class=LibraryPagination, filter_backends=[LibraryFilterBackend])
     def get_by_owner(self, request, username=None):
         validate_username(username)
-        games = GamesToPlay.objects.filter(owner__username=username)
-        serializer_ = self.get_serializer(games, many=True)
-        return Response(serializer_.data, status=status.HTTP_200_OK)
+        games = self.filter_queryset(self.get_queryset().filter(owned_by(username)))
+        return self.get_paginated_response(self.paginate_list(games))
 
     @extend_schema(
         summary="Move to 'Games Played'",
@@ -256,17 +506,21 @@ class GamesToPlayViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         rating = serializer.validated_data['rating']
 
-        # Check if already played
-        if GamePlayed.objects.filter(owner=game_to_play_instance.owner, game=game_to_play_instance.game).exists():
+        # Check if already played (the ids are enough, no need to load the user and the game)
+        if GamePlayed.objects.filter(owner_id=game_to_play_instance.owner_id, game_id=game_to_play_instance.game_id).exists():
             raise GameAlreadyInGamesPlayed()
 
-        with transaction.atomic():
-            GamePlayed.objects.create(
-                owner=game_to_play_instance.owner,
-                game=game_to_play_instance.game,
-                rating=rating
-            )
-            game_to_play_instance.delete()
+        try:
+            with transaction.atomic():
+                GamePlayed.objects.create(
+                    owner_id=game_to_play_instance.owner_id,
+                    game_id=game_to_play_instance.game_id,
+                    rating=rating
+                )
+                game_to_play_instance.delete()
+        except IntegrityError:
+            # moved at the same time by another request (e.g. another device) after the check above
+            raise GameAlreadyInGamesPlayed()
 
         return Response(status=status.HTTP_200_OK)
 
@@ -315,6 +569,7 @@ class GamesToPlayViewSet(viewsets.ModelViewSet):
     list=extend_schema(
         summary="List 'Games Played'",
         description="Returns finished games.",
+        parameters=[BOX_ART_MODE_PARAMETER, BOX_ART_SIZE_PARAMETER, FIELDS_PARAMETER, EXPAND_PARAMETER],
         responses={200: GamesPlayedResponseSerializer(many=True)}
     ),
     create=extend_schema(
@@ -342,13 +597,14 @@ class GamesToPlayViewSet(viewsets.ModelViewSet):
     ),
     retrieve=extend_schema(
         summary="Retrieve entry details",
+        parameters=[BOX_ART_MODE_PARAMETER, BOX_ART_SIZE_PARAMETER, FIELDS_PARAMETER, EXPAND_PARAMETER],
         responses={200: GamesPlayedResponseSerializer}
     ),
     update=extend_schema(summary="Update entry"),
     partial_update=extend_schema(summary="Partially update entry"),
     destroy=extend_schema(summary="Remove from 'Games Played'"),
 )
-class GamePlayedViewSet(viewsets.ModelViewSet):
+class GamePlayedViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, custom_permissions.IsOwnerOrAdminOrReadOnly]
     queryset = GamePlayed.objects.all()
     serializer_class = GamesPlayedSerializer
@@ -365,19 +621,37 @@ class GamePlayedViewSet(viewsets.ModelViewSet):
         if GamePlayed.objects.filter(owner=user_, game=game_).exists():
             raise GameAlreadyInGamesPlayed("You have already reviewed this game.")
 
-        serializer.save(owner=user_)
+        try:
+            serializer.save(owner=user_)
+        except IntegrityError:
+            # reviewed at the same time by another request after the check above (unique owner and game)
+            raise GameAlreadyInGamesPlayed("You have already reviewed this game.")
+
+    def perform_update(self, serializer):
+        try:
+            serializer.save()
+        except IntegrityError:
+            raise GameAlreadyInGamesPlayed("You have already reviewed this game.")
+        except DatabaseError:
+            # the forced update of an entry deleted by another request (e.g. another device) after being loaded, see
+            # GamePlayed.save. any other failure (e.g. a locked database) is not a missing entry
+            if GamePlayed.objects.filter(pk=serializer.instance.pk).exists():
+                raise
+            raise NotFound()
 
     @extend_schema(
         summary="Get played games by owner",
-        description="Returns the 'Games Played' list for a specific user.",
+        description="Returns the 'Games Played' list for a specific user, paginated (cursor based, newest first by "
+                    "default). Can be sorted with ?sort= and filtered by rating range, genre and PEGI.",
+        parameters=[BOX_ART_MODE_PARAMETER, BOX_ART_SIZE_PARAMETER, FIELDS_PARAMETER, EXPAND_PARAMETER],
         responses={200: GamesPlayedResponseSerializer(many=True)}
     )
-    @action(detail=False, methods=['get'], url_path=r'owner/(?P<username>[^/.]+)')
+    @action(detail=False, methods=['get'], url_path=r'owner/(?P<username>[^/.]+)',
+            pagination_class=GamesPlayedPagination, filter_backends=[LibraryFilterBackend])
     def get_by_owner(self, request, username=None):
         validate_username(username)
-        games = GamePlayed.objects.filter(owner__username=username)
-        serializer_ = self.get_serializer(games, many=True)
-        return Response(serializer_.data, status=status.HTTP_200_OK)
+        games = self.filter_queryset(self.get_queryset().filter(owned_by(username)))
+        return self.get_paginated_response(self.paginate_list(games))
 
     @extend_schema(
         summary="Move back to 'Games to Play'",
@@ -388,14 +662,14 @@ class GamePlayedViewSet(viewsets.ModelViewSet):
     def move_to_backlog(self, request, pk=None):
         played_instance = self.get_object()
 
-        # Check if already in backlog
-        if GamesToPlay.objects.filter(owner=played_instance.owner, game=played_instance.game).exists():
+        # Check if already in backlog (the ids are enough, no need to load the user and the game)
+        if GamesToPlay.objects.filter(owner_id=played_instance.owner_id, game_id=played_instance.game_id).exists():
             raise GameAlreadyInGamesToPlay()
 
         with transaction.atomic():
             GamesToPlay.objects.create(
-                owner=played_instance.owner,
-                game=played_instance.game
+                owner_id=played_instance.owner_id,
+                game_id=played_instance.game_id
             )
             played_instance.delete()
 